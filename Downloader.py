@@ -1,12 +1,43 @@
+import time
+# Origin of the startup timing report, taken before the heavy imports
+_IMPORT_STARTED = time.perf_counter()
+
 import flet as ft
-import yt_dlp
-import json
 import os
+import re
 import threading
-from datetime import datetime
+
+from api import DEFAULT_PORT, JobAPIServer
+from batch import DEFAULT_POOL_SIZE, parse_url_list, read_url_file
+from engine import DownloadEngine, EngineConfig
+from format_select import CODEC_PREFERENCES, DEFAULT_RULE, RULE_PRESETS, FormatRule, recommend, selector_for
+from history_index import SORT_COLUMNS, HistoryIndex
+from instagram import INSTAGRAM_POOL_SIZE
+from postprocess import AUDIO_CODECS, VIDEO_CONTAINERS
+from progress import ProgressTicker
+from scheduler import PRIORITIES, CANCELLED, COMPLETED, FAILED, PAUSED, PROCESSING, QUEUED, RUNNING, SKIPPED
+from subscriptions import DEFAULT_INTERVAL, SubscriptionPoller
+from telemetry import StartupTimer, describe_metrics, write_metrics_csv
+
+# Number of history rows fetched per page
+HISTORY_PAGE_SIZE = 100
+
+# Seconds the startup report waits for the first history page to be shown
+HISTORY_MARK_TIMEOUT = 10
+
+# Accepted history date filters: a year, month or day
+_DATE_FILTER_RE = re.compile(r'^\d{4}(-\d{2}){0,2}$')
+
+# Max height choices for the format rule; "Any" means no limit
+HEIGHT_CHOICES = ["Any", "2160", "1440", "1080", "720", "480", "360"]
 
 class FletVideoDownloader:
     def __init__(self, page: ft.Page):
+        self.startup_timer = StartupTimer(_IMPORT_STARTED)
+        self.startup_timer.mark("imports")
+        self.startup_done = threading.Event()
+        # Set once the first history page is on screen
+        self.history_shown = threading.Event()
         self.page = page
         self.page.title = "Video Downloader"
         self.page.theme_mode = ft.ThemeMode.DARK
@@ -17,17 +48,40 @@ class FletVideoDownloader:
         
         # Initialize variables
         self.formats = []
-        self.current_download_thread = None
-        self.download_queue = []
-        self.is_downloading = False
-        self.history = []
-        self.history_file = os.path.join(os.path.expanduser("~"), '.flet_video_downloader_history.json') # Safer path
+        self.current_info = None
+        self.recommendation = None
+        self.engine = DownloadEngine(EngineConfig())
+        self.startup_timer.mark("engine")
+        self.engine.add_listener(self._on_engine_event)
+        self.download_queue = self.engine.scheduler
+        self.history_store = self.engine.history_store
+        self.subscription_poller = SubscriptionPoller(self.engine, on_poll=self._on_subscription_polled)
+        self.progress_ticker = ProgressTicker(self._on_progress_tick)
+        self._queue_progress_cells = {}
+        # job id -> its queue table row, and the summary bucket it is counted in
+        self._queue_rows = {}
+        self._queue_buckets = {}
+        self._queue_counts = {'active': 0, 'processing': 0, 'waiting': 0}
+        self._history_loaded = 0
+        self._history_total = 0
+        self._history_loading = False
+        # Built in the background at startup; until then the table pages through the store
+        self.history_index = None
+        self._history_index_lock = threading.Lock()
+        self._history_pending = []
+        self._history_results = None
         self.selected_format_index = None
+        self.api_server = None
         
         # Create UI
         self.setup_ui()
-        self.load_history()
-        self.refresh_history_list() # Initial population of history tab
+        self.startup_timer.mark("interactive")
+        self.progress_ticker.start()
+        
+        # Everything else happens after the window is usable
+        thread = threading.Thread(target=self._startup_thread)
+        thread.daemon = True
+        thread.start()
         
     def setup_ui(self):
         """Setup the main UI components"""
@@ -36,6 +90,9 @@ class FletVideoDownloader:
             tabs=[
                 ft.Tab(text="🎥 YouTube", content=self.create_youtube_tab()),
                 ft.Tab(text="📷 Instagram", content=self.create_instagram_tab()),
+                ft.Tab(text="📦 Batch", content=self.create_batch_tab()),
+                ft.Tab(text="🔔 Subscriptions", content=self.create_subscriptions_tab()),
+                ft.Tab(text="⏳ Queue", content=self.create_queue_tab()),
                 ft.Tab(text="📚 History", content=self.create_history_tab()),
                 ft.Tab(text="⚙️ Settings", content=self.create_settings_tab()),
             ],
@@ -83,10 +140,46 @@ class FletVideoDownloader:
             rows=[],
         )
         
+        # Format rule for the recommended download
+        self.rule_height = ft.Dropdown(
+            label="Max height",
+            options=[ft.dropdown.Option(h) for h in HEIGHT_CHOICES],
+            value="1080",
+            width=120,
+            on_change=self._update_recommendation
+        )
+        self.rule_codecs = ft.Dropdown(
+            label="Codec preference",
+            options=[ft.dropdown.Option(c) for c in CODEC_PREFERENCES],
+            value=next(iter(CODEC_PREFERENCES)),
+            width=200,
+            on_change=self._update_recommendation
+        )
+        self.rule_container = ft.Dropdown(
+            label="Container",
+            options=[ft.dropdown.Option(c) for c in ("mp4", "webm", "mkv")],
+            value="mp4",
+            width=120,
+            on_change=self._update_recommendation
+        )
+        self.rule_size = ft.TextField(
+            label="Max size (MB)",
+            width=130,
+            on_submit=self._update_recommendation,
+            on_blur=self._update_recommendation
+        )
+        self.recommend_text = ft.Text("Fetch formats to get a recommendation")
+        self.recommend_btn = ft.ElevatedButton(
+            text="✨ Download Recommended",
+            on_click=self.download_recommended,
+            icon="AUTO_AWESOME",
+            disabled=True
+        )
+        
         # Download path
         self.download_path = ft.TextField(
             label="Download Location",
-            value=os.path.join(os.path.expanduser("~"), "Downloads"),
+            value=self.engine.config.download_dir,
             expand=True
         )
         
@@ -94,6 +187,38 @@ class FletVideoDownloader:
         self.progress_text = ft.Text("Ready to download")
         self.progress_bar = ft.ProgressBar(value=0, width=400)
         
+        # Queue priority for new downloads
+        self.priority_dropdown = ft.Dropdown(
+            label="Priority",
+            options=[ft.dropdown.Option(p) for p in PRIORITIES],
+            value="normal",
+            width=150
+        )
+        
+        # Parallel DASH/HLS fragments for this download
+        self.fragments_field = ft.TextField(
+            label="Fragments",
+            value=str(self.engine.config.concurrent_fragments),
+            width=110
+        )
+        
+        # Post-processing, run by the post-processing pool after the download
+        self.extract_audio_dropdown = ft.Dropdown(
+            label="Extract audio",
+            options=[ft.dropdown.Option(key="", text="No")] + [ft.dropdown.Option(c) for c in AUDIO_CODECS],
+            value="",
+            width=150
+        )
+        self.convert_dropdown = ft.Dropdown(
+            label="Convert video",
+            options=[ft.dropdown.Option(key="", text="Keep")]
+                    + [ft.dropdown.Option(key=f"remux:{c}", text=f"Remux to {c}") for c in VIDEO_CONTAINERS]
+                    + [ft.dropdown.Option(key=f"transcode:{c}", text=f"Transcode to {c}") for c in VIDEO_CONTAINERS],
+            value="",
+            width=200
+        )
+        self.thumbnail_switch = ft.Switch(label="Embed thumbnail", value=False)
+        
         # Download button reference
         self.download_btn = ft.ElevatedButton(
             text="⬇️ Download Selected",
@@ -126,6 +251,9 @@ class FletVideoDownloader:
                 
                 ft.Column(controls=[self.video_title, self.video_duration]),
                 
+                ft.Row(controls=[self.rule_height, self.rule_codecs, self.rule_container, self.rule_size]),
+                ft.Row(controls=[self.recommend_btn, self.recommend_text]),
+                
                 ft.Container(
                     content=ft.Column(
                     [self.formats_table],
@@ -146,7 +274,8 @@ class FletVideoDownloader:
                         )
                     ]
                 ),
-                self.download_btn,
+                ft.Row(controls=[self.extract_audio_dropdown, self.convert_dropdown, self.thumbnail_switch]),
+                ft.Row(controls=[self.priority_dropdown, self.fragments_field, self.download_btn]),
                 
                 self.progress_text,
                 self.progress_bar
@@ -172,6 +301,21 @@ class FletVideoDownloader:
             icon="DOWNLOAD"
         )
         
+        # Bulk mode: profiles, carousels and reel lists
+        self.insta_bulk_urls = ft.TextField(
+            label="Profiles, posts or reels",
+            hint_text="One URL per line; profiles are expanded into their posts",
+            multiline=True,
+            min_lines=4,
+            max_lines=10
+        )
+        self.insta_bulk_btn = ft.ElevatedButton(
+            text="📥 Download All",
+            on_click=self.start_instagram_bulk,
+            icon="PLAYLIST_ADD"
+        )
+        self.insta_bulk_status = ft.Text("Carousels and highlights are downloaded with all their items")
+        
         return ft.Column(
             controls=[
                 ft.Row(
@@ -186,21 +330,229 @@ class FletVideoDownloader:
                         )
                     ]
                 ),
-                self.insta_info
+                self.insta_info,
+                ft.Text("Bulk Download", size=18, weight="bold"),
+                self.insta_bulk_urls,
+                ft.Row(controls=[self.insta_bulk_btn, self.insta_bulk_status])
+            ],
+            scroll=ft.ScrollMode.ADAPTIVE,
+            expand=True
+        )
+    
+    def create_batch_tab(self):
+        """Create batch/playlist download tab"""
+        self.batch_urls = ft.TextField(
+            label="URLs, playlists or channels",
+            hint_text="One URL per line",
+            multiline=True,
+            min_lines=6,
+            max_lines=12
+        )
+        self.batch_file = ft.TextField(
+            label="URL list file (optional)",
+            hint_text="Path to a .txt file with one URL per line",
+            expand=True
+        )
+        self.batch_rule = ft.Dropdown(
+            label="Format rule",
+            options=[ft.dropdown.Option(rule) for rule in RULE_PRESETS],
+            value=DEFAULT_RULE,
+            width=250
+        )
+        self.batch_pool_size = ft.TextField(
+            label="Parallel lookups",
+            value=str(DEFAULT_POOL_SIZE),
+            width=150
+        )
+        self.batch_btn = ft.ElevatedButton(
+            text="📥 Expand & Queue",
+            on_click=self.start_batch,
+            icon="PLAYLIST_ADD"
+        )
+        self.batch_status = ft.Text("Paste URLs or choose a file, then queue them")
+        self.batch_progress = ft.ProgressBar(value=0, width=400)
+        
+        return ft.Column(
+            controls=[
+                self.batch_urls,
+                self.batch_file,
+                ft.Row(controls=[self.batch_rule, self.batch_pool_size, self.batch_btn]),
+                self.batch_status,
+                self.batch_progress
+            ],
+            scroll=ft.ScrollMode.ADAPTIVE,
+            expand=True
+        )
+    
+    def create_subscriptions_tab(self):
+        """Create channel/playlist subscriptions and watch folder tab"""
+        self.sub_url = ft.TextField(
+            label="Channel or playlist URL",
+            expand=True
+        )
+        self.sub_rule = ft.Dropdown(
+            label="Format rule",
+            options=[ft.dropdown.Option(rule) for rule in RULE_PRESETS],
+            value=DEFAULT_RULE,
+            width=200
+        )
+        self.sub_interval = ft.TextField(
+            label="Check every (minutes)",
+            value=str(DEFAULT_INTERVAL // 60),
+            width=170
+        )
+        self.sub_incremental = ft.Switch(
+            label="Stop at last seen video",
+            value=True,
+            tooltip="Channels list newest first; turn off for playlists that add videos at the end"
+        )
+        self.sub_table = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Subscription")),
+                ft.DataColumn(ft.Text("Every")),
+                ft.DataColumn(ft.Text("Last checked")),
+                ft.DataColumn(ft.Text("Status")),
+                ft.DataColumn(ft.Text("Actions")),
+            ],
+            rows=[]
+        )
+        self.watch_dir_field = ft.TextField(
+            label="Watch folder for .txt URL lists (empty = off)",
+            value=self.engine.config.watch_dir or "",
+            expand=True,
+            on_submit=self.apply_watch_dir,
+            on_blur=self.apply_watch_dir
+        )
+        self.watch_rule = ft.Dropdown(
+            label="Format rule",
+            options=[ft.dropdown.Option(rule) for rule in RULE_PRESETS],
+            value=self.engine.config.watch_format,
+            width=200,
+            on_change=self.apply_watch_format
+        )
+        
+        return ft.Column(
+            controls=[
+                ft.Row(controls=[self.sub_url]),
+                ft.Row(
+                    controls=[
+                        self.sub_rule,
+                        self.sub_interval,
+                        self.sub_incremental,
+                        ft.ElevatedButton(
+                            text="➕ Subscribe",
+                            on_click=self.add_subscription,
+                            icon="ADD_ALERT"
+                        ),
+                        ft.ElevatedButton(
+                            text="🔄 Check All Now",
+                            on_click=self.check_all_subscriptions,
+                            icon="REFRESH"
+                        ),
+                    ]
+                ),
+                ft.Container(
+                    content=ft.Column(
+                        [self.sub_table],
+                        scroll=ft.ScrollMode.ALWAYS
+                    ),
+                    height=300,
+                    border=ft.border.all(1, color=ft.Colors.OUTLINE),
+                    border_radius=ft.border_radius.all(5)
+                ),
+                ft.Row(controls=[self.watch_dir_field, self.watch_rule]),
+                ft.Text("Lists dropped into the folder are queued and moved to its 'imported' subfolder", size=12),
+            ],
+            scroll=ft.ScrollMode.ADAPTIVE,
+            expand=True
+        )
+    
+    def create_queue_tab(self):
+        """Create download queue tab"""
+        self.queue_table = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Title")),
+                ft.DataColumn(ft.Text("Platform")),
+                ft.DataColumn(ft.Text("Priority")),
+                ft.DataColumn(ft.Text("Status")),
+                ft.DataColumn(ft.Text("Progress")),
+                ft.DataColumn(ft.Text("Actions")),
+            ],
+            rows=[]
+        )
+        self.queue_summary = ft.Text("No downloads queued")
+        
+        return ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[
+                        self.queue_summary,
+                        ft.ElevatedButton(
+                            text="🧹 Clear Finished",
+                            on_click=self.clear_finished_jobs,
+                            icon="CLEAR_ALL"
+                        )
+                    ]
+                ),
+                ft.Container(
+                    content=ft.Column(
+                        [self.queue_table],
+                        scroll=ft.ScrollMode.ALWAYS
+                    ),
+                    height=400,
+                    border=ft.border.all(1, color=ft.Colors.OUTLINE),
+                    border_radius=ft.border_radius.all(5)
+                )
             ]
         )
     
     def create_history_tab(self):
         """Create download history tab"""
+        # Column order matches SORT_COLUMNS
         self.history_table = ft.DataTable(
             columns=[
-                ft.DataColumn(ft.Text("Title")),
-                ft.DataColumn(ft.Text("URL")),
-                ft.DataColumn(ft.Text("Date")),
-                ft.DataColumn(ft.Text("Platform")),
+                ft.DataColumn(ft.Text("Title"), on_sort=self.sort_history),
+                ft.DataColumn(ft.Text("URL"), on_sort=self.sort_history),
+                ft.DataColumn(ft.Text("Date"), on_sort=self.sort_history),
+                ft.DataColumn(ft.Text("Platform"), on_sort=self.sort_history),
             ],
+            sort_column_index=SORT_COLUMNS.index('date'),
+            sort_ascending=False,
             rows=[]
         )
+        self.history_search = ft.TextField(
+            label="Search title, URL or platform",
+            prefix_icon="SEARCH",
+            expand=True,
+            on_change=self.search_history
+        )
+        self.history_platform = ft.Dropdown(
+            label="Platform",
+            options=[ft.dropdown.Option(p) for p in ("All", "YouTube", "Instagram")],
+            value="All",
+            width=150,
+            on_change=self.search_history
+        )
+        self.history_from = ft.TextField(
+            label="From",
+            hint_text="YYYY-MM-DD",
+            width=140,
+            on_submit=self.search_history,
+            on_blur=self.search_history
+        )
+        self.history_to = ft.TextField(
+            label="To",
+            hint_text="YYYY-MM-DD",
+            width=140,
+            on_submit=self.search_history,
+            on_blur=self.search_history
+        )
+        self.history_count = ft.Text("Loading history...")
+        self.history_more_btn = ft.TextButton(
+            text="Load more",
+            on_click=self.load_more_history,
+            visible=False
+        )
         
         return ft.Column(
             controls=[
@@ -216,11 +568,23 @@ class FletVideoDownloader:
                             on_click=self.clear_history,
                             icon="DELETE_FOREVER",
                             color="error"
-                        )
+                        ),
+                        ft.ElevatedButton(
+                            text="Export Metrics CSV",
+                            on_click=self.export_metrics,
+                            icon="DOWNLOAD"
+                        ),
+                        self.history_count
                     ]
                 ),
+                ft.Row(controls=[self.history_search, self.history_platform, self.history_from, self.history_to]),
                 ft.Container(
-                    content=self.history_table,
+                    content=ft.Column(
+                        [self.history_table, self.history_more_btn],
+                        scroll=ft.ScrollMode.ALWAYS,
+                        on_scroll=self._on_history_scroll,
+                        on_scroll_interval=100
+                    ),
                     height=400,
                     border=ft.border.all(1, color=ft.Colors.OUTLINE),
                     border_radius=ft.border_radius.all(5)
@@ -236,10 +600,124 @@ class FletVideoDownloader:
             on_change=self.change_theme_mode
         )
         
+        self.max_parallel_field = ft.TextField(
+            label="Max parallel downloads",
+            value=str(self.download_queue.max_parallel),
+            width=200,
+            on_submit=self.apply_queue_limits,
+            on_blur=self.apply_queue_limits
+        )
+        self.youtube_limit_field = ft.TextField(
+            label="YouTube limit",
+            value=str(self.download_queue.platform_limits.get('YouTube', '')),
+            width=150,
+            on_submit=self.apply_queue_limits,
+            on_blur=self.apply_queue_limits
+        )
+        self.instagram_limit_field = ft.TextField(
+            label="Instagram limit",
+            value=str(self.download_queue.platform_limits.get('Instagram', '')),
+            width=150,
+            on_submit=self.apply_queue_limits,
+            on_blur=self.apply_queue_limits
+        )
+        self.postprocess_workers_field = ft.TextField(
+            label="Post-processing workers",
+            value=str(self.engine.config.postprocess_workers),
+            width=200,
+            on_submit=self.apply_queue_limits,
+            on_blur=self.apply_queue_limits
+        )
+        self.min_free_space_field = ft.TextField(
+            label="Keep free on disk (MB)",
+            value=str(self.engine.config.min_free_space // (1024*1024)),
+            width=200,
+            on_submit=self.apply_queue_limits,
+            on_blur=self.apply_queue_limits
+        )
+        
+        self.rate_limit_field = ft.TextField(
+            label="Bandwidth limit (MB/s, 0 = unlimited)",
+            value=str(self.engine.config.rate_limit / (1024*1024)),
+            width=280,
+            on_submit=self.apply_bandwidth_settings,
+            on_blur=self.apply_bandwidth_settings
+        )
+        self.default_fragments_field = ft.TextField(
+            label="Default fragments per job",
+            value=str(self.engine.config.concurrent_fragments),
+            width=200,
+            on_submit=self.apply_bandwidth_settings,
+            on_blur=self.apply_bandwidth_settings
+        )
+        
+        self.api_switch = ft.Switch(
+            label="Local HTTP job API",
+            value=False,
+            on_change=self.toggle_api_server
+        )
+        self.api_port_field = ft.TextField(
+            label="API port",
+            value=str(DEFAULT_PORT),
+            width=150
+        )
+        
+        self.duplicate_dropdown = ft.Dropdown(
+            label="Already downloaded videos",
+            options=[
+                ft.dropdown.Option(key='skip', text="Skip"),
+                ft.dropdown.Option(key='link', text="Hard-link into folder"),
+                ft.dropdown.Option(key='download', text="Download again"),
+            ],
+            value=self.engine.config.duplicate_policy,
+            width=250,
+            on_change=self.apply_duplicate_settings
+        )
+        self.hash_switch = ft.Switch(
+            label="Hash file contents",
+            value=self.engine.config.hash_downloads,
+            on_change=self.apply_duplicate_settings
+        )
+        self.match_titles_switch = ft.Switch(
+            label="Match files by title",
+            value=self.engine.config.match_titles,
+            on_change=self.apply_duplicate_settings
+        )
+        self.instagram_cookies_field = ft.TextField(
+            label="Instagram cookies.txt (for profiles and private posts)",
+            value=self.engine.config.instagram_cookies or "",
+            expand=True,
+            on_submit=self.apply_instagram_cookies,
+            on_blur=self.apply_instagram_cookies
+        )
+        
+        self.scan_btn = ft.ElevatedButton(
+            text="Rescan Download Folder",
+            on_click=self.scan_download_folder
+        )
+        
         return ft.Column(
             controls=[
                 ft.Text("General Settings", size=18, weight="bold"),
                 self.theme_switch,
+                ft.Text("Download Queue", size=18, weight="bold"),
+                ft.Row(
+                    controls=[
+                        self.max_parallel_field,
+                        self.youtube_limit_field,
+                        self.instagram_limit_field,
+                        self.postprocess_workers_field,
+                        self.min_free_space_field,
+                    ]
+                ),
+                ft.Text("Bandwidth", size=18, weight="bold"),
+                ft.Row(controls=[self.rate_limit_field, self.default_fragments_field]),
+                ft.Text("Job API", size=18, weight="bold"),
+                ft.Row(controls=[self.api_switch, self.api_port_field]),
+                ft.Text("Duplicates", size=18, weight="bold"),
+                ft.Row(controls=[self.duplicate_dropdown, self.hash_switch, self.match_titles_switch, self.scan_btn]),
+                ft.Text("Instagram", size=18, weight="bold"),
+                ft.Row(controls=[self.instagram_cookies_field]),
             ]
         )
     
@@ -260,6 +738,11 @@ class FletVideoDownloader:
         self.video_title.value = "No video selected"
         self.video_duration.value = ""
         self.download_btn.disabled = True
+        self.recommend_btn.disabled = True
+        self.recommend_text.value = "Fetch formats to get a recommendation"
+        self.current_info = None
+        self.recommendation = None
+        self.selected_format_index = None
         self.progress_bar.value = 0
         self.progress_text.value = "Ready to download"
         self.update_status("Form cleared")
@@ -275,6 +758,98 @@ class FletVideoDownloader:
         self.page.theme_mode = ft.ThemeMode.DARK if self.theme_switch.value else ft.ThemeMode.LIGHT
         self.page.update()
 
+    def apply_queue_limits(self, e=None):
+        """Apply the parallel download limits from the settings tab"""
+        try:
+            max_parallel = int(self.max_parallel_field.value)
+            postprocess_workers = int(self.postprocess_workers_field.value)
+            min_free_space = int(self.min_free_space_field.value or 0)
+            limits = {
+                'YouTube': int(self.youtube_limit_field.value or 0),
+                'Instagram': int(self.instagram_limit_field.value or 0),
+            }
+        except ValueError:
+            self.update_status("Queue limits must be whole numbers")
+            return
+        if max_parallel < 1 or postprocess_workers < 1:
+            self.update_status("Max parallel downloads and post-processing workers must be at least 1")
+            return
+        self.download_queue.set_limits(max_parallel=max_parallel, platform_limits=limits)
+        self.engine.set_postprocess_workers(postprocess_workers)
+        self.engine.set_min_free_space(max(0, min_free_space) * 1024 * 1024)
+        self.update_status(f"Queue limits updated: {max_parallel} parallel downloads, "
+                           f"{postprocess_workers} post-processing workers, {max(0, min_free_space)} MB kept free")
+
+    def apply_bandwidth_settings(self, e=None):
+        """Apply the global bandwidth budget and default fragment count"""
+        try:
+            rate = float(self.rate_limit_field.value or 0)
+            fragments = int(self.default_fragments_field.value or 1)
+        except ValueError:
+            self.update_status("Bandwidth settings must be numbers")
+            return
+        if rate < 0 or fragments < 1:
+            self.update_status("Bandwidth limit must be positive and fragments at least 1")
+            return
+        self.engine.set_rate_limit(int(rate * 1024 * 1024))
+        self.engine.config.concurrent_fragments = fragments
+        self.fragments_field.value = str(fragments)
+        limit_str = f"{rate:g} MB/s shared by active downloads" if rate else "unlimited"
+        self.update_status(f"Bandwidth: {limit_str}, {fragments} fragments per job")
+
+    def apply_duplicate_settings(self, e=None):
+        """Apply how already downloaded videos are handled"""
+        self.engine.config.duplicate_policy = self.duplicate_dropdown.value
+        self.engine.config.hash_downloads = self.hash_switch.value
+        self.engine.config.match_titles = self.match_titles_switch.value
+        self.update_status(f"Already downloaded videos: {self.duplicate_dropdown.value}")
+
+    def apply_instagram_cookies(self, e=None):
+        """Use the cookies file from the settings tab for Instagram sessions"""
+        path = (self.instagram_cookies_field.value or "").strip()
+        if path == (self.engine.config.instagram_cookies or ""):
+            return
+        if path and not os.path.isfile(path):
+            self.update_status(f"Cookies file not found: {path}")
+            return
+        self.engine.set_instagram_cookies(path)
+        self.update_status("Instagram cookies updated" if path else "Instagram cookies removed")
+
+    def scan_download_folder(self, e=None):
+        """Index the files in the download folder in the background"""
+        self.scan_btn.disabled = True
+        self.update_status("Scanning download folder...")
+        thread = threading.Thread(target=self._scan_thread, args=(self.download_path.value,))
+        thread.daemon = True
+        thread.start()
+
+    def _scan_thread(self, directory):
+        """Threaded function indexing existing downloads"""
+        try:
+            found = self.engine.scan_downloads(directory)
+            self.page.run_thread(self.update_status, f"Indexed {found} files in {directory}")
+        except Exception as e:
+            self.page.run_thread(self.update_status, f"Scanning download folder failed: {e}")
+        finally:
+            self.page.run_thread(lambda: setattr(self.scan_btn, 'disabled', False))
+            self.page.run_thread(self.page.update)
+
+    def toggle_api_server(self, e=None):
+        """Start or stop the local HTTP job API"""
+        if self.api_switch.value:
+            try:
+                port = int(self.api_port_field.value)
+                self.api_server = JobAPIServer(self.engine, port=port).start()
+            except (ValueError, OSError) as ex:
+                self.api_switch.value = False
+                self.update_status(f"Cannot start job API: {ex}")
+                return
+            self.update_status(f"Job API listening on http://127.0.0.1:{port}")
+        elif self.api_server is not None:
+            self.api_server.stop()
+            self.api_server = None
+            self.update_status("Job API stopped")
+
     def fetch_formats(self, e=None):
         """Fetch available formats for a YouTube video"""
         url = self.url_entry.value.strip()
@@ -293,14 +868,16 @@ class FletVideoDownloader:
     def _fetch_formats_thread(self, url):
         """Threaded function for fetching formats"""
         try:
-            ydl_opts = {'quiet': True, 'no_warnings': True}
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Update UI elements safely from the main thread
-                self.page.run_thread(self._update_video_info, info)
-                self.page.run_thread(self._populate_formats, info)
-                self.page.run_thread(self.update_status, "Formats fetched successfully. Please select one.")
+            info, from_cache = self.engine.fetch_info(url)
+            if from_cache:
+                message = "Formats loaded from cache. Please select one."
+            else:
+                message = "Formats fetched successfully. Please select one."
+            
+            # Update UI elements safely from the main thread
+            self.page.run_thread(self._update_video_info, info)
+            self.page.run_thread(self._populate_formats, info)
+            self.page.run_thread(self.update_status, message)
                 
         except Exception as e:
             self.page.run_thread(self.update_status, f"Error fetching formats: {e}")
@@ -358,169 +935,685 @@ class FletVideoDownloader:
                 )
             )
         self.download_btn.disabled = False if self.formats else True
+        self.current_info = info
+        self._update_recommendation()
+
+    def _current_rule(self):
+        """Build the FormatRule described by the rule controls"""
+        height = self.rule_height.value
+        size = (self.rule_size.value or "").strip()
+        return FormatRule(
+            max_height=int(height) if height and height != "Any" else None,
+            codecs=CODEC_PREFERENCES.get(self.rule_codecs.value),
+            container=self.rule_container.value,
+            target_size=int(float(size) * 1024 * 1024) if size else None
+        )
+
+    def _update_recommendation(self, e=None):
+        """Rank the fetched formats against the rule and highlight the winner"""
+        if self.current_info is None:
+            return
+        try:
+            rule = self._current_rule()
+        except ValueError:
+            self.update_status("Max size must be a number")
+            return
+        self.recommendation = recommend(self.current_info, rule)
+        recommended = {f['format_id'] for f in self.recommendation.formats} if self.recommendation else set()
+        for row, f in zip(self.formats_table.rows, self.formats):
+            row.selected = f.get('format_id') in recommended
+        if self.recommendation:
+            self.recommend_text.value = f"Recommended: {self.recommendation.describe()}"
+        else:
+            self.recommend_text.value = "No format matches this rule"
+        self.recommend_btn.disabled = self.recommendation is None
+        self.page.update()
 
     def _select_format(self, index):
         """Handle format selection from the table"""
         self.selected_format_index = index
-        self.update_status(f"Selected format ID: {self.formats[index].get('format_id')}")
+        fmt = self.formats[index]
+        selector = selector_for(fmt, self.formats)
+        if selector != fmt.get('format_id'):
+            self.update_status(f"Selected format ID: {fmt.get('format_id')} (video only, audio {selector.split('+')[1]} will be merged)")
+        else:
+            self.update_status(f"Selected format ID: {fmt.get('format_id')}")
     
     def download_selected(self, e=None):
-        """Download the format chosen by the user"""
+        """Queue the format chosen by the user for download"""
         if self.selected_format_index is None:
             self.update_status("Please select a format to download.")
             return
         
         fmt = self.formats[self.selected_format_index]
-        url = self.url_entry.value.strip()
+        try:
+            fragments = max(1, int(self.fragments_field.value or 1))
+        except ValueError:
+            self.update_status("Fragments must be a whole number")
+            return
         
-        thread = threading.Thread(target=self._download_thread, args=(url, fmt))
+        self._queue_youtube(selector_for(fmt, self.formats), fragments=fragments)
+    
+    def download_recommended(self, e=None):
+        """Queue the format recommended for the current rule"""
+        if self.recommendation is None:
+            self.update_status("Fetch formats first; no recommendation available.")
+            return
+        try:
+            fragments = max(1, int(self.fragments_field.value or 1))
+        except ValueError:
+            self.update_status("Fragments must be a whole number")
+            return
+        self._queue_youtube(self.recommendation.selector, fragments=fragments,
+                            container=self.recommendation.container)
+    
+    def _queue_youtube(self, format_selector, fragments=1, container=None):
+        """Submit the URL in the YouTube tab with the given format"""
+        options = {'concurrent_fragments': fragments}
+        if container:
+            options['merge_output_format'] = container
+        if self.extract_audio_dropdown.value:
+            options['extract_audio'] = self.extract_audio_dropdown.value
+        if self.convert_dropdown.value:
+            mode, target = self.convert_dropdown.value.split(":")
+            options[mode] = target
+        if self.thumbnail_switch.value:
+            options['embed_thumbnail'] = True
+        job = self.engine.submit(
+            self.url_entry.value.strip(),
+            format_selector,
+            platform='YouTube',
+            output_dir=self.download_path.value,
+            # The label is shortened for display
+            title=(self.current_info or {}).get('title') or self.video_title.value,
+            priority=self.priority_dropdown.value,
+            options=options
+        )
+        if job.state == QUEUED:
+            self.update_status(f"Queued: {job.title} ({format_selector})")
+    
+    def start_batch(self, e=None):
+        """Expand the batch sources and queue every video they contain"""
+        sources = parse_url_list(self.batch_urls.value or "")
+        path = (self.batch_file.value or "").strip()
+        if path:
+            try:
+                sources.extend(read_url_file(path))
+            except OSError as ex:
+                self.update_status(f"Cannot read URL list: {ex}")
+                return
+        if not sources:
+            self.update_status("Please enter at least one URL or a URL list file")
+            return
+        try:
+            pool_size = int(self.batch_pool_size.value)
+        except ValueError:
+            self.update_status("Parallel lookups must be a whole number")
+            return
+        
+        self.batch_btn.disabled = True
+        self.batch_progress.value = None
+        self.batch_status.value = f"Expanding {len(sources)} sources..."
+        self.page.update()
+        
+        thread = threading.Thread(
+            target=self._batch_thread,
+            args=(sources, pool_size, self.batch_rule.value, self.download_path.value, self.priority_dropdown.value)
+        )
         thread.daemon = True
         thread.start()
     
-    def _download_thread(self, url, fmt):
-        """Threaded function for downloading YouTube video"""
-        self.page.run_thread(lambda: setattr(self.download_btn, 'disabled', True))
+    def _batch_thread(self, sources, pool_size, rule_name, output_dir, priority):
+        """Threaded function resolving a batch and submitting its jobs"""
+        counts = {'total': 0, 'done': 0, 'failed': 0, 'skipped': 0}
+        lock = threading.Lock()
+        
+        def on_expanded(total):
+            counts['total'] = total
+            self.page.run_thread(self._update_batch_status, dict(counts))
+        
+        def on_item(item, job):
+            with lock:
+                counts['done'] += 1
+                if item.error:
+                    counts['failed'] += 1
+                elif job is not None and job.options.get('duplicate_of'):
+                    counts['skipped'] += 1
+                snapshot = dict(counts)
+            self.page.run_thread(self._update_batch_status, snapshot)
+        
         try:
-            download_dir = self.download_path.value
-            os.makedirs(download_dir, exist_ok=True)
-            
-            format_id = fmt.get('format_id')
-            
-            ydl_opts = {
-                'format': format_id,
-                'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'),
-                'merge_output_format': 'mp4',
-                'progress_hooks': [self.ytdlp_progress_hook],
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                title = info.get('title', 'Unknown Title')
-                self.page.run_thread(self.update_status, "Download completed!")
-                # FIX 3: Use 1.0 for progress bar completion
-                self.page.run_thread(lambda: setattr(self.progress_bar, 'value', 1.0))
-                self.page.run_thread(self.add_to_history, url, title, 'YouTube')
-                
+            self.engine.run_batch(
+                sources,
+                rule_name,
+                pool_size=pool_size,
+                output_dir=output_dir,
+                priority=priority,
+                on_expanded=on_expanded,
+                on_item=on_item
+            )
+            queued = counts['done'] - counts['failed'] - counts['skipped']
+            self.page.run_thread(self.update_status, f"Batch queued: {queued} videos, "
+                                 f"{counts['skipped']} already downloaded, {counts['failed']} failed")
         except Exception as e:
-            self.page.run_thread(self.update_status, f"Download failed: {e}")
+            self.page.run_thread(self.update_status, f"Batch failed: {e}")
         finally:
-            self.is_downloading = False
-            self.page.run_thread(lambda: setattr(self.download_btn, 'disabled', False))
+            self.page.run_thread(lambda: setattr(self.batch_btn, 'disabled', False))
             self.page.run_thread(self.page.update)
     
-    def ytdlp_progress_hook(self, d):
-        """Progress hook for yt-dlp to update the progress bar"""
-        if d['status'] == 'downloading':
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            if total_bytes:
-                percent = d['downloaded_bytes'] / total_bytes
-                speed = d.get('speed')
+    def _startup_thread(self):
+        """Background part of startup: engine, history, then yt-dlp warm-up"""
+        self.start_engine()
+        self.startup_timer.mark("engine_started")
+        self.page.run_thread(self._show_history)
+        self.page.run_thread(self.refresh_subscription_list)
+        try:
+            self.engine.warm_up()
+        except Exception as e:
+            print(f"yt-dlp warm-up failed: {e}")
+        self.startup_timer.mark("yt_dlp_ready")
+        try:
+            self.engine.scan_downloads()
+        except Exception as e:
+            print(f"Scanning download folder failed: {e}")
+        self.startup_timer.mark("downloads_indexed")
+        # Polls match videos against the index, so they start once it is filled
+        self.subscription_poller.start()
+        try:
+            self.build_history_index()
+        except Exception as e:
+            print(f"Building the history search index failed: {e}")
+        self.startup_timer.mark("history_indexed")
+        # The report must include the "history" mark taken on the UI thread
+        self.history_shown.wait(HISTORY_MARK_TIMEOUT)
+        self.engine.telemetry.record_startup(self.startup_timer.report())
+        self.startup_done.set()
+    
+    def _show_history(self):
+        """Startup: load the first history page and mark when it is on screen"""
+        try:
+            self.refresh_history_list()
+        finally:
+            self.startup_timer.mark("history")
+            self.history_shown.set()
+    
+    def start_engine(self):
+        """Migrate legacy history and requeue downloads left unfinished by the last session"""
+        try:
+            jobs = self.engine.start(resume=True)
+        except Exception as e:
+            self.page.run_thread(self.update_status, f"Failed to resume unfinished downloads: {e}")
+            return
+        if jobs:
+            self.page.run_thread(self.update_status, f"Resuming {len(jobs)} unfinished downloads from the last session")
+    
+    def add_subscription(self, e=None):
+        """Save the channel or playlist and check it for new videos"""
+        url = (self.sub_url.value or "").strip()
+        if not url:
+            self.update_status("Please enter a channel or playlist URL")
+            return
+        try:
+            minutes = int(self.sub_interval.value)
+        except ValueError:
+            self.update_status("Check interval must be a whole number of minutes")
+            return
+        if minutes < 1:
+            self.update_status("Check interval must be at least 1 minute")
+            return
+        self.subscription_poller.store.add(url, self.sub_rule.value, output_dir=self.download_path.value,
+                                           interval=minutes * 60, incremental=self.sub_incremental.value)
+        self.sub_url.value = ""
+        self.refresh_subscription_list()
+        # New subscriptions are due at once
+        self.subscription_poller.wake()
+        self.update_status(f"Subscribed to {url}; checking for videos...")
+    
+    def remove_subscription(self, subscription_id):
+        self.subscription_poller.store.remove(subscription_id)
+        self.refresh_subscription_list()
+        self.update_status("Subscription removed")
+    
+    def check_subscription(self, subscription_id):
+        """Poll one subscription now, on a background thread"""
+        subscription = self.subscription_poller.store.get(subscription_id)
+        if subscription is None:
+            return
+        self.update_status(f"Checking {subscription['title'] or subscription['url']}...")
+        thread = threading.Thread(target=self.subscription_poller.poll, args=(subscription,))
+        thread.daemon = True
+        thread.start()
+    
+    def check_all_subscriptions(self, e=None):
+        """Poll every subscription now, on a background thread"""
+        subscriptions = self.subscription_poller.store.all()
+        if not subscriptions:
+            self.update_status("No subscriptions yet")
+            return
+        self.update_status(f"Checking {len(subscriptions)} subscriptions...")
+        
+        def poll_all():
+            for subscription in subscriptions:
+                self.subscription_poller.poll(subscription)
+        thread = threading.Thread(target=poll_all)
+        thread.daemon = True
+        thread.start()
+    
+    def apply_watch_dir(self, e=None):
+        """Use the watch folder from the subscriptions tab"""
+        path = (self.watch_dir_field.value or "").strip()
+        if path == (self.engine.config.watch_dir or ""):
+            return
+        if path and not os.path.isdir(path):
+            self.update_status(f"Watch folder not found: {path}")
+            return
+        self.engine.config.watch_dir = path or None
+        self.subscription_poller.wake()
+        self.update_status(f"Watching {path} for URL lists" if path else "Watch folder disabled")
+    
+    def apply_watch_format(self, e=None):
+        """Use the format rule from the subscriptions tab for dropped URL lists"""
+        self.engine.config.watch_format = self.watch_rule.value
+    
+    def _on_subscription_polled(self, name, jobs, error):
+        """SubscriptionPoller callback; runs on the poller thread"""
+        if error is not None:
+            message = f"Checking {name} failed: {error}"
+        elif jobs:
+            message = f"{name}: queued {len(jobs)} new videos"
+        else:
+            message = f"{name}: no new videos"
+        self.page.run_thread(self.update_status, message)
+        self.page.run_thread(self.refresh_subscription_list)
+    
+    def refresh_subscription_list(self, e=None):
+        """Refresh the subscriptions table UI"""
+        self.sub_table.rows.clear()
+        for subscription in self.subscription_poller.store.all():
+            name = subscription['title'] or subscription['url']
+            checked = subscription['last_checked']
+            self.sub_table.rows.append(
+                ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(name[:40] + "..." if len(name) > 40 else name, tooltip=subscription['url'])),
+                        ft.DataCell(ft.Text(f"{subscription['interval'] // 60} min")),
+                        ft.DataCell(ft.Text(time.strftime("%Y-%m-%d %H:%M", time.localtime(checked)) if checked else "Never")),
+                        ft.DataCell(ft.Text(f"Error: {subscription['last_error'][:30]}" if subscription['last_error'] else "OK")),
+                        ft.DataCell(
+                            ft.Row(
+                                controls=[
+                                    ft.IconButton(icon="REFRESH", tooltip="Check now",
+                                                  on_click=lambda e, sub_id=subscription['id']: self.check_subscription(sub_id)),
+                                    ft.IconButton(icon="DELETE", tooltip="Unsubscribe",
+                                                  on_click=lambda e, sub_id=subscription['id']: self.remove_subscription(sub_id)),
+                                ]
+                            )
+                        ),
+                    ]
+                )
+            )
+        self.page.update()
+    
+    def _update_batch_status(self, counts):
+        """Show how many batch items have been resolved so far"""
+        total = counts['total']
+        self.batch_progress.value = counts['done'] / total if total else None
+        self.batch_status.value = f"Resolved {counts['done']} of {total} videos ({counts['failed']} failed)"
+        self.page.update()
+    
+    def _on_progress_tick(self, changed):
+        """Ticker callback; schedules one batched UI flush per tick"""
+        self.page.run_thread(self._flush_progress, changed)
+    
+    def _flush_progress(self, changed):
+        """Apply all progress changes since the last tick with a single update"""
+        for job_id, stats in changed.items():
+            cell = self._queue_progress_cells.get(job_id)
+            if cell is not None:
+                cell.value = f"{int(stats.fraction * 100)}%"
+        
+        # The main progress bar shows the aggregate over running downloads
+        jobs = self.download_queue.jobs()
+        active = [job.stats for job in jobs if job.started is not None and not job.is_finished]
+        processing = sum(1 for job in jobs if job.state == PROCESSING)
+        if active:
+            downloading = [s for s in active if s.status == 'downloading']
+            total = sum(s.total or 0 for s in downloading)
+            done = sum(s.downloaded for s in downloading if s.total)
+            speed = sum(s.speed or 0 for s in downloading)
+            if downloading:
+                if total:
+                    self.progress_bar.value = done / total
                 speed_str = f"{speed / (1024*1024):.1f} MB/s" if speed else ""
-                status_text = f"Downloading... {int(percent*100)}% ({speed_str})"
-                self.page.run_thread(lambda: setattr(self.progress_bar, 'value', percent))
-                self.page.run_thread(lambda: setattr(self.progress_text, 'value', status_text))
-                self.page.run_thread(self.page.update)
-        elif d['status'] == 'finished':
-            self.page.run_thread(lambda: setattr(self.progress_text, 'value', "Processing... please wait."))
-            self.page.run_thread(self.page.update)
+                jobs_str = f"{len(downloading)} jobs, " if len(downloading) > 1 else ""
+                processing_str = f", {processing} processing" if processing else ""
+                percent = int(done / total * 100) if total else 0
+                self.progress_text.value = f"Downloading... {percent}% ({jobs_str}{speed_str}{processing_str})"
+            elif processing:
+                self.progress_text.value = f"Processing {processing} download{'s' if processing > 1 else ''}..."
+            else:
+                self.progress_text.value = "Processing... please wait."
+        self.page.update()
 
     def download_instagram(self, e=None):
-        """Download an Instagram video"""
+        """Queue an Instagram video for download"""
         url = self.insta_entry.value.strip()
         if not url:
             self.update_status("Please enter an Instagram URL")
             return
         
-        self.update_status("Starting Instagram download...")
-        self.insta_download_btn.disabled = True
+        job = self.engine.submit(url, platform='Instagram', output_dir=self.download_path.value)
+        if job.state == QUEUED:
+            self.update_status("Instagram download queued...")
+    
+    def start_instagram_bulk(self, e=None):
+        """Expand Instagram profiles and queue every post, carousel and reel"""
+        sources = parse_url_list(self.insta_bulk_urls.value or "")
+        if not sources:
+            self.update_status("Please enter at least one Instagram URL")
+            return
+        self.insta_bulk_btn.disabled = True
+        self.insta_bulk_status.value = f"Expanding {len(sources)} sources..."
         self.page.update()
         
-        thread = threading.Thread(target=self._download_instagram_thread, args=(url,))
+        thread = threading.Thread(
+            target=self._instagram_bulk_thread,
+            args=(sources, self.download_path.value, self.priority_dropdown.value)
+        )
         thread.daemon = True
         thread.start()
     
-    def _download_instagram_thread(self, url):
-        """Threaded function for downloading from Instagram"""
+    def _instagram_bulk_thread(self, sources, output_dir, priority):
+        """Threaded function resolving Instagram sources and submitting their jobs"""
+        counts = {'total': 0, 'done': 0, 'failed': 0}
+        lock = threading.Lock()
+        
+        def show(counts):
+            self.insta_bulk_status.value = (f"Resolved {counts['done']} of {counts['total']} posts "
+                                            f"({counts['failed']} failed)")
+            self.page.update()
+        
+        def on_expanded(total):
+            counts['total'] = total
+            self.page.run_thread(show, dict(counts))
+        
+        def on_item(item, job):
+            with lock:
+                counts['done'] += 1
+                if item.error:
+                    counts['failed'] += 1
+                snapshot = dict(counts)
+            self.page.run_thread(show, snapshot)
+        
         try:
-            download_dir = self.download_path.value
-            os.makedirs(download_dir, exist_ok=True)
-            
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'),
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                title = info.get('title', 'Unknown Instagram Video')
-                self.page.run_thread(self.update_status, "Instagram download completed!")
-                self.page.run_thread(self.add_to_history, url, title, 'Instagram')
-                
+            jobs = self.engine.run_batch(sources, pool_size=INSTAGRAM_POOL_SIZE, output_dir=output_dir,
+                                         priority=priority, on_expanded=on_expanded, on_item=on_item,
+                                         platform='Instagram')
+            skipped = sum(1 for job in jobs if job.options.get('duplicate_of'))
+            self.page.run_thread(self.update_status, f"Instagram bulk: {len(jobs) - skipped} downloads queued, "
+                                 f"{skipped} already downloaded, {counts['failed']} failed")
         except Exception as e:
-            self.page.run_thread(self.update_status, f"Instagram download failed: {e}")
+            self.page.run_thread(self.update_status, f"Instagram bulk failed: {e}")
         finally:
-            self.page.run_thread(lambda: setattr(self.insta_download_btn, 'disabled', False))
+            self.page.run_thread(lambda: setattr(self.insta_bulk_btn, 'disabled', False))
             self.page.run_thread(self.page.update)
     
-    def add_to_history(self, url, title, platform):
-        """Add a downloaded item to the history list and save it"""
-        history_entry = {
-            'url': url,
-            'title': title,
-            'platform': platform,
-            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.history.insert(0, history_entry) # Add to the beginning
-        self.save_history()
-        self.refresh_history_list()
+    def _on_engine_event(self, event, payload):
+        """Engine listener; runs on worker threads and marshals work onto the UI thread"""
+        if event == 'history':
+            self.page.run_thread(self.add_to_history, payload)
+        elif event == 'job':
+            job = payload
+            if job.state == RUNNING:
+                self.progress_ticker.track(job.id, job.stats)
+            elif job.is_finished:
+                self.progress_ticker.untrack(job.id)
+                self.page.run_thread(self._report_job_result, job)
+            self.page.run_thread(self.update_queue_row, job)
     
-    def load_history(self):
-        """Load download history from a JSON file"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    self.history = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                self.history = []
+    def _report_job_result(self, job):
+        """Show the outcome of a finished job in the status bar"""
+        label = "Instagram download" if job.platform == 'Instagram' else "Download"
+        if job.state == COMPLETED and job.options.get('duplicate_of'):
+            self.update_status(f"Already downloaded, linked from: {job.options['duplicate_of']}")
+        elif job.state == COMPLETED:
+            self.progress_bar.value = 1.0
+            summary = describe_metrics(job.metrics.to_dict()) if job.metrics else ""
+            self.update_status(f"{label} completed!" + (f" ({summary})" if summary else ""))
+        elif job.state == CANCELLED:
+            self.update_status(f"{label} cancelled: {job.title}")
+        elif job.state == FAILED:
+            self.update_status(f"{label} failed: {job.error}")
+        elif job.state == SKIPPED:
+            self.update_status(f"Already downloaded, skipped: {job.options['duplicate_of']}")
+    
+    def _queue_cells(self, job):
+        """Cells of a job's queue row; registers its progress cell for the ticker"""
+        title = job.title or job.url
+        if job.state == PAUSED:
+            toggle = ft.IconButton(icon="PLAY_ARROW", tooltip="Resume",
+                                   on_click=lambda e, job_id=job.id: self.download_queue.resume(job_id))
+        else:
+            toggle = ft.IconButton(icon="PAUSE", tooltip="Pause", disabled=job.state not in (QUEUED, RUNNING),
+                                   on_click=lambda e, job_id=job.id: self.download_queue.pause(job_id))
+        
+        progress_cell = ft.Text(f"{int(job.progress * 100)}%")
+        self._queue_progress_cells[job.id] = progress_cell
+        return [
+            ft.DataCell(ft.Text(title[:40] + "..." if len(title) > 40 else title)),
+            ft.DataCell(ft.Text(job.platform)),
+            ft.DataCell(ft.Text(job.priority)),
+            ft.DataCell(ft.Text(job.error and f"{job.state}: {job.error[:30]}" or job.state)),
+            ft.DataCell(progress_cell),
+            ft.DataCell(
+                ft.Row(
+                    controls=[
+                        toggle,
+                        ft.IconButton(icon="CLOSE", tooltip="Cancel", disabled=job.is_finished,
+                                      on_click=lambda e, job_id=job.id: self.download_queue.cancel(job_id)),
+                    ]
+                )
+            ),
+        ]
+    
+    def _count_queue_job(self, job):
+        """Move a job to the summary bucket matching its current state"""
+        if job.is_finished:
+            bucket = None
+        elif job.state == PROCESSING:
+            bucket = 'processing'
         else:
-            self.history = []
+            bucket = 'active' if job.started is not None else 'waiting'
+        previous = self._queue_buckets.get(job.id)
+        if previous:
+            self._queue_counts[previous] -= 1
+        if bucket:
+            self._queue_counts[bucket] += 1
+        self._queue_buckets[job.id] = bucket
+        counts = self._queue_counts
+        self.queue_summary.value = (f"{counts['active']} active, {counts['processing']} processing, "
+                                    f"{counts['waiting']} waiting" if self._queue_rows else "No downloads queued")
     
-    def save_history(self):
-        """Save the current download history to a JSON file"""
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=4)
-        except IOError as e:
-            print(f"Failed to save history: {e}")
+    def update_queue_row(self, job):
+        """Redraw only the row of a job that changed state, adding it for a new job"""
+        row = self._queue_rows.get(job.id)
+        if row is None:
+            if self.download_queue.get(job.id) is None:
+                # Cleared from the queue before this event reached the UI
+                return
+            row = self._queue_rows[job.id] = ft.DataRow(cells=self._queue_cells(job))
+            self.queue_table.rows.append(row)
+            changed = self.queue_table
+        else:
+            row.cells = self._queue_cells(job)
+            changed = row
+        self._count_queue_job(job)
+        self.page.update(changed, self.queue_summary)
+    
+    def refresh_queue_list(self, e=None):
+        """Rebuild the queue table UI from the scheduler"""
+        self.queue_table.rows.clear()
+        self._queue_progress_cells.clear()
+        self._queue_rows.clear()
+        self._queue_buckets.clear()
+        self._queue_counts = dict.fromkeys(self._queue_counts, 0)
+        for job in self.download_queue.jobs():
+            row = self._queue_rows[job.id] = ft.DataRow(cells=self._queue_cells(job))
+            self.queue_table.rows.append(row)
+            self._count_queue_job(job)
+        if not self._queue_rows:
+            self.queue_summary.value = "No downloads queued"
+        self.page.update()
+    
+    def clear_finished_jobs(self, e=None):
+        """Remove finished jobs from the queue view"""
+        self.download_queue.clear_finished()
+        self.refresh_queue_list()
+    
+    def build_history_index(self):
+        """Load the whole history into the search index; blocking, run it on a background thread"""
+        index = HistoryIndex(self.history_store.recent())
+        with self._history_index_lock:
+            # Entries recorded while the index was being built
+            for entry in self._history_pending:
+                index.add(entry)
+            self._history_pending = []
+            self.history_index = index
+        if not self._history_default_view():
+            self.page.run_thread(self.refresh_history_list)
+    
+    def add_to_history(self, history_entry):
+        """Show a newly recorded history entry"""
+        with self._history_index_lock:
+            index = self.history_index
+            if index is None:
+                self._history_pending.append(history_entry)
+            else:
+                index.add(history_entry)
+        if index is not None:
+            if not self._history_default_view():
+                # The entry may belong anywhere in a filtered or sorted view
+                self.refresh_history_list()
+                return
+            self._history_results = index.search()
+        # Only the new row is sent to the client; the loaded page stays as is
+        self.history_table.rows.insert(0, self._history_row(history_entry))
+        self._history_loaded += 1
+        self._history_total += 1
+        self._update_history_count()
+        self.page.update()
+    
+    def _history_row(self, entry):
+        """Build the table row for one history entry"""
+        title = entry.get('title') or 'Unknown'
+        url = entry.get('url') or ''
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(title[:50] + "..." if len(title) > 50 else title, tooltip=title)),
+                ft.DataCell(ft.Text(url[:40] + "..." if len(url) > 40 else url, tooltip=url)),
+                ft.DataCell(ft.Text(entry.get('date') or '')),
+                ft.DataCell(ft.Text(entry.get('platform') or 'N/A')),
+            ]
+        )
+    
+    def _update_history_count(self):
+        self.history_count.value = f"Showing {self._history_loaded} of {self._history_total}"
+        self.history_more_btn.visible = self._history_loaded < self._history_total
+    
+    def _history_filters(self):
+        """(query, platform, start, end) from the history tab's filter controls"""
+        platform = self.history_platform.value
+        return (
+            (self.history_search.value or "").strip(),
+            platform if platform and platform != "All" else None,
+            (self.history_from.value or "").strip() or None,
+            (self.history_to.value or "").strip() or None,
+        )
+    
+    def _history_sort(self):
+        """(column, descending) of the history table"""
+        return SORT_COLUMNS[self.history_table.sort_column_index], not self.history_table.sort_ascending
+    
+    def _history_default_view(self):
+        """Whether the table shows the whole history newest first"""
+        return self._history_filters() == ("", None, None, None) and self._history_sort() == ('date', True)
+    
+    def search_history(self, e=None):
+        """Apply the search box, platform and date filters to the history table"""
+        for field in (self.history_from, self.history_to):
+            if field.value and not _DATE_FILTER_RE.match(field.value.strip()):
+                self.update_status("Dates must look like 2024, 2024-05 or 2024-05-31")
+                return
+        if self.history_index is None and not self._history_default_view():
+            self.update_status("History search is still loading...")
+            return
+        self.refresh_history_list()
+    
+    def sort_history(self, e):
+        """Sort the history table by the clicked column"""
+        self.history_table.sort_column_index = e.column_index
+        self.history_table.sort_ascending = e.ascending
+        self.search_history()
     
     def refresh_history_list(self, e=None):
-        """Refresh the history table UI"""
+        """Reload the history table from its first page"""
         self.history_table.rows.clear()
-        for entry in self.history:
-            title = entry.get('title', 'Unknown')
-            url = entry.get('url', '')
-            
-            self.history_table.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(title[:50] + "..." if len(title) > 50 else title)),
-                        ft.DataCell(ft.Text(url[:40] + "..." if len(url) > 40 else url)),
-                        ft.DataCell(ft.Text(entry.get('date', ''))),
-                        ft.DataCell(ft.Text(entry.get('platform', 'N/A'))),
-                    ]
-                )
-            )
-        self.page.update()
+        self._history_loaded = 0
+        if self.history_index is not None:
+            query, platform, start, end = self._history_filters()
+            sort, descending = self._history_sort()
+            self._history_results = self.history_index.search(query, platform, start, end, sort, descending)
+            self._history_total = len(self._history_results)
+        else:
+            self._history_results = None
+            self._history_total = self.history_store.count()
+        self.load_more_history()
+    
+    def load_more_history(self, e=None):
+        """Append the next page of history rows to the table"""
+        if self._history_loading:
+            return
+        self._history_loading = True
+        try:
+            if self._history_results is not None:
+                entries = self._history_results[self._history_loaded:self._history_loaded + HISTORY_PAGE_SIZE]
+            else:
+                entries = self.history_store.recent(HISTORY_PAGE_SIZE, self._history_loaded)
+            self.history_table.rows.extend(self._history_row(entry) for entry in entries)
+            self._history_loaded += len(entries)
+            self._update_history_count()
+            self.page.update()
+        finally:
+            self._history_loading = False
     
+    def _on_history_scroll(self, e):
+        """Load the next page once the table is scrolled near its end"""
+        if self._history_loaded < self._history_total and e.pixels >= e.max_scroll_extent - 200:
+            self.load_more_history()
+    
+    def export_metrics(self, e=None):
+        """Write the per-download metrics of the history to a CSV file in the download folder"""
+        path = os.path.join(self.download_path.value, "video_downloader_metrics.csv")
+        try:
+            rows = self.history_store.with_metrics()
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                write_metrics_csv(rows, f)
+        except OSError as ex:
+            self.update_status(f"Failed to export metrics: {ex}")
+            return
+        self.update_status(f"Exported metrics of {len(rows)} downloads to {path}")
+
     def clear_history(self, e=None):
         """Clear all entries from the download history"""
-        if not self.history:
+        if not self.history_store.count():
             self.update_status("History is already empty.")
             return
             
-        self.history.clear()
-        self.save_history()
+        self.history_store.clear()
+        with self._history_index_lock:
+            if self.history_index is not None:
+                self.history_index.clear()
+            self._history_pending = []
         self.refresh_history_list()
         self.update_status("History cleared.")
 
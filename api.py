@@ -0,0 +1,315 @@
+"""Local HTTP/JSON job API on top of the download engine
+
+Endpoints (all JSON unless noted):
+
+    GET  /health                  liveness check
+    GET  /jobs                    every known job
+    GET  /jobs/<id>               one job
+    POST /jobs                    submit {"url": ...} or {"jobs": [{...}, ...]};
+                                  each job accepts url, format, output_dir (a folder
+                                  inside the download folder), priority,
+                                  concurrent_fragments, force (download even if
+                                  the video exists already) and the post-processing
+                                  options extract_audio, remux, transcode and
+                                  embed_thumbnail.
+                                  {"urls": [...], "format": ..., "expand": true}
+                                  expands playlists/channels through the batch pipeline
+    POST /jobs/<id>/pause|resume|cancel
+    GET  /events                  server-sent events: "job" on state changes and
+                                  "progress" with coalesced per-job progress
+    GET  /metrics                 Prometheus text format: queue state and per-phase
+                                  timing summaries of the jobs finished since start
+    GET  /metrics.csv             CSV of the per-job metrics stored with the history
+                                  (?limit=N for the newest N)
+"""
+import io
+import json
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from batch import DEFAULT_POOL_SIZE
+from engine import fragment_count
+from postprocess import POSTPROCESS_OPTIONS
+from progress import ProgressTicker
+from telemetry import PROMETHEUS_CONTENT_TYPE, write_metrics_csv
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8770
+
+# Progress events per second sent to each SSE client
+EVENT_RATE_HZ = 2
+HEARTBEAT_SECONDS = 15
+MAX_CLIENT_BACKLOG = 1000
+
+
+def _job_options(spec):
+    """Job options taken from a job spec or batch request"""
+    fragments = spec.get('concurrent_fragments')
+    options = {'concurrent_fragments': fragment_count(fragments) if fragments is not None else None}
+    options.update((name, spec[name]) for name in POSTPROCESS_OPTIONS if spec.get(name))
+    return options
+
+
+class JobAPIServer:
+    """Threaded HTTP server exposing an engine's queue
+
+    When ``token`` is set, every request must carry
+    ``Authorization: Bearer <token>``.
+    """
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+        self.engine = engine
+        self.token = token
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._ticker = ProgressTicker(self._broadcast_progress, rate_hz=EVENT_RATE_HZ)
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+        engine.add_listener(self._on_engine_event)
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def start(self):
+        """Serve requests on a background thread"""
+        self._ticker.start()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.engine.remove_listener(self._on_engine_event)
+        self._ticker.stop()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with self._clients_lock:
+            for client in self._clients:
+                client.put(None)
+
+    def submit(self, payload):
+        """Submit one job, a list of jobs or a batch; returns the queued jobs"""
+        if 'jobs' in payload:
+            specs = payload['jobs']
+        elif 'urls' in payload:
+            specs = [dict(payload, url=url) for url in payload['urls']]
+        else:
+            specs = [payload]
+        if not isinstance(specs, list) or not specs:
+            raise ValueError("No jobs given")
+        for spec in specs:
+            if not isinstance(spec, dict) or not spec.get('url'):
+                raise ValueError("Every job needs a url")
+            self._output_dir(spec)
+            _job_options(spec)
+
+        if payload.get('expand'):
+            self._output_dir(payload)
+            # Playlists and channels go through the parallel batch pipeline;
+            # jobs appear on /jobs and /events as they are resolved
+            threading.Thread(target=self._run_batch, args=(payload, specs), daemon=True).start()
+            return []
+
+        jobs = []
+        for spec in specs:
+            jobs.append(self.engine.submit(
+                spec['url'],
+                spec.get('format'),
+                output_dir=self._output_dir(spec),
+                priority=spec.get('priority', 'normal'),
+                options=_job_options(spec),
+                force=bool(spec.get('force')),
+            ))
+        return jobs
+
+    def _output_dir(self, spec):
+        """The spec's output_dir resolved inside the download folder; clients cannot write elsewhere"""
+        output_dir = spec.get('output_dir')
+        if not output_dir:
+            return None
+        root = os.path.realpath(self.engine.config.download_dir)
+        path = os.path.realpath(os.path.join(root, output_dir))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"output_dir must be inside {root}")
+        return path
+
+    def _run_batch(self, payload, specs):
+        try:
+            self.engine.run_batch(
+                [spec['url'] for spec in specs],
+                payload.get('format'),
+                pool_size=int(payload.get('pool_size', DEFAULT_POOL_SIZE)),
+                output_dir=self._output_dir(payload),
+                priority=payload.get('priority', 'normal'),
+                force=bool(payload.get('force')),
+                options=_job_options(payload),
+            )
+        except Exception as e:
+            print(f"API batch failed: {e}")
+
+    def add_client(self):
+        client = queue.Queue(maxsize=MAX_CLIENT_BACKLOG)
+        with self._clients_lock:
+            self._clients.append(client)
+        return client
+
+    def remove_client(self, client):
+        with self._clients_lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def _publish(self, event, data):
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait((event, data))
+            except queue.Full:
+                # A stalled client must not hold up the engine
+                pass
+
+    def _on_engine_event(self, event, payload):
+        if event != 'job':
+            return
+        job = payload
+        if job.started is not None and not job.is_finished:
+            self._ticker.track(job.id, job.stats)
+        elif job.is_finished:
+            self._ticker.untrack(job.id)
+        self._publish('job', job.to_dict())
+
+    def _broadcast_progress(self, changed):
+        progress = []
+        for job_id in changed:
+            job = self.engine.scheduler.get(job_id)
+            if job is not None:
+                progress.append(job.to_dict())
+        if progress:
+            self._publish('progress', progress)
+
+
+def _make_handler(server):
+    class JobAPIHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            self._send_text(status, json.dumps(payload), 'application/json')
+
+        def _send_text(self, status, text, content_type):
+            body = text.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self):
+            if not server.token:
+                return True
+            if self.headers.get('Authorization') == f"Bearer {server.token}":
+                return True
+            self._send_json(401, {'error': 'unauthorized'})
+            return False
+
+        def _parts(self):
+            return [part for part in self.path.split('?')[0].split('/') if part]
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            parts = self._parts()
+            if parts == ['health']:
+                self._send_json(200, {'status': 'ok'})
+            elif parts == ['jobs']:
+                self._send_json(200, {'jobs': [job.to_dict() for job in server.engine.scheduler.jobs()]})
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = server.engine.scheduler.get(parts[1])
+                if job is None:
+                    self._send_json(404, {'error': 'unknown job'})
+                else:
+                    self._send_json(200, job.to_dict())
+            elif parts == ['events']:
+                self._stream_events()
+            elif parts == ['metrics']:
+                engine = server.engine
+                self._send_text(200, engine.telemetry.prometheus_text(engine.scheduler.jobs()),
+                                PROMETHEUS_CONTENT_TYPE)
+            elif parts == ['metrics.csv']:
+                query = parse_qs(urlsplit(self.path).query)
+                try:
+                    limit = int(query.get('limit', ['-1'])[0])
+                except ValueError:
+                    self._send_json(400, {'error': 'limit must be a number'})
+                    return
+                out = io.StringIO()
+                write_metrics_csv(server.engine.history_store.with_metrics(limit), out)
+                self._send_text(200, out.getvalue(), 'text/csv; charset=utf-8')
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            parts = self._parts()
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except (ValueError, json.JSONDecodeError):
+                self._send_json(400, {'error': 'invalid JSON body'})
+                return
+
+            if parts == ['jobs']:
+                try:
+                    jobs = server.submit(payload)
+                except (ValueError, TypeError, AttributeError) as e:
+                    self._send_json(400, {'error': str(e)})
+                    return
+                self._send_json(202, {'jobs': [job.to_dict() for job in jobs]})
+            elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] in ('pause', 'resume', 'cancel'):
+                scheduler = server.engine.scheduler
+                if scheduler.get(parts[1]) is None:
+                    self._send_json(404, {'error': 'unknown job'})
+                    return
+                changed = getattr(scheduler, parts[2])(parts[1])
+                self._send_json(200 if changed else 409, scheduler.get(parts[1]).to_dict())
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def _stream_events(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            client = server.add_client()
+            try:
+                snapshot = [job.to_dict() for job in server.engine.scheduler.jobs()]
+                self._write_event('snapshot', snapshot)
+                while True:
+                    try:
+                        item = client.get(timeout=HEARTBEAT_SECONDS)
+                    except queue.Empty:
+                        self.wfile.write(b": keep-alive\n\n")
+                        self.wfile.flush()
+                        continue
+                    if item is None:
+                        break
+                    self._write_event(*item)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                server.remove_client(client)
+
+        def _write_event(self, event, data):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+    return JobAPIHandler
@@ -0,0 +1,77 @@
+import threading
+import time
+
+# Longest single pause inside a progress hook, so cancel and pause stay responsive
+MAX_SLEEP = 1.0
+
+
+class _JobWindow:
+    __slots__ = ('start', 'start_bytes', 'last_bytes')
+
+    def __init__(self, downloaded=0):
+        self.reset(downloaded)
+
+    def reset(self, downloaded):
+        self.start = time.monotonic()
+        self.start_bytes = downloaded
+        self.last_bytes = downloaded
+
+
+class BandwidthBudget:
+    """Global download rate shared equally by the active jobs
+
+    ``throttle`` is called from each job's progress hook with the job's
+    cumulative byte count and sleeps just long enough to keep that job at
+    its share. Shares are recomputed whenever a job registers or leaves
+    (a paused job leaves until it resumes),
+    and every job restarts its measurement window so a rebalance takes
+    effect immediately instead of paying off an old surplus or debt.
+    A rate of 0 disables shaping.
+    """
+
+    def __init__(self, rate=0):
+        self.rate = max(0, int(rate or 0))
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = max(0, int(rate or 0))
+            self._rebalance()
+
+    def register(self, job_id, downloaded=0):
+        """Give job_id a share; downloaded is its current byte count when it rejoins mid-file"""
+        with self._lock:
+            self._jobs[job_id] = _JobWindow(downloaded)
+            self._rebalance()
+
+    def unregister(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._rebalance()
+
+    def share(self):
+        """Bytes per second each active job may use; 0 means unlimited"""
+        if not self.rate:
+            return 0
+        return self.rate / max(1, len(self._jobs))
+
+    def _rebalance(self):
+        for window in self._jobs.values():
+            window.reset(window.last_bytes)
+
+    def throttle(self, job_id, downloaded):
+        """Sleep as needed so job_id stays within its share"""
+        with self._lock:
+            window = self._jobs.get(job_id)
+            share = self.share()
+            if window is None or not share:
+                return
+            if downloaded < window.last_bytes:
+                # A new file of the same job started (e.g. audio after video)
+                window.reset(downloaded)
+            window.last_bytes = downloaded
+            expected = (downloaded - window.start_bytes) / share
+            delay = expected - (time.monotonic() - window.start)
+        if delay > 0:
+            time.sleep(min(delay, MAX_SLEEP))
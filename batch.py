@@ -0,0 +1,146 @@
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metadata_cache import normalize_video_key
+
+DEFAULT_POOL_SIZE = 8
+
+
+def parse_url_list(text):
+    """Split pasted text into URLs, skipping blank lines and # comments"""
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        urls.extend(part for part in line.replace(',', ' ').split() if part)
+    return urls
+
+
+def read_url_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_url_list(f.read())
+
+
+class BatchItem:
+    """One video resolved from a batch source"""
+
+    def __init__(self, url, title=None, info=None, error=None):
+        self.url = url
+        self.title = title or url
+        self.info = info
+        self.error = error
+
+
+class BatchIngestor:
+    """Expands playlists/channels and resolves metadata with a bounded pool
+
+    Each pool thread keeps its own YoutubeDL instance, since one instance
+    must not be used from several threads at once. With ``ydl_pool`` the
+    threads borrow instances from that YDLPool instead, so they outlive
+    the batch and are shared with the rest of the engine.
+    """
+
+    def __init__(self, metadata_cache=None, pool_size=DEFAULT_POOL_SIZE, ydl_class=None, ydl_pool=None):
+        self.metadata_cache = metadata_cache
+        self.pool_size = max(1, int(pool_size))
+        self.ydl_pool = ydl_pool
+        if ydl_class is None and ydl_pool is None:
+            # Imported here so loading this module does not pull in yt-dlp
+            import yt_dlp
+            ydl_class = yt_dlp.YoutubeDL
+        self.ydl_class = ydl_class
+        self._local = threading.local()
+
+    @staticmethod
+    def _options(flat):
+        opts = {'quiet': True, 'no_warnings': True}
+        if flat:
+            opts['extract_flat'] = 'in_playlist'
+        return opts
+
+    def _ydl(self, flat=False):
+        """Context manager yielding a YoutubeDL for the calling thread"""
+        if self.ydl_pool is not None:
+            return self.ydl_pool.checkout(self._options(flat))
+        attr = 'flat_ydl' if flat else 'ydl'
+        ydl = getattr(self._local, attr, None)
+        if ydl is None:
+            ydl = self.ydl_class(self._options(flat))
+            setattr(self._local, attr, ydl)
+        return contextlib.nullcontext(ydl)
+
+    def expand(self, source):
+        """Return the video URLs behind a playlist, channel or single video URL"""
+        with self._ydl(flat=True) as ydl:
+            info = ydl.extract_info(source, download=False)
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                # A single video is fully extracted even in flat mode; keep it for resolve
+                url = info.get('webpage_url') or source
+                if self.metadata_cache is not None:
+                    self.metadata_cache.put(normalize_video_key(url), ydl.sanitize_info(info))
+                return [url]
+        urls = []
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            url = entry.get('url') or entry.get('webpage_url')
+            if entry.get('_type') == 'playlist' and url:
+                # Channel tabs (videos, shorts, ...) nest one more level
+                urls.extend(self.expand(url))
+            elif url:
+                urls.append(url)
+        return urls
+
+    def resolve(self, url):
+        """Full metadata for one video, served from the cache when possible"""
+        key = normalize_video_key(url)
+        if self.metadata_cache is not None:
+            info = self.metadata_cache.get(key)
+            if info is not None:
+                return info
+        with self._ydl() as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(key, info)
+        return info
+
+    def run(self, sources, on_expanded=None, on_item=None):
+        """Expand all sources, then resolve every video in parallel
+
+        ``on_expanded(total)`` is called once the work list is known and
+        ``on_item(item)`` once per resolved (or failed) video, both from
+        calling thread. Returns the list of BatchItems.
+        """
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            urls = []
+            seen = set()
+            futures = {pool.submit(self.expand, source): source for source in sources}
+            for future in as_completed(futures):
+                try:
+                    expanded = future.result()
+                except Exception as e:
+                    print(f"Failed to expand {futures[future]}: {e}")
+                    expanded = [futures[future]]
+                for url in expanded:
+                    key = normalize_video_key(url)
+                    if key not in seen:
+                        seen.add(key)
+                        urls.append(url)
+            if on_expanded:
+                on_expanded(len(urls))
+
+            items = []
+            futures = {pool.submit(self.resolve, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    info = future.result()
+                    item = BatchItem(url, info.get('title'), info=info)
+                except Exception as e:
+                    item = BatchItem(url, error=str(e))
+                items.append(item)
+                if on_item:
+                    on_item(item)
+            return items
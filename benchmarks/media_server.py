@@ -0,0 +1,197 @@
+"""Local HTTP server serving synthetic media for the benchmarks
+
+    GET /api/video/<id>?size=N&segments=N&formats=N
+                                  format list for the stub extractor: a progressive
+                                  file, DASH segments, an HLS playlist and N filler
+                                  formats, all pointing back at this server
+    GET /media/<bytes>            <bytes> of synthetic data; honours Range requests
+    GET /hls/<id>/index.m3u8?size=N&segments=N
+                                  HLS media playlist splitting size into segments
+"""
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Payloads repeat this block, so serving is bounded by the network stack, not by generating data
+_BLOCK = os.urandom(256 * 1024)
+
+DEFAULT_SIZE = 32 * 1024 * 1024
+DEFAULT_SEGMENTS = 32
+DEFAULT_FILLER_FORMATS = 24
+
+
+def _query_int(query, name, default):
+    try:
+        return max(1, int(query.get(name, [default])[0]))
+    except ValueError:
+        return default
+
+
+def _segment_sizes(size, segments):
+    base, extra = divmod(size, segments)
+    return [base + (1 if i < extra else 0) for i in range(segments)]
+
+
+class MediaServer:
+    """Threaded HTTP server on an ephemeral localhost port"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._httpd = ThreadingHTTPServer((host, port), _MediaHandler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd.media_server = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def video_info(self, video_id, size=DEFAULT_SIZE, segments=DEFAULT_SEGMENTS, fillers=DEFAULT_FILLER_FORMATS):
+        """The JSON document the stub extractor turns into an info dict"""
+        media = f"{self.url}/media"
+        formats = [{
+            'format_id': 'progressive',
+            'url': f"{media}/{size}?v={video_id}",
+            'ext': 'mp4',
+            'vcodec': 'avc1.64001F',
+            'acodec': 'mp4a.40.2',
+            'height': 720,
+            'tbr': 2500,
+            'filesize': size,
+        }, {
+            'format_id': 'dash',
+            'protocol': 'http_dash_segments',
+            'url': f"{media}/{size}",
+            'fragments': [
+                {'url': f"{media}/{seg}?v={video_id}&seg={i}"}
+                for i, seg in enumerate(_segment_sizes(size, segments))
+            ],
+            'ext': 'mp4',
+            'vcodec': 'avc1.64001F',
+            'acodec': 'mp4a.40.2',
+            'height': 720,
+            'tbr': 2500,
+            'filesize': size,
+        }, {
+            'format_id': 'hls',
+            'protocol': 'm3u8_native',
+            'url': f"{self.url}/hls/{video_id}/index.m3u8?size={size}&segments={segments}",
+            'ext': 'mp4',
+            'vcodec': 'avc1.64001F',
+            'acodec': 'mp4a.40.2',
+            'height': 720,
+            'tbr': 2500,
+        }]
+        # Fillers make format sorting and selection cost similar to a real site
+        heights = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+        codecs = ('avc1.4d401e', 'vp09.00.40.08', 'av01.0.08M.08')
+        for i in range(fillers):
+            formats.append({
+                'format_id': f"filler-{i}",
+                'url': f"{media}/{size}?v={video_id}&filler={i}",
+                'ext': 'webm' if i % 2 else 'mp4',
+                'vcodec': codecs[i % len(codecs)],
+                'acodec': 'none',
+                'height': heights[i % len(heights)],
+                'tbr': 100 + i * 50,
+                'filesize': size,
+            })
+        return {
+            'id': video_id,
+            'title': f"Benchmark {video_id}",
+            'duration': 600,
+            'formats': formats,
+        }
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.media_server
+        server.requests += 1
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+
+        if len(parts) == 3 and parts[:2] == ['api', 'video']:
+            info = server.video_info(
+                parts[2],
+                size=_query_int(query, 'size', DEFAULT_SIZE),
+                segments=_query_int(query, 'segments', DEFAULT_SEGMENTS),
+                fillers=_query_int(query, 'formats', DEFAULT_FILLER_FORMATS),
+            )
+            self._send(json.dumps(info).encode('utf-8'), 'application/json')
+        elif len(parts) == 2 and parts[0] == 'media' and parts[1].isdigit():
+            self._send_media(int(parts[1]))
+        elif len(parts) == 3 and parts[0] == 'hls' and parts[2] == 'index.m3u8':
+            size = _query_int(query, 'size', DEFAULT_SIZE)
+            segments = _query_int(query, 'segments', DEFAULT_SEGMENTS)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:10', '#EXT-X-MEDIA-SEQUENCE:0']
+            for i, seg in enumerate(_segment_sizes(size, segments)):
+                lines.append('#EXTINF:10.0,')
+                lines.append(f"{server.url}/media/{seg}?v={parts[1]}&seg={i}")
+            lines.append('#EXT-X-ENDLIST')
+            self._send(("\n".join(lines) + "\n").encode('utf-8'), 'application/vnd.apple.mpegurl')
+        else:
+            self._send(b'not found', 'text/plain', status=404)
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_media(self, size):
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range') or '')
+        if match and size:
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+            elif match.group(2):
+                start = max(0, size - int(match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        length = end - start + 1 if size else 0
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+        offset = start % len(_BLOCK)
+        view = memoryview(_BLOCK)
+        try:
+            while length > 0:
+                chunk = view[offset:offset + length]
+                self.wfile.write(chunk)
+                length -= len(chunk)
+                offset = 0
+        except (BrokenPipeError, ConnectionResetError):
+            pass
@@ -0,0 +1,460 @@
+"""Benchmarks for the download pipeline
+
+Runs entirely offline against a local media server and a stub yt-dlp
+extractor, and prints the results as JSON so runs can be compared:
+
+    python benchmarks/run.py                      # everything
+    python benchmarks/run.py --quick              # smaller sizes, for a smoke run
+    python benchmarks/run.py --only history ui -o results.json
+
+Benchmarks:
+
+    fetch_formats   metadata extraction latency, cold and from the metadata cache
+    single_job      throughput of one progressive, DASH and HLS download
+    parallel        aggregate throughput of N concurrent downloads
+    ui              progress hook cost, and GUI flush overhead while N downloads run
+    history         history save/load/migration time at 10k and 100k entries
+    startup         GUI cold start phases in fresh interpreters, and the yt-dlp
+                    import cost that startup defers to a background warm-up
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import yt_dlp
+
+from engine import DownloadEngine, EngineConfig
+from history_index import HistoryIndex
+from history_store import DATE_FORMAT, HistoryStore
+from media_server import MediaServer
+from scheduler import COMPLETED, DownloadJob
+from stub_extractor import BenchIE, BenchYDL, bench_url
+from telemetry import JobMetrics
+
+MB = 1024 * 1024
+
+# Longest a History tab search may take, in milliseconds
+SEARCH_TARGET_MS = 50
+
+# Workload sizes; "quick" keeps a smoke run to a few seconds
+PROFILES = {
+    'full': {
+        'fetch_iterations': 30,
+        'media_size': 64 * MB,
+        'segments': 64,
+        'parallel': 4,
+        'parallel_size': 32 * MB,
+        'ui_size': 128 * MB,
+        'hook_calls': 200000,
+        'history_sizes': (10000, 100000),
+        'startup_runs': 5,
+    },
+    'quick': {
+        'fetch_iterations': 5,
+        'media_size': 8 * MB,
+        'segments': 16,
+        'parallel': 4,
+        'parallel_size': 4 * MB,
+        'ui_size': 16 * MB,
+        'hook_calls': 20000,
+        'history_sizes': (1000, 10000),
+        'startup_runs': 2,
+    },
+}
+
+
+def _stats_ms(samples):
+    """Summary of a list of durations in seconds, in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def _make_engine(workdir, name, **config):
+    """Engine with its own data and download folders that never skips duplicates"""
+    root = os.path.join(workdir, name)
+    config.setdefault('platform_limits', {'YouTube': 0, 'Instagram': 0})
+    return DownloadEngine(EngineConfig(
+        download_dir=os.path.join(root, 'downloads'),
+        data_dir=os.path.join(root, 'data'),
+        duplicate_policy='download',
+        **config
+    ), ydl_class=BenchYDL)
+
+
+def _run_jobs(engine, urls, format_id, **submit_args):
+    """Submit urls, wait for all of them and return (jobs, wall seconds)"""
+    start = time.perf_counter()
+    jobs = [engine.submit(url, format_id, **submit_args) for url in urls]
+    engine.wait()
+    elapsed = time.perf_counter() - start
+    failed = [f"{job.url}: {job.error}" for job in jobs if job.state != COMPLETED]
+    if failed:
+        raise RuntimeError(f"{len(failed)} benchmark downloads failed: {failed[0]}")
+    return jobs, elapsed
+
+
+def _throughput(jobs, elapsed):
+    total = sum(job.metrics.downloaded_bytes for job in jobs)
+    return {
+        'jobs': len(jobs),
+        'bytes': total,
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(total / MB / elapsed, 2),
+    }
+
+
+def bench_fetch_formats(server, workdir, profile):
+    engine = _make_engine(workdir, 'fetch')
+    ids = [f"fetch{i}" for i in range(profile['fetch_iterations'])]
+    cold, warm = [], []
+    for video_id in ids:
+        start = time.perf_counter()
+        engine.fetch_info(bench_url(video_id))
+        cold.append(time.perf_counter() - start)
+    for video_id in ids:
+        start = time.perf_counter()
+        _info, from_cache = engine.fetch_info(bench_url(video_id))
+        warm.append(time.perf_counter() - start)
+        assert from_cache
+    engine.shutdown()
+    return {'cold': _stats_ms(cold), 'cached': _stats_ms(warm)}
+
+
+def bench_single_job(server, workdir, profile):
+    engine = _make_engine(workdir, 'single')
+    size, segments = profile['media_size'], profile['segments']
+    results = {}
+    cases = (
+        ('progressive', 'progressive', 1),
+        ('dash', 'dash', 1),
+        ('dash_4_fragments', 'dash', 4),
+        ('hls', 'hls', 1),
+        ('hls_4_fragments', 'hls', 4),
+    )
+    for name, format_id, fragments in cases:
+        url = bench_url(f"single-{name}", size=size, segments=segments)
+        jobs, elapsed = _run_jobs(engine, [url], format_id, options={'concurrent_fragments': fragments})
+        result = _throughput(jobs, elapsed)
+        metrics = result['metrics'] = jobs[0].metrics.to_dict()
+        if metrics['avg_speed'] and metrics['peak_speed'] and metrics['avg_speed'] > metrics['peak_speed']:
+            raise RuntimeError(f"{name}: average speed {metrics['avg_speed']} above peak {metrics['peak_speed']}")
+        results[name] = result
+    engine.shutdown()
+    return results
+
+
+def bench_parallel(server, workdir, profile):
+    n = profile['parallel']
+    engine = _make_engine(workdir, 'parallel', max_parallel=n)
+    size, segments = profile['parallel_size'], profile['segments']
+    results = {}
+    for format_id in ('progressive', 'dash'):
+        urls = [bench_url(f"parallel-{format_id}-{i}", size=size, segments=segments) for i in range(n)]
+        results[format_id] = _throughput(*_run_jobs(engine, urls, format_id))
+    engine.shutdown()
+    return results
+
+
+def _hook_cost(engine, calls):
+    """Mean cost of one progress hook call without rate limiting, in microseconds"""
+    job = DownloadJob('bench://video/hooks', 'YouTube')
+    job.metrics = JobMetrics()
+    d = {'status': 'downloading', 'downloaded_bytes': 0, 'total_bytes': calls * 1024,
+         'speed': 50 * MB, 'eta': 1}
+    start = time.perf_counter()
+    for i in range(calls):
+        d['downloaded_bytes'] = i * 1024
+        engine.progress_hook(d, job)
+    return round((time.perf_counter() - start) / calls * 1e6, 3)
+
+
+class _StubPage:
+    """Stands in for ft.Page; counts updates instead of sending them to a client"""
+
+    def __init__(self):
+        self.updates = 0
+        self.controls = []
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def run_thread(self, handler, *args, **kwargs):
+        handler(*args, **kwargs)
+
+
+def bench_ui(server, workdir, profile):
+    """Progress hook cost and the GUI's flush overhead during parallel downloads"""
+    n = profile['parallel']
+    size, segments = profile['ui_size'], profile['segments']
+    results = {}
+
+    engine = _make_engine(workdir, 'ui-headless', max_parallel=n)
+    results['hook_us_per_call'] = _hook_cost(engine, profile['hook_calls'])
+    urls = [bench_url(f"ui-headless-{i}", size=size, segments=segments) for i in range(n)]
+    results['headless'] = _throughput(*_run_jobs(engine, urls, 'progressive'))
+    engine.shutdown()
+
+    try:
+        import Downloader
+    except ImportError as e:
+        results['gui'] = {'skipped': f"flet not available: {e}"}
+        return results
+
+    # The GUI builds its engine from the home directory
+    home = os.environ.get('HOME')
+    os.environ['HOME'] = os.path.join(workdir, 'ui-home')
+    os.makedirs(os.environ['HOME'], exist_ok=True)
+    try:
+        page = _StubPage()
+        app = Downloader.FletVideoDownloader(page)
+    finally:
+        if home is None:
+            os.environ.pop('HOME', None)
+        else:
+            os.environ['HOME'] = home
+    app.startup_done.wait(60)
+    app.engine.ydl_class = BenchYDL
+    app.engine.config.duplicate_policy = 'download'
+    app.download_queue.set_limits(max_parallel=n, platform_limits={'YouTube': 0})
+
+    flushes = []
+    flush = app._flush_progress
+
+    def timed_flush(changed):
+        start = time.perf_counter()
+        flush(changed)
+        flushes.append(time.perf_counter() - start)
+    app._flush_progress = timed_flush
+
+    urls = [bench_url(f"ui-gui-{i}", size=size, segments=segments) for i in range(n)]
+    updates_before = page.updates
+    jobs, elapsed = _run_jobs(app.engine, urls, 'progressive', output_dir=app.engine.config.download_dir)
+    app.progress_ticker.stop()
+    app.engine.shutdown()
+
+    gui = _throughput(jobs, elapsed)
+    gui['hook_calls'] = sum(job.stats.version for job in jobs)
+    gui['page_updates'] = page.updates - updates_before
+    gui['flushes'] = _stats_ms(flushes) if flushes else {'n': 0}
+    gui['flush_share'] = round(sum(flushes) / elapsed, 4)
+    gui['slowdown_vs_headless'] = round(elapsed / results['headless']['seconds'], 3)
+    results['gui'] = gui
+    return results
+
+
+def bench_history(server, workdir, profile):
+    results = {}
+    for size in profile['history_sizes']:
+        root = os.path.join(workdir, f"history-{size}")
+        os.makedirs(root)
+        store = HistoryStore(os.path.join(root, 'history.db'))
+        now = datetime.now()
+        entries = [(f"https://www.youtube.com/watch?v=bench{i:07d}", f"Benchmark video {i}", 'YouTube',
+                    now.strftime(DATE_FORMAT)) for i in range(size)]
+
+        start = time.perf_counter()
+        for url, title, platform_name, date in entries:
+            store.add(url, title, platform_name, date)
+        save = time.perf_counter() - start
+
+        add_samples = []
+        for i in range(100):
+            start = time.perf_counter()
+            store.add(f"https://www.youtube.com/watch?v=extra{i}", "Extra", 'YouTube')
+            add_samples.append(time.perf_counter() - start)
+
+        def timed(func, *args):
+            start = time.perf_counter()
+            func(*args)
+            return round((time.perf_counter() - start) * 1000, 3)
+
+        result = {
+            'save_total_s': round(save, 3),
+            'save_us_per_entry': round(save / size * 1e6, 2),
+            'add_at_size': _stats_ms(add_samples),
+            'count_ms': timed(store.count),
+            'first_page_ms': timed(store.recent, 100),
+            'middle_page_ms': timed(store.recent, 100, size // 2),
+            'load_all_ms': timed(store.recent),
+            'find_by_url_ms': timed(store.find_by_url, entries[size // 2][0]),
+        }
+
+        # The History tab's search index over the loaded entries
+        loaded = store.recent()
+        start = time.perf_counter()
+        index = HistoryIndex(loaded)
+        result['index_build_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        result['search_all_words_ms'] = timed(index.search, 'benchmark video')
+        result['search_one_ms'] = timed(index.search, f"bench{size // 2:07d}")
+        result['search_by_title_ms'] = timed(index.search, 'video', None, None, None, 'title', False)
+        result['search_date_range_ms'] = timed(index.search, '', None, now.strftime('%Y'), now.strftime('%Y-%m-%d'))
+        # The first keystrokes of a search, matching nearly every entry
+        result['search_one_letter_ms'] = timed(index.search, 'b')
+        result['search_two_letters_ms'] = timed(index.search, 'be')
+        result['search_by_url_ms'] = timed(index.search, 'video', None, None, None, 'url')
+        result['search_by_platform_ms'] = timed(index.search, 'video', None, None, None, 'platform')
+        slow = {name: ms for name, ms in result.items()
+                if name.startswith('search_') and ms > SEARCH_TARGET_MS}
+        if slow:
+            raise RuntimeError(f"History searches over {SEARCH_TARGET_MS} ms at {size} entries: {slow}")
+        index_samples = []
+        for i in range(100):
+            entry = {'id': -i - 1, 'url': f"https://www.youtube.com/watch?v=more{i}", 'title': "More",
+                     'platform': 'YouTube', 'date': now.strftime(DATE_FORMAT)}
+            start = time.perf_counter()
+            index.add(entry)
+            index_samples.append(time.perf_counter() - start)
+        result['index_add_at_size'] = _stats_ms(index_samples)
+        store.close()
+
+        # Legacy JSON history of the same size, imported into a fresh database
+        json_path = os.path.join(root, 'history.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump([{'url': u, 'title': t, 'platform': p, 'date': d} for u, t, p, d in reversed(entries)], f)
+        migrated = HistoryStore(os.path.join(root, 'migrated.db'))
+        start = time.perf_counter()
+        migrated.migrate_json(json_path)
+        result['migrate_json_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        migrated.close()
+        results[str(size)] = result
+    return results
+
+
+# Runs in a fresh interpreter and prints the GUI's startup report as JSON
+_STARTUP_SCRIPT = """
+import json, os, sys
+os.environ['HOME'] = sys.argv[2]
+sys.path.insert(0, sys.argv[1])
+import Downloader
+
+class Page:
+    controls = []
+    def add(self, *controls): self.controls.extend(controls)
+    def update(self, *controls): pass
+    def run_thread(self, handler, *args, **kwargs): handler(*args, **kwargs)
+
+app = Downloader.FletVideoDownloader(Page())
+app.startup_done.wait(60)
+print(json.dumps(app.startup_timer.report()))
+"""
+
+_IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import yt_dlp
+print(time.perf_counter() - start)
+"""
+
+
+def _fresh_python(script, *args):
+    result = subprocess.run([sys.executable, '-c', script, *args], capture_output=True, text=True,
+                            timeout=120, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def bench_startup(server, workdir, profile):
+    if importlib.util.find_spec('flet') is None:
+        return {'skipped': "flet not available"}
+    reports = []
+    for i in range(profile['startup_runs']):
+        home = os.path.join(workdir, f"startup-{i}")
+        os.makedirs(home)
+        reports.append(json.loads(_fresh_python(_STARTUP_SCRIPT, REPO_DIR, home)))
+    imports = [float(_fresh_python(_IMPORT_SCRIPT)) for _ in range(profile['startup_runs'])]
+    # Median seconds from the start of the Downloader import to each phase
+    phases = {name: round(statistics.median(r[name] for r in reports), 4) for name in reports[0]}
+    return {
+        'runs': len(reports),
+        'phases_s': phases,
+        'yt_dlp_import_s': round(statistics.median(imports), 4),
+    }
+
+
+BENCHMARKS = {
+    'fetch_formats': bench_fetch_formats,
+    'single_job': bench_single_job,
+    'parallel': bench_parallel,
+    'ui': bench_ui,
+    'history': bench_history,
+    'startup': bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download pipeline benchmarks")
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes for a fast smoke run")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument('-o', '--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--keep', action='store_true', help="Keep the temporary download folders")
+    args = parser.parse_args(argv)
+
+    profile_name = 'quick' if args.quick else 'full'
+    profile = PROFILES[profile_name]
+    server = MediaServer().start()
+    BenchIE.media_url = server.url
+    workdir = tempfile.mkdtemp(prefix='downloader-bench-')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'profile': profile_name,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'yt_dlp': yt_dlp.version.__version__,
+        },
+        'results': {},
+    }
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            start = time.perf_counter()
+            try:
+                # Keep stdout for the JSON report
+                with contextlib.redirect_stdout(sys.stderr):
+                    report['results'][name] = BENCHMARKS[name](server, workdir, profile)
+            except Exception as e:
+                report['results'][name] = {'error': str(e)}
+                print(f"{name} failed: {e}", file=sys.stderr)
+            print(f"{name} took {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        server.stop()
+        if args.keep:
+            print(f"Benchmark files kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if any('error' in result for result in report['results'].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
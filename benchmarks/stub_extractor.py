@@ -0,0 +1,45 @@
+"""Stub yt-dlp extractor backed by the benchmark media server
+
+URLs look like ``bench://video/<id>?size=N&segments=N&formats=N``; the
+query is passed to the media server's ``/api/video`` endpoint, so metadata
+extraction performs a real local HTTP request.
+"""
+from urllib.parse import urlsplit
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchIE(InfoExtractor):
+    IE_NAME = 'bench'
+    _VALID_URL = r'bench://video/(?P<id>[^/?#]+)'
+
+    # Base URL of the running MediaServer, set by the harness
+    media_url = None
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        query = urlsplit(url).query
+        return self._download_json(
+            f"{self.media_url}/api/video/{video_id}" + (f"?{query}" if query else ""),
+            video_id, note="Downloading benchmark metadata")
+
+
+class BenchYDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that knows the stub extractor and keeps the console quiet
+
+    Pass it as ``DownloadEngine(ydl_class=BenchYDL)``.
+    """
+
+    def __init__(self, params=None, auto_init=True):
+        params = dict(params or {}, quiet=True, no_warnings=True, noprogress=True)
+        super().__init__(params, auto_init=False)
+        self.add_info_extractor(BenchIE())
+        if auto_init:
+            self.add_default_info_extractors()
+
+
+def bench_url(video_id, size=None, segments=None, formats=None):
+    params = [f"{name}={value}" for name, value in
+              (('size', size), ('segments', segments), ('formats', formats)) if value]
+    return f"bench://video/{video_id}" + (f"?{'&'.join(params)}" if params else "")
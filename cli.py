@@ -0,0 +1,364 @@
+"""Headless command line interface and daemon for the video downloader
+
+Runs the same DownloadEngine as the desktop app without importing flet, so it
+works on servers without a display and in cron jobs:
+
+    python cli.py formats URL
+    python cli.py download URL [URL ...] [-f FORMAT] [-o DIR] [--batch FILE] [--force] [--scan]
+                           [--extract-audio CODEC] [--remux EXT] [--transcode EXT] [--embed-thumbnail]
+    python cli.py history [--limit N] [--platform NAME] [--search TEXT] [--since DATE] [--until DATE]
+                          [--sort COLUMN] [--ascending]
+    python cli.py metrics [--limit N] [-o FILE.csv]
+    python cli.py subscriptions add URL [-f FORMAT] [-o DIR] [--interval MIN] [--full]
+    python cli.py subscriptions list|poll [--scan]
+    python cli.py subscriptions remove ID
+    python cli.py daemon [--stdin] [--api-port PORT] [--subscriptions] [--watch DIR] [--watch-format RULE]
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from api import DEFAULT_HOST, DEFAULT_PORT, JobAPIServer
+from batch import DEFAULT_POOL_SIZE, read_url_file
+from disk_space import DEFAULT_MARGIN
+from engine import DUPLICATE_POLICIES, DownloadEngine, EngineConfig
+from format_select import DEFAULT_RULE, RULE_PRESETS
+from history_index import SORT_COLUMNS, HistoryIndex
+from postprocess import AUDIO_CODECS, DEFAULT_WORKERS, POSTPROCESS_OPTIONS, VIDEO_CONTAINERS
+from progress import ProgressTicker
+from scheduler import COMPLETED, FAILED, PRIORITIES, RUNNING, SKIPPED
+from subscriptions import DEFAULT_INTERVAL, SubscriptionPoller, SubscriptionStore
+from telemetry import describe_metrics, write_metrics_csv
+
+
+def _format_size(size):
+    return f"{size / (1024*1024):.1f} MB" if size else "N/A"
+
+
+def _print_progress(changed):
+    for job_id, stats in changed.items():
+        if stats.status == 'downloading':
+            speed = f" {stats.speed / (1024*1024):.1f} MB/s" if stats.speed else ""
+            print(f"[{job_id}] {int(stats.fraction * 100)}%{speed}", file=sys.stderr)
+
+
+def _report_jobs(engine, ticker):
+    """Engine listener printing job state changes for headless runs"""
+    def on_event(event, payload):
+        if event != 'job':
+            return
+        job = payload
+        if job.state == RUNNING:
+            ticker.track(job.id, job.stats)
+        elif job.is_finished:
+            ticker.untrack(job.id)
+        detail = f": {job.error}" if job.state == FAILED else ""
+        if job.options.get('duplicate_of'):
+            detail = f" (already downloaded: {job.options['duplicate_of']})"
+        elif job.state == COMPLETED and job.metrics:
+            detail = f" ({describe_metrics(job.metrics.to_dict())})"
+        print(f"[{job.id}] {job.state} {job.title}{detail}", file=sys.stderr)
+    engine.add_listener(on_event)
+
+
+def cmd_formats(engine, args):
+    info, from_cache = engine.fetch_info(args.url)
+    print(f"{info.get('title', 'Unknown Title')}{' (cached)' if from_cache else ''}")
+    for f in info.get('formats', []):
+        vcodec = f.get('vcodec', 'none')
+        acodec = f.get('acodec', 'none')
+        if vcodec == 'none' and acodec == 'none':
+            continue
+        quality = f"{f['height']}p" if f.get('height') else "audio"
+        size = _format_size(f.get('filesize') or f.get('filesize_approx'))
+        print(f"{f.get('format_id', ''):>10}  {quality:>6}  {f.get('ext', ''):>5}  {size:>10}  {vcodec}/{acodec}")
+    return 0
+
+
+def cmd_download(engine, args):
+    sources = list(args.urls)
+    if args.batch:
+        sources.extend(read_url_file(args.batch))
+    if not sources:
+        print("No URLs given", file=sys.stderr)
+        return 2
+
+    options = {name: getattr(args, name) for name in POSTPROCESS_OPTIONS if getattr(args, name)}
+    engine.start(resume=False)
+    if args.scan:
+        # Walks the whole folder, so only on request; earlier downloads are indexed already
+        engine.scan_downloads(args.output)
+    ticker = ProgressTicker(_print_progress, rate_hz=1)
+    ticker.start()
+    _report_jobs(engine, ticker)
+
+    unresolved = []
+
+    def on_item(item, job):
+        # The ingestor reports the error itself
+        if item.error:
+            unresolved.append(item)
+
+    if args.expand:
+        jobs = engine.run_batch(sources, args.format, pool_size=args.pool_size, output_dir=args.output,
+                                priority=args.priority, force=args.force, options=options, on_item=on_item)
+    else:
+        jobs = [engine.submit(url, args.format, output_dir=args.output, priority=args.priority,
+                              options=options, force=args.force)
+                for url in sources]
+    engine.wait()
+    ticker.stop()
+    if not jobs:
+        print("Nothing to download", file=sys.stderr)
+        return 1
+    return 0 if not unresolved and all(job.state in (COMPLETED, SKIPPED) for job in jobs) else 1
+
+
+def cmd_history(engine, args):
+    engine.start(resume=False)
+    if args.search or args.since or args.until or args.sort != 'date' or args.ascending:
+        index = HistoryIndex(engine.history_store.recent())
+        results = index.search(args.search or '', args.platform, args.since, args.until, args.sort, not args.ascending)
+        entries = results[:args.limit] if args.limit >= 0 else results
+    elif args.platform:
+        entries = engine.history_store.by_platform(args.platform, args.limit)
+    else:
+        entries = engine.history_store.recent(args.limit)
+    for entry in entries:
+        print(f"{entry['date']}  {entry['platform'] or 'N/A':<10} {entry['title'] or 'Unknown'}  {entry['url']}")
+    return 0
+
+
+def cmd_metrics(engine, args):
+    rows = engine.history_store.with_metrics(args.limit)
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            write_metrics_csv(rows, f)
+        print(f"Wrote metrics of {len(rows)} downloads to {args.output}", file=sys.stderr)
+    else:
+        write_metrics_csv(rows, sys.stdout)
+    return 0
+
+
+def _report_poll(name, jobs, error):
+    if error is not None:
+        print(f"{name}: check failed: {error}", file=sys.stderr)
+    else:
+        print(f"{name}: {len(jobs)} new videos", file=sys.stderr)
+
+
+def cmd_subscriptions(engine, args):
+    store = SubscriptionStore(engine.config.subscriptions_db)
+    if args.action == 'add':
+        subscription = store.add(args.url, args.format, output_dir=args.output, interval=args.interval * 60,
+                                 incremental=not args.full)
+        print(f"Subscribed [{subscription['id']}] {subscription['url']}")
+    elif args.action == 'remove':
+        if not store.remove(args.id):
+            print(f"No subscription {args.id}", file=sys.stderr)
+            return 1
+    elif args.action == 'list':
+        for s in store.all():
+            status = f"error: {s['last_error']}" if s['last_error'] else f"{len(s['last_seen'])} IDs seen"
+            title = f" ({s['title']})" if s['title'] else ""
+            print(f"[{s['id']}] {s['url']}{title}  every {s['interval'] // 60} min  {status}")
+    elif args.action == 'poll':
+        engine.start(resume=False)
+        if args.scan:
+            engine.scan_downloads()
+        ticker = ProgressTicker(_print_progress, rate_hz=1)
+        ticker.start()
+        _report_jobs(engine, ticker)
+        poller = SubscriptionPoller(engine, store, on_poll=_report_poll)
+        for subscription in store.all():
+            poller.poll(subscription)
+        engine.wait()
+        ticker.stop()
+    return 0
+
+
+def cmd_daemon(engine, args):
+    ticker = ProgressTicker(_print_progress, rate_hz=1)
+    ticker.start()
+    _report_jobs(engine, ticker)
+    resumed = engine.start(resume=True)
+    engine.scan_downloads()
+    print(f"Daemon started, resumed {len(resumed)} unfinished jobs", file=sys.stderr)
+
+    api_server = None
+    if args.api_port:
+        api_server = JobAPIServer(engine, host=args.api_host, port=args.api_port, token=args.api_token).start()
+        host, port = api_server.address[:2]
+        print(f"Job API listening on http://{host}:{port}", file=sys.stderr)
+
+    poller = None
+    if args.subscriptions or args.watch:
+        engine.config.watch_dir = args.watch
+        engine.config.watch_format = args.watch_format
+        poller = SubscriptionPoller(engine, on_poll=_report_poll).start()
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+
+    stop = threading.Event()
+    if args.stdin:
+        def read_stdin():
+            try:
+                for line in sys.stdin:
+                    url = line.strip()
+                    if not url or url.startswith('#'):
+                        continue
+                    try:
+                        engine.submit(url, args.format)
+                    except Exception as e:
+                        print(f"Cannot queue {url}: {e}", file=sys.stderr)
+            except Exception as e:
+                print(f"Stopped reading standard input: {e}", file=sys.stderr)
+            finally:
+                stop.set()
+        threading.Thread(target=read_stdin, daemon=True).start()
+
+    try:
+        while not stop.wait(1):
+            pass
+        # stdin closed; finish what was queued before exiting
+        engine.wait()
+    except KeyboardInterrupt:
+        print("Shutting down; unfinished jobs resume on next start", file=sys.stderr)
+    finally:
+        if api_server is not None:
+            api_server.stop()
+        if poller is not None:
+            poller.stop()
+        ticker.stop()
+        engine.shutdown()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless video downloader")
+    parser.add_argument('--data-dir', help="Directory holding history, cache and job journal (default: home)")
+    parser.add_argument('--max-parallel', type=int, default=3, help="Maximum parallel downloads")
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help="Total bandwidth in MB/s shared by all downloads (0 = unlimited)")
+    parser.add_argument('--fragments', type=int, default=1,
+                        help="Parallel DASH/HLS fragment downloads per job")
+    parser.add_argument('--duplicates', choices=DUPLICATE_POLICIES, default='skip',
+                        help="What to do with videos downloaded before: skip them, hard-link the existing"
+                             " file into the output directory, or download again")
+    parser.add_argument('--match-titles', action='store_true',
+                        help="Also treat files in the output directory named after the video's title as"
+                             " downloads of it")
+    parser.add_argument('--pp-workers', type=int, default=DEFAULT_WORKERS,
+                        help="Parallel post-processing jobs (merge, conversion), separate from downloads")
+    parser.add_argument('--min-free', type=int, default=DEFAULT_MARGIN // (1024*1024), metavar='MB',
+                        help="Disk space to keep free; downloads wait or fail instead of filling the volume")
+    parser.add_argument('--instagram-cookies', metavar='FILE',
+                        help="cookies.txt of a logged-in browser, needed for Instagram profiles")
+    parser.add_argument('--hash', action='store_true',
+                        help="Keep a SHA-256 of every download to recognize moved or altered files")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    formats = sub.add_parser('formats', help="List the formats of a video")
+    formats.add_argument('url')
+    formats.set_defaults(func=cmd_formats)
+
+    download = sub.add_parser('download', help="Download URLs and exit when done")
+    download.add_argument('urls', nargs='*')
+    download.add_argument('-f', '--format', default=None,
+                          help=f"yt-dlp format selector or one of: {', '.join(RULE_PRESETS)}")
+    download.add_argument('-o', '--output', help="Download directory (default: ~/Downloads)")
+    download.add_argument('--batch', help="File with one URL per line")
+    download.add_argument('--expand', action='store_true',
+                          help="Expand playlists, channels and Instagram profiles and resolve metadata in parallel")
+    download.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE)
+    download.add_argument('--priority', choices=list(PRIORITIES), default='normal')
+    download.add_argument('--force', action='store_true', help="Download even if the video exists already")
+    download.add_argument('--scan', action='store_true',
+                          help="Index the files already in the output directory first, so videos downloaded"
+                               " by other tools count as duplicates")
+    download.add_argument('--extract-audio', choices=AUDIO_CODECS, help="Convert to an audio file")
+    download.add_argument('--remux', choices=VIDEO_CONTAINERS, help="Change the container without re-encoding")
+    download.add_argument('--transcode', choices=VIDEO_CONTAINERS, help="Re-encode the video into this container")
+    download.add_argument('--embed-thumbnail', action='store_true', help="Embed the thumbnail as cover art")
+    download.set_defaults(func=cmd_download)
+
+    history = sub.add_parser('history', help="Print download history")
+    history.add_argument('--limit', type=int, default=50)
+    history.add_argument('--platform')
+    history.add_argument('--search', help="Only entries with every word as a prefix of a title, URL or platform word")
+    history.add_argument('--since', help="First date to include: YYYY, YYYY-MM or YYYY-MM-DD")
+    history.add_argument('--until', help="Last date to include, same format as --since")
+    history.add_argument('--sort', choices=SORT_COLUMNS, default='date')
+    history.add_argument('--ascending', action='store_true', help="Oldest or A-Z first")
+    history.set_defaults(func=cmd_history)
+
+    metrics = sub.add_parser('metrics', help="Export per-download timings and throughput as CSV")
+    metrics.add_argument('--limit', type=int, default=-1, help="Only the newest N downloads")
+    metrics.add_argument('-o', '--output', help="CSV file to write (default: standard output)")
+    metrics.set_defaults(func=cmd_metrics)
+
+    daemon = sub.add_parser('daemon', help="Run the download queue until interrupted")
+    daemon.add_argument('--stdin', action='store_true', help="Read URLs to download from standard input")
+    daemon.add_argument('-f', '--format', default=None)
+    daemon.add_argument('--api-port', type=int, nargs='?', const=DEFAULT_PORT,
+                        help=f"Serve the HTTP job API (default port {DEFAULT_PORT})")
+    daemon.add_argument('--api-host', default=DEFAULT_HOST,
+                        help="Address to bind the job API to; use 0.0.0.0 for other machines")
+    daemon.add_argument('--api-token', help="Require this bearer token on every API request")
+    daemon.add_argument('--subscriptions', action='store_true',
+                        help="Check saved subscriptions on schedule and download their new videos")
+    daemon.add_argument('--watch', metavar='DIR', help="Queue the URLs of .txt files dropped into DIR")
+    daemon.add_argument('--watch-format', default=DEFAULT_RULE,
+                        help=f"Format for the videos of dropped lists: a yt-dlp selector or one of:"
+                             f" {', '.join(RULE_PRESETS)}")
+    daemon.set_defaults(func=cmd_daemon)
+
+    subscriptions = sub.add_parser('subscriptions', help="Manage channel and playlist subscriptions")
+    actions = subscriptions.add_subparsers(dest='action', required=True)
+    add = actions.add_parser('add', help="Subscribe to a channel or playlist")
+    add.add_argument('url')
+    add.add_argument('-f', '--format', default=None)
+    add.add_argument('-o', '--output', help="Download directory (default: ~/Downloads)")
+    add.add_argument('--interval', type=int, default=DEFAULT_INTERVAL // 60, metavar='MIN',
+                     help="Minutes between checks")
+    add.add_argument('--full', action='store_true',
+                     help="List every video on each check instead of stopping at the last seen one"
+                          " (for playlists that add videos at the end)")
+    actions.add_parser('list', help="Show subscriptions")
+    remove = actions.add_parser('remove', help="Unsubscribe")
+    remove.add_argument('id', type=int)
+    poll = actions.add_parser('poll', help="Check every subscription now and download new videos")
+    poll.add_argument('--scan', action='store_true',
+                      help="Index the files already in the download folder first")
+    subscriptions.set_defaults(func=cmd_subscriptions)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = DownloadEngine(EngineConfig(
+        data_dir=args.data_dir,
+        max_parallel=args.max_parallel,
+        rate_limit=int(args.rate_limit * 1024 * 1024),
+        concurrent_fragments=args.fragments,
+        duplicate_policy=args.duplicates,
+        hash_downloads=args.hash,
+        match_titles=args.match_titles,
+        postprocess_workers=args.pp_workers,
+        instagram_cookies=args.instagram_cookies,
+        min_free_space=args.min_free * 1024 * 1024,
+    ))
+    try:
+        return args.func(engine, args)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
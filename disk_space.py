@@ -0,0 +1,296 @@
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+import threading
+import time
+
+# Free space left untouched on every volume, for the system and other programs
+DEFAULT_MARGIN = 512 * 1024 * 1024
+
+# Seconds between free space checks while a job waits for room
+RECHECK_INTERVAL = 5
+
+# Seconds admission trusts a volume's free space before reading it again
+FREE_SPACE_TTL = 2
+
+# linux/falloc.h
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOC_FL_PUNCH_HOLE = 0x02
+
+
+class InsufficientSpace(OSError):
+    """A download does not fit on its volume even with nothing else reserved"""
+
+
+def _load_fallocate():
+    """libc fallocate, or None where it is not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64)
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_fallocate = _load_fallocate()
+
+
+def _allocate(path, mode, offset, length):
+    """Call fallocate on path; False when the file system does not support it"""
+    if _fallocate is None or length <= 0:
+        return False
+    try:
+        fd = os.open(path, os.O_WRONLY)
+    except OSError:
+        return False
+    try:
+        return _fallocate(fd, mode, offset, length) == 0
+    finally:
+        os.close(fd)
+
+
+def expected_size(info):
+    """Bytes yt-dlp will write for a video's selected format(s), or 0 if unknown
+
+    Merging separate video and audio writes the merged file next to its
+    inputs, so a merge needs room for both.
+    """
+    formats = info.get('requested_formats') or [info]
+    size = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+    return size * 2 if len(formats) > 1 else size
+
+
+def volume_of(directory):
+    """Device id of the volume directory is (or will be created) on"""
+    path = os.path.abspath(directory)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.stat(path).st_dev, path
+
+
+class _Reservation:
+    __slots__ = ('volume', 'path', 'size', 'planned', 'waiting', 'done', 'current', 'allocated')
+
+    def __init__(self, volume, path, size):
+        self.volume = volume
+        self.path = path
+        self.size = size
+        self.planned = False
+        # Blocked in plan() until other downloads free the space
+        self.waiting = False
+        # Bytes of finished files and of the file being written
+        self.done = 0
+        self.current = 0
+        # .part file -> bytes preallocated for it
+        self.allocated = {}
+
+    @property
+    def remaining(self):
+        return max(0, self.size - self.done - self.current)
+
+
+class DiskSpace:
+    """Free space bookkeeping per volume for the download queue
+
+    Every started job reserves the bytes it is expected to write on the
+    volume of its output directory. A job is only admitted while the free
+    space, less ``margin`` and the unwritten part of every other
+    reservation on that volume, can hold it; once yt-dlp has selected the
+    formats ``plan`` replaces the estimate with their real size. Progress
+    hooks shrink the reservation as bytes reach the disk and, on Linux,
+    preallocate each ``.part`` file to its full size so large downloads are
+    not fragmented on spinning disks. Sizes yt-dlp does not know count as 0.
+
+    Admission runs under the scheduler's lock, so ``reserve`` only does
+    arithmetic on a snapshot of the volume and its free space taken by
+    ``refresh`` when the job was queued. A snapshot older than
+    FREE_SPACE_TTL is re-read on a background thread.
+    """
+
+    def __init__(self, margin=DEFAULT_MARGIN):
+        self.margin = margin
+        self._cond = threading.Condition()
+        self._reservations = {}
+        # directory -> (volume, existing path) and volume -> (free bytes, time read)
+        self._volumes = {}
+        self._free = {}
+        # Volumes being re-read in the background
+        self._refreshing = set()
+
+    def available(self, directory, exclude=None):
+        """Bytes that can still be reserved on directory's volume"""
+        volume, path = volume_of(directory)
+        free = shutil.disk_usage(path).free
+        with self._cond:
+            return self._available(volume, free, exclude)
+
+    def _available(self, volume, free, exclude=None):
+        reserved = sum(r.remaining for key, r in self._reservations.items()
+                       if r.volume == volume and key != exclude)
+        return free - self.margin - reserved
+
+    def refresh(self, directory):
+        """Snapshot directory's volume and free space for ``reserve``, unless one is recent
+
+        Does system calls; call it without holding the scheduler's lock.
+        """
+        with self._cond:
+            known = self._volumes.get(directory)
+            if known is not None and time.monotonic() - self._free[known[0]][1] < FREE_SPACE_TTL:
+                return known
+        volume, path = volume_of(directory)
+        free = shutil.disk_usage(path).free
+        with self._cond:
+            self._volumes[directory] = (volume, path)
+            self._free[volume] = (free, time.monotonic())
+        return volume, path
+
+    def _refresh_volume(self, volume, path):
+        try:
+            free = shutil.disk_usage(path).free
+        except OSError:
+            free = None
+        with self._cond:
+            self._refreshing.discard(volume)
+            if free is not None:
+                self._free[volume] = (free, time.monotonic())
+
+    def _snapshot_free(self, volume, path):
+        """Free bytes of volume from its snapshot, re-read in the background once stale; caller holds the lock"""
+        free, read = self._free[volume]
+        if time.monotonic() - read >= FREE_SPACE_TTL and volume not in self._refreshing:
+            self._refreshing.add(volume)
+            threading.Thread(target=self._refresh_volume, args=(volume, path), daemon=True).start()
+        return free
+
+    def _others(self, volume, exclude):
+        return any(r.volume == volume and key != exclude for key, r in self._reservations.items())
+
+    def _blockers(self, volume, exclude):
+        """Other reservations on volume that will go on writing without waiting for space"""
+        return [r for key, r in self._reservations.items()
+                if r.volume == volume and key != exclude and not r.waiting and r.remaining
+                and (r.planned or r.done or r.current)]
+
+    def reserve(self, key, directory, size=0):
+        """Reserve size bytes for key; False if that would run the volume out
+
+        A job alone on its volume is always admitted so that ``plan`` can
+        check its real size. Only a directory never passed to ``refresh``
+        is read from disk here.
+        """
+        with self._cond:
+            known = self._volumes.get(directory)
+        volume, path = known or self.refresh(directory)
+        with self._cond:
+            if (size and self._others(volume, key)
+                    and size > self._available(volume, self._snapshot_free(volume, path), key)):
+                return False
+            self._reservations[key] = _Reservation(volume, path, size)
+            return True
+
+    def plan(self, key, info, checkpoint=None):
+        """Reserve the real size of a video about to be downloaded
+
+        Called once per video (each item of a playlist adds to the job's
+        reservation). Blocks while other downloads on the volume hold the
+        space, calling ``checkpoint`` so the wait can be cancelled, and
+        raises InsufficientSpace when the video cannot fit at all.
+
+        Only downloads that are writing or about to write count against
+        it: estimates of jobs still extracting and of jobs waiting here
+        are ignored, so two jobs admitted on low estimates cannot wait for
+        each other forever.
+        """
+        size = expected_size(info)
+        try:
+            while True:
+                with self._cond:
+                    reservation = self._reservations.get(key)
+                    if reservation is None or not size:
+                        return
+                    required = reservation.size + size if reservation.planned else size
+                    blockers = self._blockers(reservation.volume, key)
+                    free = shutil.disk_usage(reservation.path).free
+                    # A fresh reading for admission too
+                    self._free[reservation.volume] = (free, time.monotonic())
+                    available = free - self.margin - sum(r.remaining for r in blockers)
+                    if required - reservation.done - reservation.current <= available:
+                        reservation.size = required
+                        reservation.planned = True
+                        return
+                    if not blockers:
+                        raise InsufficientSpace(
+                            f"Not enough disk space in {reservation.path}: {size / (1024*1024):.0f} MB needed, "
+                            f"{max(0, available) / (1024*1024):.0f} MB free")
+                    if not reservation.waiting:
+                        print(f"Waiting for disk space in {reservation.path} ({size / (1024*1024):.0f} MB needed)")
+                        reservation.waiting = True
+                        if not reservation.planned:
+                            # The admission estimate must not hold space while the job waits
+                            reservation.size = 0
+                        self._cond.notify_all()
+                    self._cond.wait(RECHECK_INTERVAL)
+                # Outside the lock; raises for a paused or cancelled job
+                if checkpoint is not None:
+                    checkpoint()
+        finally:
+            with self._cond:
+                reservation = self._reservations.get(key)
+                if reservation is not None:
+                    reservation.waiting = False
+
+    def progress(self, key, d):
+        """Track a yt-dlp progress dict: preallocate, count written bytes, trim"""
+        with self._cond:
+            reservation = self._reservations.get(key)
+            if reservation is None:
+                return
+            status = d.get('status')
+            if status == 'downloading':
+                tmpfilename = d.get('tmpfilename')
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if tmpfilename and total and tmpfilename not in reservation.allocated and os.path.exists(tmpfilename):
+                    # Tried once per file; 0 where the file system cannot preallocate
+                    ok = _allocate(tmpfilename, _FALLOC_FL_KEEP_SIZE, 0, int(total))
+                    reservation.allocated[tmpfilename] = int(total) if ok else 0
+                allocated = reservation.allocated.get(tmpfilename, 0)
+                # Preallocated blocks are already gone from the free space
+                reservation.current = max(d.get('downloaded_bytes') or 0, allocated)
+            elif status == 'finished':
+                reservation.done += d.get('downloaded_bytes') or d.get('total_bytes') or reservation.current
+                reservation.current = 0
+                # The finished hook only names the final file, renamed from its .part
+                filename = d.get('filename')
+                allocated = reservation.allocated.pop(d.get('tmpfilename') or f"{filename}.part", None)
+                if allocated is not None:
+                    _trim(filename, allocated)
+            self._cond.notify_all()
+
+    def release(self, key):
+        """Drop key's reservation, freeing blocks preallocated for unfinished files"""
+        with self._cond:
+            reservation = self._reservations.pop(key, None)
+            if reservation is None:
+                return
+            for path, allocated in reservation.allocated.items():
+                _trim(path, allocated)
+            self._cond.notify_all()
+
+
+def _trim(path, allocated):
+    """Free the preallocated blocks past the end of path"""
+    if not path or not os.path.exists(path):
+        return
+    size = os.path.getsize(path)
+    if allocated > size:
+        _allocate(path, _FALLOC_FL_KEEP_SIZE | _FALLOC_FL_PUNCH_HOLE, size, allocated - size)
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    video_key TEXT NOT NULL,
+    format TEXT NOT NULL,
+    path TEXT NOT NULL,
+    title TEXT,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT,
+    recorded REAL,
+    PRIMARY KEY (video_key, format)
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_path ON downloads (path);
+CREATE INDEX IF NOT EXISTS idx_downloads_sha256 ON downloads (sha256);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    stem TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_stem ON files (directory, stem);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+"""
+
+# Format recorded for downloads made without an explicit selector
+ANY_FORMAT = '*'
+
+# Files a scan considers finished downloads
+MEDIA_EXTENSIONS = {
+    '.mp4', '.mkv', '.webm', '.mov', '.m4v', '.flv', '.avi', '.3gp',
+    '.m4a', '.mp3', '.opus', '.ogg', '.aac', '.flac', '.wav', '.jpg', '.png',
+}
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+class DownloadIndex:
+    """Index of finished downloads for duplicate detection
+
+    Downloads are keyed by normalized video key (extractor plus video ID,
+    see ``normalize_video_key``) and format selector, so short links,
+    ``youtu.be`` URLs and tracking parameters all map to the same entry.
+    ``scan`` additionally records the media files already present in a
+    download folder, which lets files from earlier sessions or other tools
+    be matched by title. With ``hash_content`` the SHA-256 of every file is
+    kept as well: an indexed download that was moved or renamed is found
+    again by its content, and a file whose content changed is no longer
+    treated as a copy of the video.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, video_key, format_selector, path, title=None, hash_content=False):
+        """Remember that video_key was downloaded in format_selector to path"""
+        stat = _stat(path)
+        if stat is None:
+            return False
+        sha256 = file_sha256(path) if hash_content else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (video_key, format, path, title, size, mtime, sha256, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_key, format_selector or ANY_FORMAT, path, title, stat[0], stat[1], sha256, time.time()),
+            )
+            self._conn.commit()
+        return True
+
+    def find(self, video_key, format_selector=None, verify_content=True):
+        """Path of an existing download of video_key, or None
+
+        Entries recorded for ``format_selector`` are preferred; downloads
+        made without a selector match any format. Entries whose file is
+        gone, or whose content no longer matches its recorded hash, are
+        dropped. Without ``verify_content`` nothing is hashed: a hashed
+        file whose size or mtime changed is passed over but kept, for a
+        later verifying call to decide.
+        """
+        formats = [format_selector or ANY_FORMAT]
+        if format_selector:
+            formats.append(ANY_FORMAT)
+        for fmt in formats:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT * FROM downloads WHERE video_key = ? AND format = ?", (video_key, fmt)
+                ).fetchone()
+            if row is not None and self._still_valid(dict(row), verify_content):
+                return row['path']
+        return None
+
+    def contains(self, video_key):
+        """Whether video_key is indexed in any format; the file is not checked"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM downloads WHERE video_key = ? LIMIT 1", (video_key,)).fetchone()
+        return row is not None
+
+    def _still_valid(self, row, verify_content=True):
+        stat = _stat(row['path'])
+        valid = stat is not None
+        if valid and stat != (row['size'], row['mtime']):
+            if row['sha256'] and not verify_content:
+                return False
+            valid = bool(row['sha256']) and file_sha256(row['path']) == row['sha256']
+        with self._lock:
+            if not valid:
+                self._conn.execute(
+                    "DELETE FROM downloads WHERE video_key = ? AND format = ?", (row['video_key'], row['format'])
+                )
+            elif stat != (row['size'], row['mtime']):
+                self._conn.execute(
+                    "UPDATE downloads SET size = ?, mtime = ? WHERE video_key = ? AND format = ?",
+                    (stat[0], stat[1], row['video_key'], row['format']),
+                )
+            self._conn.commit()
+        return valid
+
+    def find_file(self, directory, stem):
+        """Path of a scanned media file in directory named stem.<ext>, or None"""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE directory = ? AND stem = ?", (directory, stem)
+            ).fetchall()
+        for row in rows:
+            if os.path.exists(row['path']):
+                return row['path']
+        return None
+
+    def scan(self, directory, hash_content=False):
+        """Record the media files under directory; returns how many were found
+
+        Files whose size and modification time are unchanged since the last
+        scan are not hashed again.
+        """
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            return 0
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            known = {
+                row['path']: dict(row) for row in self._conn.execute(
+                    "SELECT * FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                )
+            }
+
+        rows = []
+        for root, _dirs, names in os.walk(directory):
+            for name in names:
+                stem, ext = os.path.splitext(name)
+                if ext.lower() not in MEDIA_EXTENSIONS:
+                    continue
+                path = os.path.join(root, name)
+                stat = _stat(path)
+                if stat is None:
+                    continue
+                previous = known.pop(path, None)
+                sha256 = None
+                if previous is not None and (previous['size'], previous['mtime']) == stat:
+                    sha256 = previous['sha256']
+                if hash_content and sha256 is None:
+                    try:
+                        sha256 = file_sha256(path)
+                    except OSError as e:
+                        print(f"Failed to hash {path}: {e}")
+                rows.append((path, root, stem, stat[0], stat[1], sha256))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, directory, stem, size, mtime, sha256) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in known])
+            self._conn.commit()
+        if hash_content:
+            self._relocate_moved()
+        return len(rows)
+
+    def _relocate_moved(self):
+        """Point downloads whose file vanished at a scanned file with the same content"""
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(
+                "SELECT d.video_key, d.format, d.path, f.path AS new_path, f.size, f.mtime"
+                " FROM downloads d JOIN files f ON f.sha256 = d.sha256 WHERE d.path != f.path"
+            )]
+        moved = [row for row in rows if not os.path.exists(row['path'])]
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE downloads SET path = ?, size = ?, mtime = ? WHERE video_key = ? AND format = ?",
+                [(row['new_path'], row['size'], row['mtime'], row['video_key'], row['format']) for row in moved],
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM downloads")
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
@@ -0,0 +1,612 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from bandwidth import BandwidthBudget
+from batch import BatchIngestor, DEFAULT_POOL_SIZE
+from disk_space import DEFAULT_MARGIN, DiskSpace, expected_size
+from download_index import DownloadIndex
+from format_select import DEFAULT_RULE, recommend, resolve_rule
+from history_store import HistoryStore
+from instagram import INSTAGRAM_POOL_SIZE, InstagramIngestor, InstagramSessions
+from journal import JobJournal
+from metadata_cache import MetadataCache, normalize_video_key
+from postprocess import (DEFAULT_WORKERS, PostProcessPool, defer_post_processing, discard_deferred,
+                         postprocessor_options, run_deferred)
+from scheduler import COMPLETED, QUEUED, SKIPPED, DownloadJob, DownloadScheduler, JobCancelled
+from telemetry import JobMetrics, MetricsRegistry
+from ydl_pool import YDLPool
+
+# Pool profile of instances that only look up metadata
+METADATA_PROFILE = {'quiet': True, 'no_warnings': True}
+
+# What submit does when a video was downloaded before: mark the job skipped,
+# hard-link the existing file into the new output directory, or download anyway
+DUPLICATE_POLICIES = ('skip', 'link', 'download')
+
+
+class EngineConfig:
+    """Settings shared by the GUI, the CLI and the daemon"""
+
+    def __init__(self, download_dir=None, data_dir=None, max_parallel=3, platform_limits=None,
+                 rate_limit=0, concurrent_fragments=1, duplicate_policy='skip', hash_downloads=False,
+                 postprocess_workers=DEFAULT_WORKERS, instagram_cookies=None, min_free_space=DEFAULT_MARGIN,
+                 watch_dir=None, watch_format=DEFAULT_RULE, match_titles=False):
+        home = os.path.expanduser("~")
+        self.download_dir = download_dir or os.path.join(home, "Downloads")
+        self.data_dir = data_dir or home
+        self.max_parallel = max_parallel
+        self.platform_limits = dict(platform_limits or {'YouTube': 2, 'Instagram': 2})
+        # Total bytes per second shared by all downloads; 0 means unlimited
+        self.rate_limit = rate_limit
+        # Default number of DASH/HLS fragments fetched in parallel per job
+        self.concurrent_fragments = concurrent_fragments
+        self.duplicate_policy = duplicate_policy if duplicate_policy in DUPLICATE_POLICIES else 'skip'
+        # Keep a SHA-256 of every download so moved or altered files are recognized
+        self.hash_downloads = hash_downloads
+        # Parallel merges, conversions and thumbnail embeds, separate from max_parallel downloads
+        self.postprocess_workers = postprocess_workers
+        # Netscape cookies.txt of a logged-in browser; needed for profiles and private posts
+        self.instagram_cookies = instagram_cookies
+        # Bytes kept free on every download volume; jobs wait rather than eat into it
+        self.min_free_space = min_free_space
+        # Folder polled for dropped .txt URL lists; None disables it
+        self.watch_dir = watch_dir
+        # Rule preset, FormatRule or yt-dlp selector for the videos of those lists
+        self.watch_format = watch_format
+        # Also count scanned files named after a video's title as downloads of it;
+        # off by default since different videos often share a title
+        self.match_titles = match_titles
+
+    @property
+    def history_file(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_history.json')
+
+    @property
+    def history_db(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_history.db')
+
+    @property
+    def jobs_db(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_jobs.db')
+
+    @property
+    def index_db(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_index.db')
+
+    @property
+    def subscriptions_db(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_subscriptions.db')
+
+    @property
+    def instagram_session_dir(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_instagram')
+
+    @property
+    def cache_dir(self):
+        return os.path.join(self.data_dir, '.flet_video_downloader_cache')
+
+
+def detect_platform(url):
+    """Name of the platform a URL belongs to"""
+    host = urlparse(url.strip()).netloc.lower().split(':')[0]
+    if host == 'instagram.com' or host.endswith('.instagram.com') or url.startswith('instagram://'):
+        return 'Instagram'
+    return 'YouTube'
+
+
+def fragment_count(value):
+    """value as a concurrent fragment count; ValueError unless it is a positive whole number"""
+    if not str(value).isdigit() or int(value) < 1:
+        raise ValueError(f"concurrent_fragments must be a positive whole number, not {value!r}")
+    return int(value)
+
+
+def _output_path(info):
+    """Final file written by yt-dlp for a downloaded info dict, if known"""
+    downloads = info.get('requested_downloads') or []
+    path = downloads[-1].get('filepath') if downloads else None
+    return path or info.get('filepath') or info.get('_filename')
+
+
+def load_yt_dlp():
+    """Import yt-dlp on first use
+
+    Importing yt-dlp and its extractors is a large share of cold start, so
+    no module imports it at load time; front ends call ``warm_up`` from a
+    background thread once they are interactive.
+    """
+    import yt_dlp
+    return yt_dlp
+
+
+def _download_marker():
+    """No-op post-processor yt-dlp runs right before downloading
+
+    Its hook events tell JobMetrics that extraction is over.
+    """
+    class DownloadMarkerPP(load_yt_dlp().postprocessor.PostProcessor):
+        """Hook events carry the info dict with the selected formats"""
+        def run(self, info):
+            return [], info
+    return DownloadMarkerPP()
+
+
+class DownloadEngine:
+    """UI-independent download engine
+
+    Owns format lookup, the download queue, history and the job journal.
+    Front ends subscribe with ``add_listener(callback)`` and receive
+    ``callback(event, payload)`` for these events:
+
+    - ``'job'``: a job changed state; payload is the DownloadJob
+    - ``'history'``: a download finished and was recorded; payload is the entry
+
+    Per-job progress is available on ``job.stats`` for polling or a
+    ProgressTicker.
+    """
+
+    def __init__(self, config=None, ydl_class=None):
+        self.config = config or EngineConfig()
+        # Overridable so tests and benchmarks can use a stand-in extractor
+        self._ydl_class = ydl_class
+        os.makedirs(self.config.data_dir, exist_ok=True)
+        self.history_store = HistoryStore(self.config.history_db)
+        self.metadata_cache = MetadataCache(self.config.cache_dir)
+        self.download_index = DownloadIndex(self.config.index_db)
+        self.telemetry = MetricsRegistry()
+        self.bandwidth = BandwidthBudget(self.config.rate_limit)
+        self.disk_space = DiskSpace(self.config.min_free_space)
+        self.scheduler = DownloadScheduler(
+            self._run_job,
+            max_parallel=self.config.max_parallel,
+            platform_limits=self.config.platform_limits,
+            admit=self._admit,
+        )
+        self.postprocessor = PostProcessPool(self.config.postprocess_workers)
+        self.ydl_pool = YDLPool(self._new_ydl)
+        self._instagram_sessions = None
+        self._instagram_lock = threading.Lock()
+        self.journal = JobJournal(self.config.jobs_db)
+        self.journal.attach(self.scheduler)
+        self._listeners = []
+        self.scheduler.add_listener(self._on_job)
+
+    @property
+    def ydl_class(self):
+        return self._ydl_class or load_yt_dlp().YoutubeDL
+
+    @ydl_class.setter
+    def ydl_class(self, ydl_class):
+        self._ydl_class = ydl_class
+        self.ydl_pool.clear()
+
+    def _new_ydl(self, params):
+        """YDLPool factory"""
+        ydl = self.ydl_class(params)
+        ydl.add_post_processor(_download_marker(), when='before_dl')
+        return ydl
+
+    @property
+    def instagram_sessions(self):
+        """InstagramSessions shared by bulk lookups and Instagram downloads, created on first use"""
+        with self._instagram_lock:
+            if self._instagram_sessions is None:
+                self._instagram_sessions = InstagramSessions(
+                    self.config.instagram_session_dir,
+                    cookies_file=self.config.instagram_cookies,
+                    ydl_class=self.ydl_class,
+                )
+            return self._instagram_sessions
+
+    def set_instagram_cookies(self, path):
+        """Use a new cookies.txt for Instagram; open sessions are closed and reseeded"""
+        self.config.instagram_cookies = path or None
+        with self._instagram_lock:
+            sessions, self._instagram_sessions = self._instagram_sessions, None
+        if sessions is not None:
+            sessions.close()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _on_job(self, job):
+        if job.state == QUEUED:
+            # Before any worker can pick the job up, so admission needs no disk access
+            try:
+                self.disk_space.refresh(job.output_dir)
+            except OSError as e:
+                print(f"Cannot read free space of {job.output_dir}: {e}")
+        elif job.is_finished:
+            self.disk_space.release(job.id)
+            metrics = job.metrics.to_dict() if job.metrics and job.state == COMPLETED else None
+            self.telemetry.observe(job.state, metrics)
+        self._emit('job', job)
+
+    def _emit(self, event, payload):
+        for callback in list(self._listeners):
+            try:
+                callback(event, payload)
+            except Exception as e:
+                print(f"Engine listener failed on {event}: {e}")
+
+    def start(self, resume=True):
+        """Migrate legacy history and optionally requeue unfinished jobs
+
+        Returns the list of resumed jobs.
+        """
+        migrated = self.history_store.migrate_json(self.config.history_file)
+        if migrated:
+            print(f"Migrated {migrated} history entries from {self.config.history_file}")
+        if not resume:
+            return []
+        self.journal.prune()
+        return self.journal.resume(self.scheduler)
+
+    def warm_up(self):
+        """Import yt-dlp and fill the YoutubeDL pool ahead of the first request
+
+        Builds one metadata and one default download instance, so the first
+        format lookup and download skip that setup. Blocking; run it on a
+        background thread.
+        """
+        with self.ydl_pool.checkout(METADATA_PROFILE):
+            pass
+        with self.ydl_pool.checkout(self._download_profile('YouTube', {})):
+            pass
+
+    def set_rate_limit(self, rate):
+        """Change the global bandwidth budget in bytes per second; 0 disables it"""
+        self.config.rate_limit = rate
+        self.bandwidth.set_rate(rate)
+
+    def set_min_free_space(self, size):
+        """Change the bytes kept free on every download volume"""
+        self.config.min_free_space = size
+        self.disk_space.margin = size
+
+    def set_postprocess_workers(self, workers):
+        """Change how many jobs are post-processed in parallel"""
+        self.config.postprocess_workers = workers
+        self.postprocessor.set_workers(workers)
+
+    def scan_downloads(self, directory=None):
+        """Index the media files already in directory (default: the download folder)"""
+        return self.download_index.scan(directory or self.config.download_dir,
+                                        hash_content=self.config.hash_downloads)
+
+    def find_duplicate(self, url, format_selector=None, output_dir=None, title=None, verify_content=True):
+        """Path of an existing download of url, or None
+
+        Looks the video up by extractor, video ID and format. With
+        ``config.match_titles`` the scanned files of output_dir are then
+        matched by title, taken from the metadata cache when it has the
+        video (no network request is made) and from title otherwise.
+        ``verify_content`` is passed to ``DownloadIndex.find``.
+        """
+        video_key = normalize_video_key(url)
+        path = self.download_index.find(video_key, format_selector, verify_content)
+        if path is not None or not self.config.match_titles:
+            return path
+        info = self.metadata_cache.get(video_key)
+        title = (info.get('title') if info else None) or title
+        if not title:
+            return None
+        # Same file name the default output template produces
+        stem = load_yt_dlp().utils.sanitize_filename(title)
+        return self.download_index.find_file(output_dir or self.config.download_dir, stem)
+
+    def shutdown(self, cancel_running=False):
+        self.scheduler.shutdown(cancel_running=cancel_running)
+        self.postprocessor.shutdown()
+        self.ydl_pool.clear()
+        if self._instagram_sessions is not None:
+            self._instagram_sessions.close()
+
+    def wait(self, timeout=None):
+        """Block until every job has finished or is paused"""
+        return self.scheduler.wait_idle(timeout)
+
+    def fetch_info(self, url):
+        """Return ``(info, from_cache)`` for url without downloading it"""
+        cache_key = normalize_video_key(url)
+        info = self.metadata_cache.get(cache_key)
+        if info is not None:
+            return info, True
+        with self.ydl_pool.checkout(METADATA_PROFILE) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        self.metadata_cache.put(cache_key, info)
+        return info, False
+
+    def submit(self, url, format_selector=None, platform=None, output_dir=None,
+               title=None, priority='normal', options=None, force=False):
+        """Queue one download and return its DownloadJob
+
+        ``format_selector`` is a yt-dlp selector, a preset name from
+        RULE_PRESETS or a FormatRule. Videos downloaded before are handled
+        according to ``config.duplicate_policy`` unless ``force`` is set;
+        the returned job is then already skipped or completed. Files whose
+        content hash needs checking are left to the job's worker, so
+        submitting never reads a whole file.
+        """
+        rule, selector = resolve_rule(format_selector)
+        options = dict(options or {})
+        if options.get('concurrent_fragments') is not None:
+            options['concurrent_fragments'] = fragment_count(options['concurrent_fragments'])
+        if rule is not None and rule.container:
+            options.setdefault('merge_output_format', rule.container)
+        job = DownloadJob(
+            url,
+            platform or detect_platform(url),
+            format_selector=selector,
+            output_dir=output_dir or self.config.download_dir,
+            title=title,
+            priority=priority,
+            options=options,
+        )
+        cached = self.metadata_cache.get(normalize_video_key(url))
+        if cached is not None:
+            # Estimated with yt-dlp's default format; replaced once the job's format is selected
+            job.expected_bytes = expected_size(cached) or None
+        if force:
+            # Kept with the job so the worker's own check and a resumed job honour it
+            job.options['force'] = True
+        existing = None
+        if not force and self.config.duplicate_policy != 'download':
+            existing = self.find_duplicate(url, selector, job.output_dir, title, verify_content=False)
+        if existing is not None:
+            self._resolve_duplicate(job, existing)
+        self.scheduler.submit(job)
+        return job
+
+    def _resolve_duplicate(self, job, existing):
+        """Finish job without downloading by skipping it or hard-linking existing
+
+        Recorded in the history when the file was linked.
+        """
+        state = SKIPPED
+        target = os.path.join(job.output_dir, os.path.basename(existing))
+        if self.config.duplicate_policy == 'link' and not os.path.exists(target):
+            try:
+                os.makedirs(job.output_dir, exist_ok=True)
+                os.link(existing, target)
+            except OSError as e:
+                # Other file system or no hard link support; download it again
+                print(f"Cannot hard-link {existing}: {e}")
+                return
+            state = COMPLETED
+        job.state = state
+        job.options['duplicate_of'] = existing
+        job.started = job.finished = time.time()
+        if state == COMPLETED:
+            entry = self.history_store.add(job.url, job.title, job.platform)
+            self._emit('history', entry)
+
+    def run_batch(self, sources, format_selector=None, pool_size=DEFAULT_POOL_SIZE, output_dir=None,
+                  priority='normal', on_expanded=None, on_item=None, force=False, options=None,
+                  platform=None):
+        """Expand sources, resolve them in parallel and queue every video
+
+        When ``format_selector`` names a rule, each video gets the format
+        recommended for it from its own metadata. ``on_item(item, job)``
+        receives each BatchItem with its queued job, or ``None`` when the
+        item failed to resolve. ``options`` are passed to every job.
+        Instagram sources (``platform='Instagram'``, the default when every
+        source is an Instagram URL) go through the Instagram sessions with
+        rate-limit backoff, at most INSTAGRAM_POOL_SIZE lookups at a time.
+        Returns the queued jobs.
+        """
+        if platform is None and sources and all(detect_platform(source) == 'Instagram' for source in sources):
+            platform = 'Instagram'
+        rule, selector = resolve_rule(format_selector)
+        jobs = []
+
+        def queue_item(item):
+            job = None
+            if item.error is None:
+                item_format = rule if rule is not None else selector
+                if rule is not None and item.info:
+                    recommendation = recommend(item.info, rule)
+                    if recommendation is not None:
+                        item_format = recommendation.selector
+                item_options = dict(options or {})
+                if rule is not None and rule.container:
+                    item_options['merge_output_format'] = rule.container
+                job = self.submit(item.url, item_format, platform=platform, output_dir=output_dir,
+                                  title=item.title, priority=priority, force=force, options=item_options)
+                jobs.append(job)
+            if on_item:
+                on_item(item, job)
+
+        if platform == 'Instagram':
+            ingestor = InstagramIngestor(self.instagram_sessions, self.metadata_cache,
+                                         pool_size=min(pool_size, INSTAGRAM_POOL_SIZE))
+        else:
+            ingestor = BatchIngestor(self.metadata_cache, pool_size=pool_size, ydl_pool=self.ydl_pool)
+        ingestor.run(sources, on_expanded=on_expanded, on_item=queue_item)
+        return jobs
+
+    def _admit(self, job):
+        """Scheduler admission check under the scheduler's lock: reserve the job's estimated size on its volume"""
+        return self.disk_space.reserve(job.id, job.output_dir, job.expected_bytes or 0)
+
+    def _run_job(self, job):
+        """Scheduler entry point; runs on a worker thread
+
+        Post-processing (merge, fixups, conversions) is handed to the
+        post-processing pool so this download slot is free for the next job
+        while ffmpeg runs.
+        """
+        if not job.options.get('force') and self.config.duplicate_policy != 'download':
+            # The full check, hashing included, and a catch for copies queued twice
+            existing = self.find_duplicate(job.url, job.format_selector, job.output_dir, job.title)
+            if existing is not None:
+                self._resolve_duplicate(job, existing)
+                if job.is_finished:
+                    return
+        os.makedirs(job.output_dir, exist_ok=True)
+        if job.metrics is None:
+            job.metrics = JobMetrics()
+        else:
+            # Resumed after a pause
+            job.metrics.resume()
+        self.bandwidth.register(job.id, job.stats.downloaded)
+        try:
+            if job.platform == 'Instagram':
+                ydl, info, deferred = self._download_instagram(job)
+            else:
+                ydl, info, deferred = self._download_youtube(job)
+        finally:
+            self.bandwidth.unregister(job.id)
+        if not deferred:
+            self.ydl_pool.release(ydl)
+            self._record_download(job, info)
+            return
+        self.scheduler.hand_off(job)
+        self.postprocessor.submit(self._post_process_job, job, ydl, info, deferred)
+
+    def _post_process_job(self, job, ydl, info, deferred):
+        """Post-processing pool entry point; finishes a handed-off job
+
+        A job cancelled before or during its post-processing is not
+        recorded and its files are deleted.
+        """
+        path = None
+        try:
+            if job.cancel_requested:
+                raise JobCancelled(f"Job {job.id} cancelled")
+            path = run_deferred(ydl, deferred)
+            if job.cancel_requested:
+                # ffmpeg cannot be interrupted, so a cancel during it lands here
+                raise JobCancelled(f"Job {job.id} cancelled")
+        except Exception as e:
+            self.ydl_pool.release(ydl, discard=True)
+            if job.cancel_requested:
+                discard_deferred(deferred, path)
+            self.scheduler.finish(job, error=e)
+            return
+        self.ydl_pool.release(ydl)
+        try:
+            self._record_download(job, info, path)
+        except Exception as e:
+            self.scheduler.finish(job, error=e)
+        else:
+            self.scheduler.finish(job)
+
+    def _record_download(self, job, info, path=None):
+        """Add a finished download to the index and history"""
+        job.title = info.get('title') or ('Unknown Instagram Video' if job.platform == 'Instagram' else 'Unknown Title')
+        path = path or _output_path(info)
+        job.metrics.finish(os.path.getsize(path) if path and os.path.exists(path) else None)
+        if path:
+            self.download_index.record(normalize_video_key(job.url), job.format_selector, path, job.title,
+                                       hash_content=self.config.hash_downloads)
+        entry = self.history_store.add(job.url, job.title, job.platform, metrics=job.metrics.to_dict())
+        self._emit('history', entry)
+
+    def _download_profile(self, platform, options):
+        """YDLPool profile: the options fixed when a download instance is built"""
+        profile = dict(METADATA_PROFILE) if platform == 'Instagram' else {}
+        profile.update(postprocessor_options(options))
+        return profile
+
+    def _download_youtube(self, job):
+        ydl_opts = {
+            'format': job.format_selector,
+            'outtmpl': os.path.join(job.output_dir, '%(title)s.%(ext)s'),
+            'merge_output_format': job.options.get('merge_output_format') or 'mp4',
+            # Continue from existing .part files when a journaled job is resumed
+            'continuedl': True,
+            'concurrent_fragment_downloads': self._concurrent_fragments(job),
+            'progress_hooks': [lambda d: self.progress_hook(d, job)],
+        }
+        return self._download(job, ydl_opts, self._extract_for_download)
+
+    def _download_instagram(self, job):
+        ydl_opts = {
+            # Carousel and highlight items share a title, so number them
+            'outtmpl': os.path.join(job.output_dir, '%(playlist_index&{} - |)s%(title)s.%(ext)s'),
+            'continuedl': True,
+            'concurrent_fragment_downloads': self._concurrent_fragments(job),
+            'progress_hooks': [lambda d: self.progress_hook(d, job)],
+        }
+        return self._download(job, ydl_opts, lambda ydl, job: self._extract_for_download(
+            ydl, job, extract=self.instagram_sessions.extract))
+
+    def _download(self, job, ydl_opts, extract):
+        """Run extract(ydl, job) on a pooled instance with post-processing deferred
+
+        ``ydl_opts`` are the per-job options applied to the borrowed
+        instance. Returns ``(ydl, info, deferred)``; ydl stays borrowed
+        until deferred post-processing is done.
+        """
+        profile = self._download_profile(job.platform, job.options)
+        params = dict(ydl_opts, **self._telemetry_options(job))
+        params['postprocessor_hooks'] = params['postprocessor_hooks'] + [lambda d: self._plan_download(d, job)]
+        ydl = self.ydl_pool.acquire(profile, **params)
+        try:
+            deferred = defer_post_processing(ydl, always=bool(profile.get('postprocessors')))
+            return ydl, extract(ydl, job), deferred
+        except BaseException:
+            self.ydl_pool.release(ydl, discard=True)
+            raise
+
+    def _plan_download(self, d, job):
+        """Reserve disk space for the selected formats before yt-dlp writes anything"""
+        if d.get('postprocessor') == 'DownloadMarker' and d.get('status') == 'started':
+            self.disk_space.plan(job.id, d.get('info_dict') or {}, checkpoint=job.checkpoint)
+
+    def _concurrent_fragments(self, job):
+        return max(1, int(job.options.get('concurrent_fragments') or self.config.concurrent_fragments))
+
+    def _telemetry_options(self, job):
+        """yt-dlp options feeding job.metrics"""
+        return {
+            'postprocessor_hooks': [job.metrics.on_postprocess],
+            # Called once per retry; counting only, so retries still happen immediately
+            'retry_sleep_functions': {
+                'http': job.metrics.retry_counter('http'),
+                'fragment': job.metrics.retry_counter('fragment'),
+            },
+        }
+
+    def _extract_for_download(self, ydl, job, extract=None):
+        """Download using cached metadata when available, extracting otherwise
+
+        ``extract(url)`` returning an info dict replaces extraction by ydl,
+        e.g. to go through a persistent Instagram session.
+        """
+        cache_key = normalize_video_key(job.url)
+        info = self.metadata_cache.get(cache_key)
+        if info is not None:
+            job.metrics.metadata_cached = True
+            try:
+                return ydl.process_ie_result(info, download=True)
+            except load_yt_dlp().utils.DownloadError:
+                # Stream URLs in the cached info may have expired early
+                self.metadata_cache.invalidate(cache_key)
+                job.metrics.metadata_cached = False
+        if extract is None:
+            return ydl.extract_info(job.url, download=True)
+        info = extract(job.url)
+        self.metadata_cache.put(cache_key, info)
+        return ydl.process_ie_result(info, download=True)
+
+    def progress_hook(self, d, job):
+        """Progress hook for yt-dlp; records progress on the job"""
+        if job.pause_requested:
+            # Time until the job runs again is left out of its download time
+            job.metrics.pause()
+        # Raises once the job is paused or cancelled; a paused job gives up
+        # its slot and bandwidth share, and continues from the .part file
+        job.checkpoint()
+        job.stats.update(d)
+        job.metrics.on_progress(d)
+        self.disk_space.progress(job.id, d)
+        if d['status'] == 'downloading':
+            self.bandwidth.throttle(job.id, d.get('downloaded_bytes') or 0)
@@ -0,0 +1,270 @@
+"""Ranking of yt-dlp formats against user rules
+
+A FormatRule describes what the user wants (maximum height, codec
+preference, output container, size budget). ``recommend`` ranks the
+``formats`` of an info dict against it and returns a ready-to-use
+selector, merging the best video-only stream with a compatible audio
+stream when that beats the best progressive format.
+"""
+
+# Normalized codec family per codec string prefix
+_CODEC_PREFIXES = (
+    ('av01', 'av1'),
+    ('av1', 'av1'),
+    ('vp09', 'vp9'),
+    ('vp9', 'vp9'),
+    ('vp8', 'vp8'),
+    ('avc', 'h264'),
+    ('h264', 'h264'),
+    ('hev', 'h265'),
+    ('hvc', 'h265'),
+    ('h265', 'h265'),
+    ('mp4a', 'aac'),
+    ('aac', 'aac'),
+    ('opus', 'opus'),
+    ('vorbis', 'vorbis'),
+    ('mp3', 'mp3'),
+)
+
+# Codecs that can be stored in each output container without re-encoding,
+# audio in order of player compatibility
+CONTAINER_AUDIO = {
+    'mp4': ('aac', 'mp3', 'opus'),
+    'webm': ('opus', 'vorbis'),
+    'mkv': None,
+}
+CONTAINER_VIDEO = {
+    'mp4': ('h264', 'h265', 'av1', 'vp9'),
+    'webm': ('vp9', 'vp8', 'av1'),
+    'mkv': None,
+}
+
+
+def codec_family(codec):
+    """Normalize a codec string such as 'avc1.64001F' to a family name"""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower()
+    for prefix, family in _CODEC_PREFIXES:
+        if codec.startswith(prefix):
+            return family
+    return codec.split('.')[0]
+
+
+def has_video(fmt):
+    return fmt.get('vcodec', 'none') != 'none'
+
+
+def has_audio(fmt):
+    return fmt.get('acodec', 'none') != 'none'
+
+
+def estimate_size(fmt, duration=None):
+    """Best guess of a format's size in bytes, or None"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+
+class FormatRule:
+    """What the user wants from a download
+
+    ``codecs`` is a preference order; codecs not listed are still allowed
+    but ranked last. ``target_size`` is in bytes and caps the estimated
+    size of video plus audio.
+    """
+
+    def __init__(self, max_height=None, codecs=('av1', 'vp9', 'h264'), container='mp4',
+                 target_size=None, audio_only=False):
+        self.max_height = max_height
+        self.codecs = tuple(codecs or ())
+        self.container = container
+        self.target_size = target_size
+        self.audio_only = audio_only
+
+    def selector(self):
+        """Generic yt-dlp selector for when no info dict is available yet"""
+        if self.audio_only:
+            return 'ba[ext=m4a]/ba/b' if self.container == 'mp4' else 'ba/b'
+        height = f"[height<={self.max_height}]" if self.max_height else ""
+        if self.container == 'mp4':
+            return f"bv*{height}[ext=mp4]+ba[ext=m4a]/b{height}[ext=mp4]/bv*{height}+ba/b{height}"
+        return f"bv*{height}+ba/b{height}"
+
+    def describe(self):
+        if self.audio_only:
+            return "audio only"
+        parts = [f"≤{self.max_height}p" if self.max_height else "best"]
+        if self.codecs:
+            parts.append(">".join(self.codecs))
+        if self.container:
+            parts.append(self.container)
+        if self.target_size:
+            parts.append(f"≤{self.target_size / (1024*1024):.0f} MB")
+        return " ".join(parts)
+
+
+# Codec preference orders offered in the UI
+CODEC_PREFERENCES = {
+    'av1 > vp9 > h264': ('av1', 'vp9', 'h264'),
+    'vp9 > h264 > av1': ('vp9', 'h264', 'av1'),
+    'h264 > vp9 > av1': ('h264', 'vp9', 'av1'),
+}
+
+# Named rules offered in the UI, the CLI and the job API
+RULE_PRESETS = {
+    'best ≤1080p mp4': FormatRule(max_height=1080),
+    'best ≤720p mp4': FormatRule(max_height=720),
+    'best ≤480p': FormatRule(max_height=480, container='mkv'),
+    'best available': FormatRule(container='mkv'),
+    'audio only': FormatRule(audio_only=True),
+}
+DEFAULT_RULE = 'best ≤1080p mp4'
+
+
+def resolve_rule(format_spec):
+    """Map a preset name, FormatRule or raw selector to ``(rule, selector)``
+
+    ``rule`` is None for raw yt-dlp selectors, which are passed through.
+    """
+    if isinstance(format_spec, FormatRule):
+        return format_spec, format_spec.selector()
+    rule = RULE_PRESETS.get(format_spec)
+    if rule is not None:
+        return rule, rule.selector()
+    return None, format_spec
+
+
+class Recommendation:
+    """The chosen format(s) for a rule"""
+
+    def __init__(self, video=None, audio=None, duration=None, container=None):
+        self.video = video
+        self.audio = audio
+        self.container = container
+        sizes = [estimate_size(f, duration) for f in (video, audio) if f]
+        self.estimated_size = sum(sizes) if sizes and all(sizes) else None
+
+    @property
+    def selector(self):
+        ids = [f['format_id'] for f in (self.video, self.audio) if f]
+        return '+'.join(ids)
+
+    @property
+    def formats(self):
+        return [f for f in (self.video, self.audio) if f]
+
+    def describe(self):
+        main = self.video or self.audio
+        parts = []
+        if self.video and self.video.get('height'):
+            parts.append(f"{self.video['height']}p")
+        codecs = [codec_family(main.get('vcodec'))] if self.video else []
+        if self.audio or has_audio(main):
+            codecs.append(codec_family((self.audio or main).get('acodec')))
+        parts.append("/".join(c for c in codecs if c))
+        if self.estimated_size:
+            parts.append(f"~{self.estimated_size / (1024*1024):.1f} MB")
+        return f"{' '.join(parts)} ({self.selector})"
+
+
+def _codec_rank(rule, family):
+    if family in rule.codecs:
+        return len(rule.codecs) - rule.codecs.index(family)
+    return 0
+
+
+def _fits_container(rule, fmt):
+    video_ok = CONTAINER_VIDEO.get(rule.container)
+    audio_ok = CONTAINER_AUDIO.get(rule.container)
+    if has_video(fmt) and video_ok and codec_family(fmt.get('vcodec')) not in video_ok:
+        return False
+    if has_audio(fmt) and audio_ok and codec_family(fmt.get('acodec')) not in audio_ok:
+        return False
+    return True
+
+
+def _video_key(rule, fmt):
+    return (
+        _fits_container(rule, fmt),
+        fmt.get('height') or 0,
+        _codec_rank(rule, codec_family(fmt.get('vcodec'))),
+        fmt.get('fps') or 0,
+        fmt.get('tbr') or fmt.get('vbr') or 0,
+    )
+
+
+def _audio_key(rule, fmt):
+    preferred = CONTAINER_AUDIO.get(rule.container) or ()
+    family = codec_family(fmt.get('acodec'))
+    return (
+        _fits_container(rule, fmt),
+        len(preferred) - preferred.index(family) if family in preferred else 0,
+        fmt.get('abr') or fmt.get('tbr') or 0,
+    )
+
+
+def rank_formats(formats, rule):
+    """Video-carrying formats allowed by the rule, best first"""
+    candidates = [
+        f for f in formats
+        if has_video(f) and f.get('format_id')
+        and not (rule.max_height and (f.get('height') or 0) > rule.max_height)
+    ]
+    return sorted(candidates, key=lambda f: _video_key(rule, f), reverse=True)
+
+
+def best_audio(formats, rule):
+    audios = [f for f in formats if has_audio(f) and not has_video(f) and f.get('format_id')]
+    if not audios:
+        return None
+    return max(audios, key=lambda f: _audio_key(rule, f))
+
+
+def _within_budget(recommendation, rule):
+    size = recommendation.estimated_size
+    return not rule.target_size or (size is not None and size <= rule.target_size)
+
+
+def recommend(info, rule):
+    """Best Recommendation for info under rule, or None if nothing is usable"""
+    formats = info.get('formats') or []
+    duration = info.get('duration')
+
+    if rule.audio_only:
+        audio = best_audio(formats, rule)
+        if audio is None:
+            progressive = [f for f in formats if has_audio(f) and f.get('format_id')]
+            audio = max(progressive, key=lambda f: _audio_key(rule, f)) if progressive else None
+        return Recommendation(audio=audio, duration=duration, container=rule.container) if audio else None
+
+    audio = best_audio(formats, rule)
+    options = []
+    for fmt in rank_formats(formats, rule):
+        if has_audio(fmt):
+            options.append(Recommendation(video=fmt, duration=duration, container=rule.container))
+        elif audio is not None:
+            options.append(Recommendation(video=fmt, audio=audio, duration=duration, container=rule.container))
+    if not options:
+        return None
+
+    # rank_formats already ordered the options; a size budget only removes the
+    # ones that are too large, falling back to the smallest known size
+    within = [r for r in options if _within_budget(r, rule)]
+    if within:
+        return within[0]
+    sized = [r for r in options if r.estimated_size]
+    return min(sized, key=lambda r: r.estimated_size) if sized else options[0]
+
+
+def selector_for(fmt, formats, rule=None):
+    """Selector for a manually picked format, adding audio to video-only picks"""
+    if not has_video(fmt) or has_audio(fmt):
+        return fmt['format_id']
+    audio = best_audio(formats, rule or FormatRule())
+    if audio is None:
+        return fmt['format_id']
+    return f"{fmt['format_id']}+{audio['format_id']}"
@@ -0,0 +1,165 @@
+import bisect
+import re
+import threading
+
+# Columns search results can be sorted by
+SORT_COLUMNS = ('title', 'url', 'date', 'platform')
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _words(text):
+    return _WORD_RE.findall((text or '').lower())
+
+
+def _sort_key(entry, column):
+    value = entry.get(column) or ''
+    return value.lower() if column in ('title', 'platform') else value
+
+
+class SearchResults:
+    """Matching entries in result order; entries are looked up when indexed or sliced"""
+
+    def __init__(self, entries, ids):
+        self._entries = entries
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entries[entry_id] for entry_id in self._ids[index]]
+        return self._entries[self._ids[index]]
+
+    def __iter__(self):
+        return (self._entries[entry_id] for entry_id in self._ids)
+
+
+class HistoryIndex:
+    """In-memory search index over history entries
+
+    Every word of an entry's title, URL and platform is indexed as a
+    (word, id) pair, and the pairs are kept sorted by word, so the ids of
+    every entry with a word starting with a query word are one contiguous
+    slice found by binary search, however many distinct words share the
+    prefix. One sorted order per column is built with the index and kept
+    current by ``add``. A search intersects the id sets of its query words,
+    platform and date range and then sorts the few matches directly, or
+    filters the column order when most entries match. Results are returned
+    as a lazy SearchResults, so showing one page of 100k matches only
+    builds that page.
+    """
+
+    def __init__(self, entries=()):
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Sorted by word, in step: the word of each (word, id) pair and its id
+        self._pair_words = []
+        self._pair_ids = []
+        # platform -> ids
+        self._platforms = {}
+        # column -> ([(sort key, id)], [id]) ascending, in step
+        self._orders = {}
+        pairs = sorted((word, entry['id']) for entry in entries for word in self._index(entry))
+        self._pair_words = [word for word, _entry_id in pairs]
+        self._pair_ids = [entry_id for _word, entry_id in pairs]
+        # Built now, on the caller's background thread, so no sort pays for it
+        for column in SORT_COLUMNS:
+            self._order(column)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, entry):
+        """Record entry by id and platform; returns its distinct words"""
+        self._entries[entry['id']] = entry
+        self._platforms.setdefault(entry.get('platform'), set()).add(entry['id'])
+        return set(_words(entry.get('title')) + _words(entry.get('url')) + _words(entry.get('platform')))
+
+    def add(self, entry):
+        """Index a newly recorded history entry"""
+        with self._lock:
+            if entry['id'] in self._entries:
+                return
+            for word in self._index(entry):
+                position = bisect.bisect(self._pair_words, word)
+                self._pair_words.insert(position, word)
+                self._pair_ids.insert(position, entry['id'])
+            for column, (keys, ids) in self._orders.items():
+                key = (_sort_key(entry, column), entry['id'])
+                position = bisect.bisect(keys, key)
+                keys.insert(position, key)
+                ids.insert(position, entry['id'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pair_words = []
+            self._pair_ids = []
+            self._platforms.clear()
+            self._orders.clear()
+
+    def _order(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            keys = sorted((_sort_key(entry, column), entry_id) for entry_id, entry in self._entries.items())
+            order = self._orders[column] = (keys, [entry_id for _key, entry_id in keys])
+        return order
+
+    def _match(self, query):
+        """Ids of entries with a word starting with each query word; None matches everything"""
+        matched = None
+        # Longer words match fewer entries, so the intersection shrinks fastest
+        for word in sorted(set(_words(query)), key=len, reverse=True):
+            # Every word starting with word sorts between the two
+            low = bisect.bisect_left(self._pair_words, word)
+            high = bisect.bisect_left(self._pair_words, word + '\U0010ffff', low)
+            ids = set(self._pair_ids[low:high])
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched
+
+    def search(self, query='', platform=None, start=None, end=None, sort='date', descending=True):
+        """SearchResults of the entries matching every word of query, filtered and sorted
+
+        ``start`` and ``end`` bound the date inclusively and, like
+        ``HistoryStore.between``, may be prefixes of the date format, so
+        ``end='2024-01'`` includes all of January 2024. Entries with equal
+        values in the sort column are ordered by when they were recorded.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort history by {sort!r}")
+        with self._lock:
+            ids = self._order(sort)[1]
+            filters = []
+            matched = self._match(query)
+            if matched is not None:
+                filters.append(matched)
+            if platform:
+                filters.append(self._platforms.get(platform, set()))
+            if start or end:
+                date_keys, date_ids = self._order('date')
+                low = bisect.bisect_left(date_keys, (start,)) if start else 0
+                high = bisect.bisect_left(date_keys, (end + '\uffff',)) if end else len(date_keys)
+                if not filters and sort == 'date':
+                    # The date order itself is the result
+                    return SearchResults(self._entries, date_ids[low:high][::-1] if descending else date_ids[low:high])
+                filters.append(set(date_ids[low:high]))
+            if not filters:
+                return SearchResults(self._entries, ids[::-1] if descending else list(ids))
+
+            filters.sort(key=len)
+            candidates = filters[0]
+            for other in filters[1:]:
+                candidates = candidates & other
+            if len(candidates) * 8 < len(ids):
+                # Few matches: sorting them beats walking the whole order
+                result = sorted(candidates, key=lambda entry_id: (_sort_key(self._entries[entry_id], sort), entry_id),
+                                reverse=descending)
+            else:
+                result = [entry_id for entry_id in ids if entry_id in candidates]
+                if descending:
+                    result.reverse()
+            return SearchResults(self._entries, result)
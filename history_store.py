@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from telemetry import METRIC_FIELDS
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT,
+    platform TEXT,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_url ON history (url);
+CREATE INDEX IF NOT EXISTS idx_history_platform ON history (platform);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history (date);
+CREATE TABLE IF NOT EXISTS metrics (
+    history_id INTEGER PRIMARY KEY REFERENCES history (id),
+    extract_seconds REAL,
+    ttfb_seconds REAL,
+    download_seconds REAL,
+    postprocess_seconds REAL,
+    total_seconds REAL,
+    avg_speed INTEGER,
+    peak_speed INTEGER,
+    downloaded_bytes INTEGER,
+    bytes_written INTEGER,
+    fragment_retries INTEGER,
+    http_retries INTEGER,
+    metadata_cached INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = "id, url, title, platform, date"
+
+
+class HistoryStore:
+    """Append-only download history backed by SQLite in WAL mode
+
+    Each completed download is a single INSERT, so recording one entry costs
+    the same no matter how large the history is, and an interrupted write
+    can never corrupt earlier entries.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, url, title, platform, date=None, metrics=None):
+        """Append an entry, with optional per-job metrics, and return it as a dict"""
+        date = date or datetime.now().strftime(DATE_FORMAT)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO history (url, title, platform, date) VALUES (?, ?, ?, ?)",
+                (url, title, platform, date),
+            )
+            if metrics:
+                self._conn.execute(
+                    f"INSERT INTO metrics (history_id, {', '.join(METRIC_FIELDS)})"
+                    f" VALUES (?{', ?' * len(METRIC_FIELDS)})",
+                    (cursor.lastrowid, *(metrics.get(field) for field in METRIC_FIELDS)),
+                )
+            self._conn.commit()
+        entry = {'id': cursor.lastrowid, 'url': url, 'title': title, 'platform': platform, 'date': date}
+        if metrics:
+            entry['metrics'] = metrics
+        return entry
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def recent(self, limit=-1, offset=0):
+        """Entries newest first; a negative limit returns everything"""
+        return self._query(
+            f"SELECT {_COLUMNS} FROM history ORDER BY id DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+
+    def find_by_url(self, url):
+        return self._query(f"SELECT {_COLUMNS} FROM history WHERE url = ? ORDER BY id DESC", (url,))
+
+    def by_platform(self, platform, limit=-1):
+        return self._query(
+            f"SELECT {_COLUMNS} FROM history WHERE platform = ? ORDER BY id DESC LIMIT ?",
+            (platform, limit),
+        )
+
+    def between(self, start, end):
+        """Entries dated from start to end inclusive
+
+        Both bounds use DATE_FORMAT or a prefix of it, so ``between('2024-01',
+        '2024-01')`` returns all of January 2024.
+        """
+        return self._query(
+            f"SELECT {_COLUMNS} FROM history WHERE date >= ? AND date <= ? ORDER BY date DESC",
+            (start, end + '\uffff'),
+        )
+
+    def with_metrics(self, limit=-1):
+        """Entries that have metrics, newest first, with the metric fields merged in"""
+        columns = ', '.join(f"m.{field}" for field in METRIC_FIELDS)
+        return self._query(
+            f"SELECT h.id, h.url, h.title, h.platform, h.date, {columns}"
+            " FROM history h JOIN metrics m ON m.history_id = h.id ORDER BY h.id DESC LIMIT ?",
+            (limit,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM metrics")
+            self._conn.execute("DELETE FROM history")
+            self._conn.commit()
+
+    def migrate_json(self, json_path):
+        """Import a legacy JSON history file once, then set it aside
+
+        The JSON file stores entries newest first; they are inserted oldest
+        first so row ids keep increasing with time.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if row is not None or not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            entries = []
+
+        rows = [
+            (e.get('url', ''), e.get('title'), e.get('platform'), e.get('date'))
+            for e in reversed(entries) if isinstance(e, dict)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO history (url, title, platform, date) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().strftime(DATE_FORMAT),),
+            )
+            self._conn.commit()
+
+        try:
+            os.replace(json_path, json_path + '.migrated')
+        except OSError as e:
+            print(f"Failed to rename migrated history file: {e}")
+        return len(rows)
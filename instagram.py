@@ -0,0 +1,183 @@
+import contextlib
+import itertools
+import os
+import shutil
+import threading
+import time
+
+from batch import BatchIngestor
+from metadata_cache import normalize_video_key
+
+# Instagram rate-limits metadata requests quickly, so bulk lookups stay small
+INSTAGRAM_POOL_SIZE = 3
+
+# Seconds to wait after the first rate-limit error, doubled on each further one
+DEFAULT_BACKOFF = 15
+MAX_BACKOFF = 600
+DEFAULT_RETRIES = 4
+
+_RATE_LIMIT_MARKERS = ('429', 'too many requests', 'rate-limit', 'rate limit', 'please wait a few minutes')
+
+
+def is_rate_limited(error):
+    """Whether a yt-dlp error means Instagram is throttling us"""
+    message = str(error).lower()
+    return any(marker in message for marker in _RATE_LIMIT_MARKERS)
+
+
+class AdaptiveBackoff:
+    """Delay before Instagram requests, shared by all workers
+
+    Every rate-limit error doubles the delay (starting at ``base``, capped
+    at ``maximum``) and every successful request halves it again, so a
+    burst of 429s slows all workers down and normal speed returns once
+    Instagram stops complaining.
+    """
+
+    def __init__(self, base=DEFAULT_BACKOFF, maximum=MAX_BACKOFF, retries=DEFAULT_RETRIES):
+        self.base = base
+        self.maximum = maximum
+        self.retries = retries
+        self.delay = 0
+        self._lock = threading.Lock()
+
+    def failure(self):
+        with self._lock:
+            self.delay = min(self.maximum, max(self.base, self.delay * 2))
+            return self.delay
+
+    def success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay / 2 >= self.base else 0
+
+    def call(self, func, *args, **kwargs):
+        """Run func, waiting out rate limits; other errors are raised at once"""
+        for attempt in range(self.retries + 1):
+            if self.delay:
+                time.sleep(self.delay)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not is_rate_limited(e):
+                    raise
+                print(f"Instagram rate limit hit, backing off {self.failure():g}s")
+                continue
+            self.success()
+            return result
+
+
+class InstagramSessions:
+    """Persistent YoutubeDL instances with their own cookie jars
+
+    A worker borrows a session for each request and returns it afterwards,
+    so there are never more sessions than concurrent workers and each one
+    keeps its connections and cookies between requests. Every session has
+    its own cookie file in ``session_dir``, seeded from ``cookies_file``
+    (a Netscape cookies.txt exported from a logged-in browser) and saved
+    back by yt-dlp when the session is closed, so the login survives
+    restarts.
+    """
+
+    def __init__(self, session_dir, cookies_file=None, ydl_class=None, backoff=None):
+        self.session_dir = session_dir
+        self.cookies_file = cookies_file
+        if ydl_class is None:
+            # Imported here so loading this module does not pull in yt-dlp
+            import yt_dlp
+            ydl_class = yt_dlp.YoutubeDL
+        self.ydl_class = ydl_class
+        self.backoff = backoff or AdaptiveBackoff()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._sessions = []
+        self._counter = itertools.count()
+
+    def _cookie_file(self, index):
+        os.makedirs(self.session_dir, exist_ok=True)
+        path = os.path.join(self.session_dir, f"cookies-{index}.txt")
+        source = self.cookies_file
+        if source and os.path.exists(source):
+            # A newer export from the browser replaces the session's cookies
+            if not os.path.exists(path) or os.path.getmtime(source) > os.path.getmtime(path):
+                shutil.copyfile(source, path)
+        return path
+
+    @contextlib.contextmanager
+    def session(self):
+        """Borrow a YoutubeDL for the current worker"""
+        with self._lock:
+            ydl = self._idle.pop() if self._idle else None
+            index = None if ydl else next(self._counter)
+        if ydl is None:
+            ydl = self.ydl_class({'quiet': True, 'no_warnings': True, 'cookiefile': self._cookie_file(index)})
+            with self._lock:
+                self._sessions.append(ydl)
+        try:
+            yield ydl
+        finally:
+            with self._lock:
+                self._idle.append(ydl)
+
+    def extract(self, url, process=True):
+        """Sanitized info dict for url, backing off while rate-limited
+
+        With ``process=False`` playlist entries are listed but not
+        resolved, which turns a profile into its post URLs in a few
+        requests.
+        """
+        def attempt():
+            with self.session() as ydl:
+                info = ydl.extract_info(url, download=False, process=process)
+                if info.get('entries') is not None:
+                    info['entries'] = list(info['entries'])
+                return ydl.sanitize_info(info)
+        return self.backoff.call(attempt)
+
+    def close(self):
+        """Close every session, saving its cookies"""
+        with self._lock:
+            sessions = self._sessions
+            self._sessions = []
+            self._idle = []
+        for ydl in sessions:
+            try:
+                ydl.close()
+            except Exception as e:
+                print(f"Failed to close Instagram session: {e}")
+
+
+class InstagramIngestor(BatchIngestor):
+    """BatchIngestor for Instagram profiles, posts, carousels and reel lists
+
+    Profiles and hashtags expand into one download per post. A post with
+    several media (a carousel) or a story highlight stays one download that
+    fetches every item. All requests go through InstagramSessions, so
+    workers reuse their sessions and back off together when rate-limited.
+    """
+
+    def __init__(self, sessions, metadata_cache=None, pool_size=INSTAGRAM_POOL_SIZE):
+        super().__init__(metadata_cache, pool_size=pool_size, ydl_class=sessions.ydl_class)
+        self.sessions = sessions
+
+    def expand(self, source):
+        info = self.sessions.extract(source, process=False)
+        if info.get('_type') == 'url' and info.get('url'):
+            return self.expand(info['url'])
+        entries = [entry for entry in info.get('entries') or [] if entry]
+        if entries and all(entry.get('_type') == 'url' and entry.get('url') for entry in entries):
+            return [entry['url'] for entry in entries]
+        # A single post, carousel or highlight; keep what was fetched for resolve
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(normalize_video_key(source), info)
+        return [source]
+
+    def resolve(self, url):
+        key = normalize_video_key(url)
+        if self.metadata_cache is not None:
+            info = self.metadata_cache.get(key)
+            if info is not None:
+                return info
+        info = self.sessions.extract(url)
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(key, info)
+        return info
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import threading
+import time
+
+from scheduler import DownloadJob, PAUSED, PROCESSING, QUEUED, RUNNING
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    platform TEXT,
+    format_selector TEXT,
+    output_dir TEXT,
+    title TEXT,
+    priority TEXT,
+    options TEXT,
+    state TEXT,
+    error TEXT,
+    created REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+"""
+
+# Jobs interrupted while processing are resumed by running the whole job
+# again: it is extracted anew (or served from the metadata cache), yt-dlp
+# skips the formats whose files are already complete, and then every
+# post-processor runs again
+UNFINISHED_STATES = (QUEUED, RUNNING, PAUSED, PROCESSING)
+
+# Finished journal rows are kept this long for inspection
+DEFAULT_RETENTION = 7 * 24 * 60 * 60
+
+
+class JobJournal:
+    """Crash-safe record of every queued download
+
+    Each state change is committed immediately, so after a crash or an
+    unclean exit the jobs that were queued, running or paused can be
+    resubmitted with the same URL, format and output directory. yt-dlp then
+    continues from the existing ``.part`` files instead of byte zero.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def attach(self, scheduler):
+        """Record every job of scheduler as it changes state"""
+        scheduler.add_listener(self.record)
+
+    def record(self, job):
+        """Insert or update the journal row for job"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, url, platform, format_selector, output_dir, title,"
+                " priority, options, state, error, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.url, job.platform, job.format_selector, job.output_dir, job.title,
+                 job.priority, json.dumps(job.options), job.state, job.error, job.created, time.time()),
+            )
+            self._conn.commit()
+
+    def unfinished(self):
+        """Rows of jobs that never reached a finished state, oldest first"""
+        placeholders = ', '.join('?' for _ in UNFINISHED_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({placeholders}) ORDER BY created",
+                UNFINISHED_STATES,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self, retention=DEFAULT_RETENTION):
+        """Drop finished rows older than retention seconds"""
+        placeholders = ', '.join('?' for _ in UNFINISHED_STATES)
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE state NOT IN ({placeholders}) AND updated < ?",
+                (*UNFINISHED_STATES, time.time() - retention),
+            )
+            self._conn.commit()
+
+    def resume(self, scheduler):
+        """Resubmit unfinished jobs to scheduler; returns the resubmitted jobs"""
+        jobs = []
+        for row in self.unfinished():
+            job = DownloadJob(
+                row['url'],
+                row['platform'],
+                format_selector=row['format_selector'],
+                output_dir=row['output_dir'],
+                title=row['title'],
+                priority=row['priority'],
+                options=json.loads(row['options'] or '{}'),
+                job_id=row['id'],
+            )
+            job.created = row['created'] or job.created
+            if row['state'] == PAUSED:
+                # Paused before submission so no worker can pick it up first
+                job.state = PAUSED
+            scheduler.submit(job)
+            jobs.append(job)
+        return jobs
+
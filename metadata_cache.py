@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+# Stream URLs inside YouTube info dicts expire after roughly six hours,
+# so cached entries must not outlive them
+DEFAULT_TTL = 3 * 60 * 60
+DEFAULT_MAX_ENTRIES = 500
+
+_YOUTUBE_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_YOUTUBE_PATH_PREFIXES = ('/shorts/', '/embed/', '/live/', '/v/')
+_INSTAGRAM_RE = re.compile(r'^/(?:[^/]+/)?(?:p|reel|reels|tv)/([0-9A-Za-z_-]+)')
+
+
+def normalize_video_key(url):
+    """Map the different URL shapes of one video to a stable key
+
+    youtu.be links, shorts, embeds and watch URLs with extra query
+    parameters all collapse to ``youtube:<id>``. Unknown sites fall back
+    to the URL without scheme, fragment or ``www.`` prefix.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split(':')[0]
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = parsed.path
+
+    video_id = None
+    if host == 'youtu.be':
+        video_id = path.lstrip('/').split('/')[0]
+    elif host in ('youtube.com', 'youtube-nocookie.com'):
+        if path == '/watch':
+            video_id = parse_qs(parsed.query).get('v', [''])[0]
+        else:
+            for prefix in _YOUTUBE_PATH_PREFIXES:
+                if path.startswith(prefix):
+                    video_id = path[len(prefix):].split('/')[0]
+                    break
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        return f"youtube:{video_id}"
+
+    if host == 'instagram.com':
+        match = _INSTAGRAM_RE.match(path)
+        if match:
+            return f"instagram:{match.group(1)}"
+
+    query = '&'.join(sorted(q for q in parsed.query.split('&') if q))
+    key = f"url:{host}{path.rstrip('/')}"
+    return f"{key}?{query}" if query else key
+
+
+class MetadataCache:
+    """On-disk cache of yt-dlp info dicts with a TTL and LRU size cap
+
+    Each entry is one JSON file; its modification time doubles as the
+    last-access time used for LRU eviction.
+    """
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key):
+        """Return the cached info dict for key, or None if missing or expired"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return None
+            if time.time() - entry.get('cached_at', 0) > self.ttl:
+                self._remove(path)
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry.get('info')
+
+    def put(self, key, info):
+        """Store a JSON-serializable info dict under key"""
+        path = self._path(key)
+        entry = {'key': key, 'cached_at': time.time(), 'info': info}
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                self._remove(tmp_path)
+                print(f"Failed to cache metadata: {e}")
+                return
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(self._path(key))
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    self._remove(os.path.join(self.cache_dir, name))
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones over the cap"""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            if now - mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((mtime, path))
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            entries.sort()
+            for _, path in entries[:excess]:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
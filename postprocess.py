@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+
+# ffmpeg is itself multi-threaded when transcoding, so half the cores keeps
+# the machine responsive while downloads continue
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Audio codecs and containers offered for extraction, remuxing and transcoding
+AUDIO_CODECS = ('best', 'mp3', 'm4a', 'opus', 'flac', 'wav')
+VIDEO_CONTAINERS = ('mp4', 'mkv', 'webm', 'mov')
+
+# Job options understood by postprocessor_options
+POSTPROCESS_OPTIONS = ('extract_audio', 'remux', 'transcode', 'embed_thumbnail')
+
+
+def postprocessor_options(options):
+    """yt-dlp options for the post-processors requested in a job's options
+
+    Understands ``extract_audio`` (codec), ``remux`` and ``transcode``
+    (target container) and ``embed_thumbnail``; the merge of separate video
+    and audio formats is added by yt-dlp itself.
+    """
+    postprocessors = []
+    if options.get('extract_audio'):
+        postprocessors.append({'key': 'FFmpegExtractAudio', 'preferredcodec': options['extract_audio']})
+    if options.get('remux'):
+        postprocessors.append({'key': 'FFmpegVideoRemuxer', 'preferedformat': options['remux']})
+    if options.get('transcode'):
+        postprocessors.append({'key': 'FFmpegVideoConvertor', 'preferedformat': options['transcode']})
+    if options.get('embed_thumbnail'):
+        postprocessors.append({'key': 'EmbedThumbnail'})
+    ydl_opts = {'postprocessors': postprocessors} if postprocessors else {}
+    if options.get('embed_thumbnail'):
+        ydl_opts['writethumbnail'] = True
+    return ydl_opts
+
+
+def defer_post_processing(ydl, always=False):
+    """Record the post-processing of ydl's downloads instead of running it
+
+    yt-dlp calls ``post_process`` as soon as a file is downloaded, and the
+    merge, fixups and every configured post-processor run inside it. The
+    calls are collected in the returned list so the download worker can
+    move on and a PostProcessPool worker can run them later with
+    ``run_deferred``. Files with nothing to do are processed inline unless
+    ``always`` is set (the job has post-processors of its own). Calling it
+    again on a reused instance replaces the previous recording.
+    """
+    deferred = []
+
+    def record(filename, info, files_to_move=None):
+        if not (always or info.get('__postprocessors')):
+            return type(ydl).post_process(ydl, filename, info, files_to_move)
+        # yt-dlp strips keys shared with the video's info once the format is done
+        deferred.append((filename, dict(info), files_to_move))
+        info['filepath'] = filename
+        return info
+
+    ydl.post_process = record
+    return deferred
+
+
+def run_deferred(ydl, deferred):
+    """Run post-processing recorded by defer_post_processing; returns the final file path"""
+    path = None
+    for filename, info, files_to_move in deferred:
+        # The class method, not the recording wrapper set on the instance
+        info = type(ydl).post_process(ydl, filename, info, files_to_move)
+        path = info.get('filepath') or path
+    return path
+
+
+def discard_deferred(deferred, path=None):
+    """Delete the files of a cancelled job: downloads, merge inputs and path"""
+    files = {path}
+    for filename, info, _files_to_move in deferred:
+        files.add(filename)
+        files.update(info.get('__files_to_merge') or ())
+    for file in files:
+        if file and os.path.isfile(file):
+            try:
+                os.remove(file)
+            except OSError as e:
+                print(f"Failed to remove {file}: {e}")
+
+
+class PostProcessPool:
+    """Worker threads for CPU-bound post-processing
+
+    Tasks are plain callables; the heavy lifting happens in ffmpeg
+    subprocesses, so threads run them in parallel without holding the GIL.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.workers = 0
+        self.set_workers(workers)
+
+    def set_workers(self, workers):
+        """Grow or shrink the pool; surplus workers exit once they are idle"""
+        self._resize(max(1, int(workers)))
+
+    def _resize(self, workers):
+        with self._lock:
+            while self.workers < workers:
+                threading.Thread(target=self._worker, daemon=True).start()
+                self.workers += 1
+            while self.workers > workers:
+                self._queue.put(None)
+                self.workers -= 1
+
+    def submit(self, func, *args):
+        self._queue.put((func, args))
+
+    def pending(self):
+        """Tasks waiting for a free worker"""
+        return self._queue.qsize()
+
+    def shutdown(self):
+        """Stop the workers after the tasks already queued"""
+        self._resize(0)
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            func, args = task
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Post-processing task failed: {e}")
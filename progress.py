@@ -0,0 +1,113 @@
+import threading
+
+DEFAULT_RATE_HZ = 10
+
+
+class ProgressState:
+    """Latest progress of one job
+
+    Progress hooks only assign attributes and bump ``version``, so the
+    hot download path never takes a lock. The ticker treats a changed
+    version as "dirty" and reads whatever values are current.
+    """
+
+    __slots__ = ('status', 'downloaded', 'total', 'speed', 'eta', 'version')
+
+    def __init__(self):
+        self.status = None
+        self.downloaded = 0
+        self.total = None
+        self.speed = None
+        self.eta = None
+        self.version = 0
+
+    def update(self, d):
+        """Record a yt-dlp progress dict"""
+        self.status = d.get('status')
+        self.downloaded = d.get('downloaded_bytes') or self.downloaded
+        self.total = d.get('total_bytes') or d.get('total_bytes_estimate') or self.total
+        self.speed = d.get('speed')
+        self.eta = d.get('eta')
+        self.version += 1
+
+    @property
+    def fraction(self):
+        if self.status == 'finished':
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.downloaded / self.total, 1.0)
+
+
+class ProgressTicker:
+    """Flushes changed progress states at a fixed rate
+
+    ``flush`` is called from the ticker thread with a dict of
+    ``key -> ProgressState`` holding only the states that changed since the
+    previous tick, and is not called at all when nothing changed. UI cost is
+    therefore bounded by the tick rate rather than by hook frequency.
+    An untracked state is dropped only after the next tick, so its final
+    values (100%, finished) are still flushed once.
+    """
+
+    def __init__(self, flush, rate_hz=DEFAULT_RATE_HZ):
+        self._flush = flush
+        self.interval = 1.0 / rate_hz
+        self._states = {}
+        self._seen = {}
+        # Untracked keys awaiting their last flush
+        self._untracked = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def track(self, key, state):
+        self._untracked.discard(key)
+        self._states[key] = state
+        self._wake.set()
+
+    def untrack(self, key):
+        if key in self._states:
+            self._untracked.add(key)
+            self._wake.set()
+
+    def tick(self):
+        """Flush once; returns the number of states flushed"""
+        # Taken first, so the values read below include every update made before untrack
+        untracked = set(self._untracked)
+        changed = {}
+        for key, state in list(self._states.items()):
+            version = state.version
+            if self._seen.get(key) != version:
+                self._seen[key] = version
+                changed[key] = state
+        if changed:
+            try:
+                self._flush(changed)
+            except Exception as e:
+                print(f"Progress flush failed: {e}")
+        for key in untracked:
+            if key in self._untracked:
+                self._untracked.discard(key)
+                self._states.pop(key, None)
+                self._seen.pop(key, None)
+        return len(changed)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._states:
+                # Sleep until something is tracked instead of spinning idle
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self.tick()
+            self._stop.wait(self.interval)
@@ -0,0 +1,384 @@
+import itertools
+import threading
+import time
+import uuid
+
+from progress import ProgressState
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+# Downloaded; waiting for or running post-processing, without a download slot
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+# Not downloaded because the video already exists
+SKIPPED = 'skipped'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED, SKIPPED)
+
+# Lower rank is picked first
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+# Seconds between retries of jobs held back by the admission check
+ADMISSION_RETRY = 5
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class JobPaused(Exception):
+    """Raised inside a running job once it has been paused, freeing its slot"""
+
+
+class DownloadJob:
+    """A single download request tracked by the scheduler"""
+
+    def __init__(self, url, platform, format_selector=None, output_dir=None,
+                 title=None, priority='normal', options=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:8]
+        self.url = url
+        self.platform = platform
+        self.format_selector = format_selector
+        self.output_dir = output_dir
+        self.title = title or url
+        self.priority = priority if priority in PRIORITIES else 'normal'
+        self.options = dict(options or {})
+        self.state = QUEUED
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stats = ProgressState()
+        # JobMetrics of the download attempt, set by the engine when the job runs
+        self.metrics = None
+        # Bytes the download is expected to write, if known before it starts
+        self.expected_bytes = None
+        self._was_started = False
+        self._handed_off = False
+        # A worker is running the job; a paused job leaves its worker
+        self._in_runner = False
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def is_finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def progress(self):
+        return self.stats.fraction
+
+    @property
+    def cancel_requested(self):
+        return self._cancelled.is_set()
+
+    @property
+    def pause_requested(self):
+        return not self._resume.is_set()
+
+    def to_dict(self):
+        """JSON-friendly snapshot of the job and its progress"""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'platform': self.platform,
+            'format': self.format_selector,
+            'output_dir': self.output_dir,
+            'title': self.title,
+            'priority': self.priority,
+            'state': self.state,
+            'error': self.error,
+            'duplicate_of': self.options.get('duplicate_of'),
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'progress': round(self.progress, 4),
+            'downloaded_bytes': self.stats.downloaded,
+            'total_bytes': self.stats.total,
+            'speed': self.stats.speed,
+            'eta': self.stats.eta,
+            'metrics': self.metrics.to_dict() if self.metrics else None,
+        }
+
+    def checkpoint(self):
+        """Abort the running job if it was cancelled or paused; call from progress hooks"""
+        if self._cancelled.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+        if not self._resume.is_set():
+            raise JobPaused(f"Job {self.id} paused")
+
+
+class DownloadScheduler:
+    """Worker pool running download jobs by priority with per-platform limits
+
+    ``admit(job)``, if given, is asked before a job starts; a job it
+    refuses stays queued and is offered again when another job finishes,
+    and every ADMISSION_RETRY seconds. Lower priority jobs it accepts may
+    start in the meantime.
+
+    Pausing a running job makes its next ``checkpoint`` raise JobPaused,
+    so the runner returns and the slot goes to the next job. Resuming
+    queues it again and the runner is called anew, expected to continue
+    from what it already wrote.
+    """
+
+    def __init__(self, runner, max_parallel=3, platform_limits=None, admit=None):
+        self._runner = runner
+        self._admit = admit
+        self._held = False
+        self.max_parallel = max(1, int(max_parallel))
+        self.platform_limits = dict(platform_limits or {})
+        self._jobs = {}
+        self._pending = []
+        self._seq = itertools.count()
+        self._order = {}
+        self._active = 0
+        self._running = {}
+        self._workers = []
+        self._listeners = []
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+    def add_listener(self, callback):
+        """Register callback(job) invoked whenever a job changes state"""
+        self._listeners.append(callback)
+
+    def _notify(self, job):
+        for callback in list(self._listeners):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"Scheduler listener failed: {e}")
+
+    def set_limits(self, max_parallel=None, platform_limits=None):
+        """Change the pool size and/or per-platform limits at runtime"""
+        with self._cond:
+            if max_parallel is not None:
+                self.max_parallel = max(1, int(max_parallel))
+            if platform_limits is not None:
+                self.platform_limits.update(platform_limits)
+            self._ensure_workers()
+            self._cond.notify_all()
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_parallel:
+            worker = threading.Thread(target=self._worker, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, job):
+        """Queue a job and return it
+
+        A job that is already finished (e.g. skipped as a duplicate) is
+        only recorded and reported to listeners, never run.
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            self._jobs[job.id] = job
+            self._order[job.id] = next(self._seq)
+        # Listeners see the job before any worker can pick it up
+        self._notify(job)
+        if job.is_finished:
+            return job
+        with self._cond:
+            self._pending.append(job)
+            self._ensure_workers()
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Snapshot of all known jobs in submission order"""
+        with self._cond:
+            return list(self._jobs.values())
+
+    def active_count(self):
+        with self._cond:
+            return self._active
+
+    def _idle(self):
+        # Workers stay counted as active until listeners have seen the final
+        # state, and paused jobs until their runner has returned
+        busy = any(job.state in (QUEUED, PROCESSING) for job in self._jobs.values())
+        return self._active == 0 and not busy
+
+    def wait_idle(self, timeout=None):
+        """Block until every job has finished or is paused; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(self._idle, timeout)
+
+    def hand_off(self, job):
+        """Move a running job to PROCESSING from inside the runner
+
+        The job's download slot is released when the runner returns, but
+        the job only finishes when ``finish`` is called for it.
+        """
+        with self._cond:
+            job.state = PROCESSING
+            job._handed_off = True
+        self._notify(job)
+
+    def finish(self, job, error=None):
+        """Complete a job that was handed off, or fail it with error
+
+        A job whose cancel was requested ends CANCELLED either way.
+        """
+        with self._cond:
+            if job.cancel_requested:
+                job.state = CANCELLED
+            elif error is None:
+                job.state = COMPLETED
+            else:
+                job.state = FAILED
+                job.error = str(error)
+            job.finished = time.time()
+        self._notify(job)
+        with self._cond:
+            self._cond.notify_all()
+
+    def pause(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        with self._cond:
+            if job.state == QUEUED:
+                job.state = PAUSED
+            elif job.state == RUNNING:
+                job._resume.clear()
+                job.state = PAUSED
+            else:
+                return False
+            self._cond.notify_all()
+        self._notify(job)
+        return True
+
+    def resume(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.state != PAUSED:
+            return False
+        with self._cond:
+            job._resume.set()
+            if job._in_runner:
+                # Not out of its runner yet: it carries on, or is queued again once out
+                job.state = RUNNING
+            else:
+                job.state = QUEUED
+                if job not in self._pending:
+                    self._pending.append(job)
+            self._cond.notify_all()
+        self._notify(job)
+        return True
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        with self._cond:
+            job._cancelled.set()
+            job._resume.set()
+            # Waiting in the queue, or paused out of its runner
+            if not (job._in_runner or job._handed_off):
+                if job in self._pending:
+                    self._pending.remove(job)
+                job.state = CANCELLED
+                job.finished = time.time()
+            self._cond.notify_all()
+        self._notify(job)
+        return True
+
+    def clear_finished(self):
+        """Forget completed, failed, cancelled and skipped jobs"""
+        with self._cond:
+            for job_id in [j.id for j in self._jobs.values() if j.is_finished]:
+                del self._jobs[job_id]
+                self._order.pop(job_id, None)
+
+    def shutdown(self, cancel_running=False):
+        with self._cond:
+            self._shutdown = True
+            running = [j for j in self._jobs.values() if j._was_started and not j.is_finished]
+            self._cond.notify_all()
+        if cancel_running:
+            for job in running:
+                self.cancel(job.id)
+
+    def _next_job(self):
+        """Pick the best runnable job; caller holds the lock"""
+        self._held = False
+        if self._active >= self.max_parallel:
+            return None
+        candidates = []
+        for job in self._pending:
+            if job.state != QUEUED:
+                continue
+            limit = self.platform_limits.get(job.platform)
+            if limit and self._running.get(job.platform, 0) >= limit:
+                continue
+            candidates.append(((PRIORITIES[job.priority], self._order[job.id]), job))
+        for _key, job in sorted(candidates, key=lambda c: c[0]):
+            if self._admit is not None and not self._admit(job):
+                self._held = True
+                continue
+            self._pending.remove(job)
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    # Held back jobs may fit once something outside the queue changes
+                    self._cond.wait(ADMISSION_RETRY if self._held else None)
+                    job = self._next_job()
+                job.state = RUNNING
+                if job.started is None:
+                    job.started = time.time()
+                job._was_started = True
+                job._in_runner = True
+                self._active += 1
+                self._running[job.platform] = self._running.get(job.platform, 0) + 1
+            self._notify(job)
+
+            paused = False
+            try:
+                self._runner(job)
+            except Exception as e:
+                if job.cancel_requested:
+                    job.state = CANCELLED
+                elif job.pause_requested:
+                    # JobPaused, or whatever the download raised while stopping
+                    paused = True
+                else:
+                    job.state = FAILED
+                    job.error = str(e)
+            else:
+                if not (job.is_finished or job._handed_off):
+                    job.state = COMPLETED
+            if not (job._handed_off or paused):
+                job.finished = time.time()
+                self._notify(job)
+            requeued = False
+            with self._cond:
+                self._active -= 1
+                self._running[job.platform] -= 1
+                job._in_runner = False
+                if paused and job.state == RUNNING:
+                    # Resumed while its runner was stopping
+                    job.state = QUEUED
+                    self._pending.append(job)
+                    requeued = True
+                self._cond.notify_all()
+            if requeued:
+                self._notify(job)
@@ -0,0 +1,315 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from batch import read_url_file
+from engine import METADATA_PROFILE, detect_platform
+from metadata_cache import normalize_video_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    format_selector TEXT,
+    output_dir TEXT,
+    interval INTEGER,
+    incremental INTEGER,
+    last_seen TEXT,
+    last_checked REAL,
+    last_error TEXT,
+    created REAL
+);
+"""
+
+# Seconds between two polls of a subscription
+DEFAULT_INTERVAL = 60 * 60
+
+# Seconds between the poller's checks for due subscriptions and dropped URL lists
+DEFAULT_TICK = 30
+
+# Newest video IDs remembered per subscription; a poll stops at the first one
+# it meets, so one deleted video does not force a walk of the whole channel
+SEEN_IDS = 20
+
+# URL lists modified more recently than this may still be being written
+SETTLE_SECONDS = 2
+
+# Subfolder of the watch folder that imported URL lists are moved to
+IMPORTED_DIR = 'imported'
+
+
+def new_entries(listing, seen=(), incremental=True):
+    """Video entries of a flat listing newest first, up to the first seen ID
+
+    ``listing`` comes from ``extract_info(url, process=False)``, whose
+    entries are generators that fetch one page at a time, so stopping at a
+    seen ID skips the rest of a large channel. Channel tabs (videos,
+    shorts, live) are nested listings and are each walked the same way.
+    Returns ``(entries, heads)`` where heads are the newest ID of every
+    listing, to be remembered for the next poll.
+    """
+    entries, heads = [], []
+
+    def walk(info):
+        first = True
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist':
+                walk(entry)
+                continue
+            if first and entry.get('id'):
+                heads.append(entry['id'])
+                first = False
+            if incremental and entry.get('id') in seen:
+                break
+            entries.append(entry)
+
+    walk(listing)
+    return entries, heads
+
+
+class SubscriptionStore:
+    """Saved channels and playlists with their polling state, in SQLite"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(row):
+        subscription = dict(row)
+        subscription['incremental'] = bool(subscription['incremental'])
+        subscription['last_seen'] = json.loads(subscription['last_seen'] or '[]')
+        return subscription
+
+    def add(self, url, format_selector=None, output_dir=None, interval=DEFAULT_INTERVAL, incremental=True):
+        """Subscribe to url, or update the settings of an existing subscription; returns it"""
+        url = url.strip()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO subscriptions (url, format_selector, output_dir, interval, incremental, created)"
+                " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET format_selector = excluded.format_selector,"
+                " output_dir = excluded.output_dir, interval = excluded.interval, incremental = excluded.incremental",
+                (url, format_selector, output_dir, int(interval), int(incremental), time.time()),
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT * FROM subscriptions WHERE url = ?", (url,)).fetchone()
+        return self._row(row)
+
+    def remove(self, subscription_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM subscriptions WHERE id = ?", (subscription_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def get(self, subscription_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM subscriptions WHERE id = ?", (subscription_id,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM subscriptions ORDER BY id").fetchall()
+        return [self._row(row) for row in rows]
+
+    def due(self, now=None):
+        """Subscriptions whose interval has passed since their last poll"""
+        now = now or time.time()
+        return [s for s in self.all() if not s['last_checked'] or now - s['last_checked'] >= s['interval']]
+
+    def record_poll(self, subscription_id, last_seen=None, title=None, error=None):
+        """Store the outcome of a poll; last_seen and title are kept when None"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE subscriptions SET last_checked = ?, last_error = ?,"
+                " last_seen = COALESCE(?, last_seen), title = COALESCE(?, title) WHERE id = ?",
+                (time.time(), error, json.dumps(last_seen) if last_seen is not None else None, title,
+                 subscription_id),
+            )
+            self._conn.commit()
+
+
+class SubscriptionPoller:
+    """Background thread queueing new videos of subscriptions and dropped URL lists
+
+    Every ``tick`` seconds the due subscriptions are listed with flat
+    extraction, and every video not in the history, the download index or
+    the queue is submitted with the subscription's format and folder.
+    ``.txt`` files dropped into ``engine.config.watch_dir`` are moved to its
+    ``imported`` subfolder and queued like a batch with
+    ``engine.config.watch_format``, one list at a time on an import thread
+    so a long list does not delay subscription checks. ``on_poll(name,
+    jobs, error)`` is called after each subscription or list, from the
+    poller or import thread.
+    """
+
+    def __init__(self, engine, store=None, tick=DEFAULT_TICK, on_poll=None):
+        self.engine = engine
+        self.store = store or SubscriptionStore(engine.config.subscriptions_db)
+        self.tick = tick
+        self.on_poll = on_poll
+        # Polls from the thread and from the UI must not queue the same videos twice
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # (name, urls) of moved URL lists waiting for the import thread
+        self._imports = queue.Queue()
+        self._importer = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._importer is not None:
+            self._imports.put(None)
+            self._importer = None
+
+    def wake(self):
+        """Check for due subscriptions and new URL lists now"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_due()
+            self.scan_watch_dir()
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def _report(self, name, jobs, error=None):
+        if self.on_poll:
+            try:
+                self.on_poll(name, jobs, error)
+            except Exception as e:
+                print(f"Subscription listener failed: {e}")
+
+    def poll_due(self):
+        jobs = []
+        for subscription in self.store.due():
+            if self._stop.is_set():
+                break
+            jobs.extend(self.poll(subscription))
+        return jobs
+
+    def poll(self, subscription):
+        """List a subscription and queue its new videos; returns the queued jobs"""
+        with self._lock:
+            try:
+                jobs = self._poll(subscription)
+            except Exception as e:
+                print(f"Failed to poll {subscription['url']}: {e}")
+                self.store.record_poll(subscription['id'], error=str(e))
+                self._report(subscription['title'] or subscription['url'], [], e)
+                return []
+        self._report(subscription['title'] or subscription['url'], jobs)
+        return jobs
+
+    def _poll(self, subscription):
+        seen = set(subscription['last_seen'])
+        if detect_platform(subscription['url']) == 'Instagram':
+            listing = self.engine.instagram_sessions.extract(subscription['url'], process=False)
+            entries, heads = new_entries(listing, seen, subscription['incremental'])
+        else:
+            with self.engine.ydl_pool.checkout(METADATA_PROFILE) as ydl:
+                listing = ydl.extract_info(subscription['url'], download=False, process=False)
+                # Channel handles and other redirects resolve to the real listing first
+                while listing.get('_type') in ('url', 'url_transparent') and listing.get('url'):
+                    listing = ydl.extract_info(listing['url'], download=False, process=False)
+                entries, heads = new_entries(listing, seen, subscription['incremental'])
+
+        queued = {normalize_video_key(job.url) for job in self.engine.scheduler.jobs() if not job.is_finished}
+        jobs = []
+        # Oldest first, so the queue follows upload order
+        for entry in reversed(entries):
+            url = entry.get('url') or entry.get('webpage_url')
+            if not url or self._known(url, queued):
+                continue
+            jobs.append(self.engine.submit(url, subscription['format_selector'],
+                                           output_dir=subscription['output_dir'], title=entry.get('title')))
+            queued.add(normalize_video_key(url))
+
+        last_seen = list(dict.fromkeys(heads + subscription['last_seen']))[:SEEN_IDS]
+        self.store.record_poll(subscription['id'], last_seen=last_seen, title=listing.get('title'))
+        return jobs
+
+    def _known(self, url, queued):
+        """Whether url is queued, indexed as downloaded or in the history"""
+        key = normalize_video_key(url)
+        return (key in queued or self.engine.download_index.contains(key)
+                or bool(self.engine.history_store.find_by_url(url)))
+
+    def scan_watch_dir(self):
+        """Hand the URL lists dropped into the watch folder to the import thread; returns their names"""
+        directory = self.engine.config.watch_dir
+        if not directory or not os.path.isdir(directory):
+            return []
+        names = []
+        now = time.time()
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith('.txt'):
+                continue
+            if now - entry.stat().st_mtime < SETTLE_SECONDS:
+                continue
+            error = None
+            try:
+                urls = read_url_file(entry.path)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Failed to read {entry.path}: {e}")
+                urls, error = [], e
+            try:
+                # Moved before queueing, so a crash cannot import the list twice;
+                # unreadable lists are moved too instead of being retried forever
+                imported = os.path.join(directory, IMPORTED_DIR)
+                os.makedirs(imported, exist_ok=True)
+                os.replace(entry.path, os.path.join(imported, f"{time.strftime('%Y%m%d-%H%M%S')}-{entry.name}"))
+            except OSError as e:
+                print(f"Failed to move {entry.path}: {e}")
+                continue
+            if error is not None:
+                self._report(entry.name, [], error)
+                continue
+            if self._importer is None:
+                self._importer = threading.Thread(target=self._import_lists, daemon=True)
+                self._importer.start()
+            self._imports.put((entry.name, urls))
+            names.append(entry.name)
+        return names
+
+    def _import_lists(self):
+        while True:
+            item = self._imports.get()
+            if item is None:
+                return
+            name, urls = item
+            try:
+                # Expanded and resolved by the engine's batch pipeline, each video
+                # with the format its rule recommends
+                jobs = self.engine.run_batch(urls, self.engine.config.watch_format) if urls else []
+            except Exception as e:
+                print(f"Failed to import {name}: {e}")
+                self._report(name, [], e)
+            else:
+                self._report(name, jobs)
@@ -0,0 +1,284 @@
+import csv
+import threading
+import time
+
+# Per-job metrics stored with each history entry, in export column order
+METRIC_FIELDS = (
+    'extract_seconds',
+    'ttfb_seconds',
+    'download_seconds',
+    'postprocess_seconds',
+    'total_seconds',
+    'avg_speed',
+    'peak_speed',
+    'downloaded_bytes',
+    'bytes_written',
+    'fragment_retries',
+    'http_retries',
+    'metadata_cached',
+)
+
+# Metrics exported to Prometheus with their help text
+_PROMETHEUS_METRICS = (
+    ('extract_seconds', "Time from job start until the download begins (extraction and format selection)"),
+    ('ttfb_seconds', "Time from the end of extraction until the download starts receiving"),
+    ('download_seconds', "Time from the first byte until the last file finished downloading"),
+    ('postprocess_seconds', "Time spent in post-processors such as the ffmpeg merge"),
+    ('total_seconds', "Wall time of the whole job"),
+    ('downloaded_bytes', "Bytes received from the network"),
+    ('bytes_written', "Size of the final output file"),
+    ('fragment_retries', "Fragment downloads that had to be retried"),
+    ('http_retries', "HTTP downloads that had to be retried"),
+)
+
+# Seconds of downloading over which the peak speed is measured
+PEAK_WINDOW = 0.25
+
+PROMETHEUS_PREFIX = 'video_downloader'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class JobMetrics:
+    """Timings and throughput of one download, fed by yt-dlp hooks
+
+    Phases follow the yt-dlp hooks: extraction ends when the post-processors
+    yt-dlp runs right before downloading start, the first ``downloading``
+    hook marks the first byte (fragment downloaders only report bytes once
+    a whole fragment is in), and post-processor hooks after the download
+    time the merge. Time spent paused is left out of the download time.
+    The peak speed is measured from byte counts over PEAK_WINDOW, since
+    fragment downloaders report a running average as their speed. Retries
+    are counted through ``retry_sleep_functions``, which yt-dlp calls once
+    per retry.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.extracted = None
+        self.first_byte = None
+        self.download_end = None
+        self.finished = None
+        self.postprocess_seconds = 0.0
+        self.paused_seconds = 0.0
+        self._paused_at = None
+        self.peak_speed = 0
+        self.downloaded_bytes = 0
+        self.bytes_written = None
+        self.fragment_retries = 0
+        self.http_retries = 0
+        self.metadata_cached = False
+        self._file_bytes = 0
+        # (start time, total bytes) of the current peak speed window
+        self._window = None
+        self._pp_started = {}
+
+    def extraction_done(self):
+        if self.extracted is None:
+            self.extracted = time.monotonic()
+
+    def on_progress(self, d):
+        """Record a yt-dlp progress dict"""
+        now = time.monotonic()
+        status = d.get('status')
+        if status == 'downloading':
+            if self.first_byte is None:
+                self.first_byte = now
+            self._file_bytes = d.get('downloaded_bytes') or self._file_bytes
+            if d.get('speed'):
+                self.peak_speed = max(self.peak_speed, d['speed'])
+            self._measure(now, self.downloaded_bytes + self._file_bytes)
+        elif status == 'finished':
+            # Files that were already complete finish without a downloading hook
+            self.downloaded_bytes += d.get('downloaded_bytes') or d.get('total_bytes') or self._file_bytes
+            self._file_bytes = 0
+            self.download_end = now
+            self._measure(now, self.downloaded_bytes)
+
+    def _measure(self, now, total):
+        """Update the peak speed once the current window is long enough"""
+        if self._window is None:
+            self._window = (now, total)
+            return
+        start, start_bytes = self._window
+        if now - start >= PEAK_WINDOW:
+            self.peak_speed = max(self.peak_speed, (total - start_bytes) / (now - start))
+            self._window = (now, total)
+
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = time.monotonic()
+            # A window must not span the pause
+            self._window = None
+
+    def resume(self):
+        if self._paused_at is not None:
+            self.paused_seconds += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def on_postprocess(self, d):
+        """Record a yt-dlp post-processor hook dict"""
+        if self.download_end is None:
+            # Post-processors before the download run once extraction and format selection are done
+            if d.get('status') == 'started':
+                self.extraction_done()
+            return
+        name = d.get('postprocessor')
+        if d.get('status') == 'started':
+            self._pp_started[name] = time.monotonic()
+        elif d.get('status') == 'finished' and name in self._pp_started:
+            self.postprocess_seconds += time.monotonic() - self._pp_started.pop(name)
+
+    def retry_counter(self, kind):
+        """A yt-dlp retry sleep function that counts retries without sleeping"""
+        def count(n):
+            if kind == 'fragment':
+                self.fragment_retries += 1
+            else:
+                self.http_retries += 1
+            return 0
+        return count
+
+    def finish(self, bytes_written=None):
+        self.finished = time.monotonic()
+        self.bytes_written = bytes_written
+
+    def _span(self, start, end):
+        if start is None or end is None:
+            return None
+        return round(end - start, 3)
+
+    def to_dict(self):
+        """Metrics keyed by METRIC_FIELDS; phases that never happened are None"""
+        download_seconds = self._span(self.first_byte, self.download_end)
+        if download_seconds is not None:
+            download_seconds = round(max(0.0, download_seconds - self.paused_seconds), 3)
+        avg_speed = None
+        peak_speed = self.peak_speed
+        if download_seconds and self.downloaded_bytes:
+            avg_speed = round(self.downloaded_bytes / download_seconds)
+            # Downloads shorter than a window never close one, and no
+            # window can be slower than the mean of all of them
+            peak_speed = max(peak_speed, avg_speed)
+        return {
+            'extract_seconds': self._span(self.started, self.extracted),
+            'ttfb_seconds': self._span(self.extracted, self.first_byte),
+            'download_seconds': download_seconds,
+            'postprocess_seconds': round(self.postprocess_seconds, 3),
+            'total_seconds': self._span(self.started, self.finished),
+            'avg_speed': avg_speed,
+            'peak_speed': round(peak_speed) or None,
+            'downloaded_bytes': self.downloaded_bytes,
+            'bytes_written': self.bytes_written,
+            'fragment_retries': self.fragment_retries,
+            'http_retries': self.http_retries,
+            'metadata_cached': self.metadata_cached,
+        }
+
+
+def describe_metrics(metrics):
+    """Short human-readable summary of a metrics dict"""
+    parts = []
+    if metrics.get('extract_seconds') is not None:
+        parts.append(f"extract {metrics['extract_seconds']:.1f}s{' (cached)' if metrics.get('metadata_cached') else ''}")
+    if metrics.get('ttfb_seconds') is not None:
+        parts.append(f"first byte {metrics['ttfb_seconds']:.2f}s")
+    if metrics.get('avg_speed'):
+        parts.append(f"{metrics['avg_speed'] / (1024*1024):.1f} MB/s avg")
+    if metrics.get('postprocess_seconds'):
+        parts.append(f"merge {metrics['postprocess_seconds']:.1f}s")
+    retries = (metrics.get('fragment_retries') or 0) + (metrics.get('http_retries') or 0)
+    if retries:
+        parts.append(f"{retries} retries")
+    return ", ".join(parts)
+
+
+def write_metrics_csv(rows, f):
+    """Write history rows with their metrics to the file object f as CSV"""
+    writer = csv.DictWriter(f, fieldnames=('id', 'date', 'platform', 'title', 'url') + METRIC_FIELDS,
+                            extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+class MetricsRegistry:
+    """Aggregates of every job finished since start, for Prometheus scraping
+
+    Each metric is exported as a summary (``_sum`` and ``_count``) over the
+    completed jobs that reached that phase, so averages per scrape interval
+    can be derived with ``rate()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self._sums = {}
+        self._counts = {}
+        self._peak_speed = 0
+        self._startup = {}
+
+    def observe(self, state, metrics=None):
+        """Record a finished job's final state and, if it completed, its metrics"""
+        with self._lock:
+            self._states[state] = self._states.get(state, 0) + 1
+            if not metrics:
+                return
+            for name, _help in _PROMETHEUS_METRICS:
+                value = metrics.get(name)
+                if value is None:
+                    continue
+                self._sums[name] = self._sums.get(name, 0) + value
+                self._counts[name] = self._counts.get(name, 0) + 1
+            self._peak_speed = max(self._peak_speed, metrics.get('peak_speed') or 0)
+
+    def record_startup(self, report):
+        """Keep a StartupTimer report for export"""
+        with self._lock:
+            self._startup = dict(report)
+
+    def prometheus_text(self, jobs=()):
+        """Metrics in the Prometheus text exposition format
+
+        ``jobs`` are the scheduler's current jobs, exported as a gauge by state.
+        """
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+
+        current = {}
+        for job in jobs:
+            current[job.state] = current.get(job.state, 0) + 1
+        with self._lock:
+            metric('jobs', 'gauge', "Jobs currently known to the queue by state")
+            for state, count in sorted(current.items()):
+                lines.append(f'{PROMETHEUS_PREFIX}_jobs{{state="{state}"}} {count}')
+            metric('jobs_finished_total', 'counter', "Jobs finished since start by final state")
+            for state, count in sorted(self._states.items()):
+                lines.append(f'{PROMETHEUS_PREFIX}_jobs_finished_total{{state="{state}"}} {count}')
+            for name, help_text in _PROMETHEUS_METRICS:
+                metric(name, 'summary', help_text)
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}_sum {self._sums.get(name, 0):g}")
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}_count {self._counts.get(name, 0)}")
+            metric('peak_speed_bytes_per_second', 'gauge', "Highest download speed seen in any job")
+            lines.append(f"{PROMETHEUS_PREFIX}_peak_speed_bytes_per_second {self._peak_speed:g}")
+            if self._startup:
+                metric('startup_seconds', 'gauge', "Seconds from launch until each startup phase was reached")
+                for phase, seconds in self._startup.items():
+                    lines.append(f'{PROMETHEUS_PREFIX}_startup_seconds{{phase="{phase}"}} {seconds:g}')
+        return "\n".join(lines) + "\n"
+
+
+class StartupTimer:
+    """Named checkpoints measured from a common origin, for cold start reports"""
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = round(time.perf_counter() - self.origin, 4)
+
+    def report(self):
+        """Seconds from the origin to each checkpoint, in the order they were reached"""
+        return dict(self.marks)
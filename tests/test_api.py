@@ -0,0 +1,144 @@
+"""JobAPIServer end to end: a real engine on an ephemeral port, offline
+
+The stub extractor and media server from benchmarks/ stand in for a
+video site, so the jobs really download. Run with
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+
+from api import JobAPIServer
+from engine import DownloadEngine, EngineConfig
+from media_server import MediaServer
+from scheduler import CANCELLED, COMPLETED, QUEUED, RUNNING
+from stub_extractor import BenchIE, BenchYDL, bench_url
+
+TOKEN = 'test-token'
+MB = 1024 * 1024
+
+
+class JobAPITest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = MediaServer().start()
+        BenchIE.media_url = cls.media.url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.stop()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='downloader-api-test-')
+        self.download_dir = os.path.join(self.root, 'downloads')
+        # One download at a time, throttled, so a second job stays queued
+        self.engine = DownloadEngine(EngineConfig(
+            download_dir=self.download_dir,
+            data_dir=os.path.join(self.root, 'data'),
+            max_parallel=1,
+            rate_limit=2 * MB,
+            duplicate_policy='download',
+        ), ydl_class=BenchYDL)
+        self.server = JobAPIServer(self.engine, port=0, token=TOKEN).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.engine.shutdown(cancel_running=True)
+        self.engine.wait(30)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def request(self, method, path, payload=None, token=TOKEN):
+        """(status, decoded JSON body) of a request to the server"""
+        host, port = self.server.address[:2]
+        request = urllib.request.Request(
+            f"http://{host}:{port}{path}", method=method,
+            data=json.dumps(payload).encode('utf-8') if payload is not None else None)
+        if token:
+            request.add_header('Authorization', f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            with e:
+                return e.code, json.loads(e.read())
+
+    def test_submit_list_and_finish(self):
+        status, body = self.request('POST', '/jobs', {'url': bench_url('api-one', size=MB), 'format': 'progressive'})
+        self.assertEqual(status, 202)
+        job_id = body['jobs'][0]['id']
+
+        status, body = self.request('GET', '/jobs')
+        self.assertEqual(status, 200)
+        self.assertEqual([job['id'] for job in body['jobs']], [job_id])
+
+        self.assertTrue(self.engine.wait(30))
+        status, body = self.request('GET', f"/jobs/{job_id}")
+        self.assertEqual(status, 200)
+        self.assertEqual(body['state'], COMPLETED, body['error'])
+        self.assertEqual(body['downloaded_bytes'], MB)
+        self.assertEqual(len(os.listdir(self.download_dir)), 1)
+
+    def test_cancel(self):
+        status, body = self.request('POST', '/jobs', {'jobs': [
+            {'url': bench_url('api-running', size=8 * MB), 'format': 'progressive'},
+            {'url': bench_url('api-queued', size=MB), 'format': 'progressive'},
+        ]})
+        self.assertEqual(status, 202)
+        running, queued = (job['id'] for job in body['jobs'])
+        self.assertEqual(self.engine.scheduler.get(queued).state, QUEUED)
+
+        status, body = self.request('POST', f"/jobs/{queued}/cancel")
+        self.assertEqual(status, 200)
+        self.assertEqual(body['state'], CANCELLED)
+        # Already finished
+        status, body = self.request('POST', f"/jobs/{queued}/cancel")
+        self.assertEqual(status, 409)
+
+        status, body = self.request('POST', f"/jobs/{running}/cancel")
+        self.assertEqual(status, 200)
+        self.assertIn(body['state'], (QUEUED, RUNNING, CANCELLED))
+        self.assertTrue(self.engine.wait(30))
+        self.assertEqual(self.engine.scheduler.get(running).state, CANCELLED)
+
+        status, body = self.request('POST', '/jobs/unknown/cancel')
+        self.assertEqual(status, 404)
+
+    def test_output_dir_outside_download_dir_is_rejected(self):
+        outside = os.path.join(self.root, 'elsewhere')
+        for output_dir in (outside, '../elsewhere', 'inside/../../elsewhere'):
+            status, body = self.request('POST', '/jobs', {'url': bench_url('api-escape'), 'output_dir': output_dir})
+            self.assertEqual(status, 400, output_dir)
+            self.assertIn('output_dir', body['error'])
+        self.assertEqual(self.engine.scheduler.jobs(), [])
+        self.assertFalse(os.path.exists(outside))
+
+    def test_output_dir_inside_download_dir(self):
+        status, body = self.request('POST', '/jobs', {'url': bench_url('api-nested', size=MB),
+                                                      'format': 'progressive', 'output_dir': 'nested'})
+        self.assertEqual(status, 202)
+        self.assertEqual(body['jobs'][0]['output_dir'], os.path.join(os.path.realpath(self.download_dir), 'nested'))
+
+    def test_token_required(self):
+        for token in (None, 'wrong'):
+            for method, path, payload in (('GET', '/jobs', None), ('POST', '/jobs', {'url': bench_url('api-x')})):
+                status, body = self.request(method, path, payload, token=token)
+                self.assertEqual(status, 401, (method, path, token))
+                self.assertEqual(body, {'error': 'unauthorized'})
+        self.assertEqual(self.engine.scheduler.jobs(), [])
+        status, _body = self.request('GET', '/health')
+        self.assertEqual(status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
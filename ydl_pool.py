@@ -0,0 +1,142 @@
+import contextlib
+import json
+import threading
+
+# Idle instances kept over all profiles; the least recently returned are closed first
+DEFAULT_MAX_IDLE = 8
+
+_UNSET = object()
+
+
+def _profile_key(profile):
+    return json.dumps(profile, sort_keys=True, default=repr)
+
+
+class YDLPool:
+    """Long-lived YoutubeDL instances grouped by option profile
+
+    Building a YoutubeDL parses options, sets up extractors and loads
+    cookies, and a new instance has no open connections. A pooled instance
+    pays for that once and keeps its extractor state and keep-alive
+    connections for the next job. The profile holds the options fixed at construction
+    (verbosity, cookies, post-processors). Job options such as the format,
+    output template, hooks and retry functions are applied to a borrowed
+    instance by ``acquire`` and undone by ``release``. An instance that
+    raised while borrowed is closed instead of being reused.
+
+    ``factory(params)`` builds a new instance for a profile.
+    """
+
+    def __init__(self, factory, max_idle=DEFAULT_MAX_IDLE):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # (profile key, ydl), most recently returned last
+        self._idle = []
+        self._borrowed = {}
+
+    def acquire(self, profile=None, **params):
+        """Borrow an instance for profile with the per-call params applied"""
+        profile = profile or {}
+        key = _profile_key(profile)
+        ydl = None
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][0] == key:
+                    ydl = self._idle.pop(i)[1]
+                    break
+        if ydl is None:
+            ydl = self._create(profile)
+        try:
+            saved = self._apply(ydl, params)
+        except Exception:
+            # e.g. an invalid format; the instance may be half configured
+            self._close(ydl)
+            raise
+        with self._lock:
+            self._borrowed[id(ydl)] = (key, saved)
+        return ydl
+
+    def release(self, ydl, discard=False):
+        """Return a borrowed instance, or close it when discard is set"""
+        with self._lock:
+            key, saved = self._borrowed.pop(id(ydl))
+        if discard:
+            self._close(ydl)
+            return
+        self._restore(ydl, saved)
+        with self._lock:
+            self._idle.append((key, ydl))
+            evicted = self._idle[:max(0, len(self._idle) - self.max_idle)]
+            del self._idle[:len(evicted)]
+        for _key, old in evicted:
+            self._close(old)
+
+    @contextlib.contextmanager
+    def checkout(self, profile=None, **params):
+        ydl = self.acquire(profile, **params)
+        try:
+            yield ydl
+        except BaseException:
+            self.release(ydl, discard=True)
+            raise
+        self.release(ydl)
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def clear(self):
+        """Close every idle instance; borrowed ones are closed when returned with discard"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _key, ydl in idle:
+            self._close(ydl)
+
+    def _create(self, profile):
+        ydl = self.factory(dict(profile))
+        # yt-dlp only reads hook options while constructing an instance, so
+        # these forward to whatever hooks the current call passed in params
+        ydl.add_progress_hook(lambda d: self._dispatch(ydl, 'progress_hooks', d))
+        ydl.add_postprocessor_hook(lambda d: self._dispatch(ydl, 'postprocessor_hooks', d))
+        return ydl
+
+    @staticmethod
+    def _dispatch(ydl, name, d):
+        for hook in ydl.params.get(name) or ():
+            hook(d)
+
+    @staticmethod
+    def _apply(ydl, params):
+        saved = {name: ydl.params.get(name, _UNSET) for name in params}
+        ydl.params.update(params)
+        if 'outtmpl' in params:
+            outtmpl = params['outtmpl']
+            ydl.params['outtmpl'] = {'default': outtmpl} if isinstance(outtmpl, str) else dict(outtmpl)
+            # Fills in the templates for thumbnails, subtitles, ... like the constructor does
+            ydl._parse_outtmpl()
+        format_selector = _UNSET
+        if 'format' in params:
+            # The constructor compiles the format once; do the same for this call
+            format_selector = ydl.format_selector
+            fmt = params['format']
+            ydl.format_selector = fmt if fmt in (None, '-') or callable(fmt) else ydl.build_format_selector(fmt)
+        return saved, format_selector
+
+    @staticmethod
+    def _restore(ydl, saved):
+        saved, format_selector = saved
+        if format_selector is not _UNSET:
+            ydl.format_selector = format_selector
+        for name, value in saved.items():
+            if value is _UNSET:
+                ydl.params.pop(name, None)
+            else:
+                ydl.params[name] = value
+
+    @staticmethod
+    def _close(ydl):
+        try:
+            ydl.close()
+        except Exception as e:
+            print(f"Failed to close YoutubeDL instance: {e}")